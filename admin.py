@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
 from src.sim.main import run_simulation_pipeline
+from src.sim.variance import build_variance_model
+from src.sim.sim_prep.data_preparation import load_stats
+from src.sim.sim_prep.name_registry import approve_name, load_mappings, load_pending, parse_candidates
 from src.opto.opto_main import run_optimizer_pipeline
 import os
 
@@ -12,6 +15,9 @@ SIMULATION_RESULTS_CSV = "data/processed/simulation_results.csv"
 SIMULATION_DETAILS_CSV = "data/processed/simulation_details.csv"
 PLAYER_POOL_CSV = "data/raw/DKSalaries.csv"
 OPTIMIZED_LINEUPS_CSV = "data/processed/optimized_lineups.csv"
+ATP_CSV = "data/raw/atp.csv"
+WTA_CSV = "data/raw/wta.csv"
+NAME_REGISTRY_DB = "data/processed/names.db"
 
 # ----- Streamlit Configuration -----
 st.set_page_config(layout="wide", page_title="Tennis Simulator and Optimizer Admin Panel")
@@ -37,7 +43,7 @@ def save_csv(dataframe, file_path):
 st.title("Tennis Simulator and Optimizer Admin Panel")
 tabs = st.tabs([
     "Sim Prepped", "Sim Ready", "IWP Adjustments", "Simulation Results", 
-    "Win-Loss Records", "Optimizer Details", "Optimized Lineups"
+    "Win-Loss Records", "Optimizer Details", "Optimized Lineups", "Name Approvals"
 ])
 
 # Display `sim_prepped.csv`
@@ -58,11 +64,38 @@ with tabs[2]:
     iwp_adjustments_df = load_csv(IWP_ADJUSTMENTS_CSV)
     st.dataframe(iwp_adjustments_df, use_container_width=True)
 
+# Review pending names from the name registry
+with tabs[7]:
+    st.header("Name Approvals")
+    pending_df = load_pending(NAME_REGISTRY_DB)
+    if pending_df.empty:
+        st.info("No names awaiting approval.")
+    else:
+        st.dataframe(pending_df, use_container_width=True)
+        raw_name = st.selectbox("Raw Name", pending_df["raw_name"])
+        candidates = parse_candidates(pending_df.set_index("raw_name").at[raw_name, "candidates"])
+        selected_candidate = st.selectbox("Candidate", candidates + ["Other"])
+        approved_name = selected_candidate
+        if selected_candidate == "Other":
+            approved_name = st.text_input("Approved Name", value=raw_name)
+        if st.button("Approve Name") and approved_name:
+            approve_name(NAME_REGISTRY_DB, raw_name, approved_name.strip())
+            st.success(f"Approved {raw_name} -> {approved_name}")
+
+    st.subheader("Approved Names")
+    st.dataframe(
+        pd.DataFrame(list(load_mappings(NAME_REGISTRY_DB).items()), columns=["raw_name", "approved_name"]),
+        use_container_width=True
+    )
+
 # ----- Simulation Settings -----
 st.sidebar.header("Simulation Parameters")
 pre_match_variance = st.sidebar.slider("Pre-Match Variance", 0.0, 1.0, 0.5, 0.05)
 in_match_variance = st.sidebar.slider("In-Match Variance", 0.0, 0.5, 0.2, 0.05)
 num_simulations = st.sidebar.slider("Number of Simulations", 100, 5000, 1000, 100)
+variance_mode = st.sidebar.selectbox("Variance Mode", ["Independent", "Correlated"])
+simulation_engine = st.sidebar.selectbox("Simulation Engine", ["Game-level", "Point-level"])
+importance_sampling = st.sidebar.checkbox("Importance Sampling (GPP Tails)", value=False)
 
 # ----- Optimizer Settings -----
 st.sidebar.header("Optimizer Parameters")
@@ -78,11 +111,18 @@ if st.button("Run Full-Slate Simulations"):
     else:
         try:
             with st.spinner("Simulating..."):
+                variance_model = None
+                if variance_mode == "Correlated":
+                    variance_model = build_variance_model(load_stats(ATP_CSV, WTA_CSV))
+
                 simulation_results, sim_details, win_loss_records = run_simulation_pipeline(
                     sim_prepped_df=sim_prepped_df,
                     pre_match_variance=pre_match_variance,
                     in_match_variance=in_match_variance,
                     num_simulations=num_simulations,
+                    variance_model=variance_model,
+                    engine="point" if simulation_engine == "Point-level" else "game",
+                    importance_sampling=importance_sampling,
                 )
             st.success("Simulations completed successfully!")
 
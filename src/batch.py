@@ -0,0 +1,273 @@
+# src/batch.py
+
+import os
+import sys
+import json
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.config import (
+    ATP_CSV, WTA_CSV, NAME_REGISTRY_DB, NAME_INDEX_DB, BASELINE_STORE_JSON, SLATES_DIR
+)
+from src.utils.logger import setup_logger
+from src.sim.main import run_simulation_pipeline
+from src.sim.variance import build_variance_model
+
+# The sim-prep and optimizer modules import their siblings by bare name
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+for module_dir in (os.path.join(SRC_DIR, "sim", "sim_prep"), os.path.join(SRC_DIR, "opto")):
+    if module_dir not in sys.path:
+        sys.path.append(module_dir)
+
+from data_preparation import load_and_validate_match_context, load_stats  # noqa: E402
+from name_resolution import run_name_resolution  # noqa: E402
+from stats_integration import run_stats_integration  # noqa: E402
+from data_prep import run_opto_data_prep  # noqa: E402
+from builder import run_builder  # noqa: E402
+from lineup_universe import run_lineup_universe  # noqa: E402
+from utils import select_valid_lineups  # noqa: E402
+
+logger = setup_logger("batch")
+
+# Files indexed for name resolution, with the column holding player names
+NAME_SOURCES = {ATP_CSV: "Player", WTA_CSV: "Player"}
+
+# Settings used when a slate definition leaves them out
+PREP_DEFAULTS = {"sourced_strength": 0.1, "estimated_strength": 0.1}
+SIMULATION_DEFAULTS = {
+    "num_simulations": 10000,
+    "pre_match_variance": 0.1,
+    "in_match_variance": 0.05,
+    "engine": "game",
+    "importance_sampling": False,
+    "correlated_variance": False,
+}
+OPTIMIZER_DEFAULTS = {
+    "bucket_size": 20,
+    "num_lineups": 20,
+    "salary_cap": 50000,
+    "roster_size": 6,
+    "larger_pool_multiple": 5,
+    "unique_players_between_lineups": 1,
+    "solver": "exact",
+    "lineups_per_set": 1,
+    "cache_solves": True,
+    "rules": {},
+    "lineup_pool_source": "builder",
+    "universe_rank_by": "Mean",
+}
+
+
+def load_slates(slates_json):
+    """
+    Loads slate definitions and fills in default settings.
+
+    Each slate is an object with a unique "name", a "match_context_csv" and a
+    "player_pool_csv", plus optional "output_dir", "seed" and "prep", "simulation"
+    and "optimizer" settings (see PREP_DEFAULTS, SIMULATION_DEFAULTS and
+    OPTIMIZER_DEFAULTS).
+
+    Args:
+        slates_json (str): JSON file holding a list of slate definitions.
+
+    Returns:
+        list of dict: Slates with every setting filled in.
+    """
+    with open(slates_json) as f:
+        definitions = json.load(f)
+
+    slates = []
+    for definition in definitions:
+        missing = [key for key in ("name", "match_context_csv", "player_pool_csv") if key not in definition]
+        if missing:
+            raise ValueError(f"Slate definition {definition} is missing {missing}.")
+        slates.append({
+            **definition,
+            "output_dir": definition.get("output_dir", os.path.join(SLATES_DIR, definition["name"])),
+            "prep": {**PREP_DEFAULTS, **definition.get("prep", {})},
+            "simulation": {**SIMULATION_DEFAULTS, **definition.get("simulation", {})},
+            "optimizer": {**OPTIMIZER_DEFAULTS, **definition.get("optimizer", {})},
+        })
+
+    names = [slate["name"] for slate in slates]
+    if len(set(names)) < len(names):
+        raise ValueError(f"Slate names must be unique: {names}")
+    return slates
+
+
+def prepare_slate(slate, stats_df):
+    """
+    Runs sim prep for one slate against the shared stats, name registry and name index.
+
+    Args:
+        slate (dict): Slate definition from `load_slates`.
+        stats_df (pd.DataFrame): Stats from `load_stats`, shared by all slates.
+
+    Returns:
+        pd.DataFrame: The slate's prepped matches, one row per player.
+    """
+    output_dir = slate["output_dir"]
+    os.makedirs(output_dir, exist_ok=True)
+
+    match_context = load_and_validate_match_context(slate["match_context_csv"])
+    resolved_context = run_name_resolution(
+        match_context, stats_df, NAME_REGISTRY_DB, name_index_path=NAME_INDEX_DB, name_sources=NAME_SOURCES
+    )
+    sim_ready = run_stats_integration(
+        resolved_context, stats_df, os.path.join(output_dir, "sim_ready.csv"),
+        baseline_store_path=BASELINE_STORE_JSON, **slate["prep"]
+    )
+    sim_prepped = sim_ready.rename(columns={"Name": "Player"})
+    sim_prepped.to_csv(os.path.join(output_dir, "sim_prepped.csv"), index=False)
+    return sim_prepped
+
+
+def optimize_slate(player_pool_csv, simulation_details_csv, sim_prepped_csv, settings, seed=None):
+    """
+    Builds and selects one slate's lineups. Runs as a single task in a worker process.
+
+    Args:
+        player_pool_csv (str): Player pool with salaries.
+        simulation_details_csv (str): Simulated scores from the slate's simulation.
+        sim_prepped_csv (str): The slate's prepped matches.
+        settings (dict): Optimizer settings (see OPTIMIZER_DEFAULTS).
+        seed (int, optional): Seeds the projection-set buckets, so forked workers do not
+            share a random stream.
+
+    Returns:
+        pd.DataFrame: The selected lineups.
+    """
+    if seed is not None:
+        random.seed(seed)
+
+    pool_size = settings["num_lineups"] * settings["larger_pool_multiple"]
+    if settings["lineup_pool_source"] == "universe":
+        lineup_pool = run_lineup_universe(
+            player_pool_csv, simulation_details_csv, sim_prepped_csv, settings["salary_cap"],
+            settings["roster_size"], pool_size, rank_by=settings["universe_rank_by"], rules=settings["rules"]
+        )
+    else:
+        projection_sets, _ = run_opto_data_prep(
+            player_pool_csv, simulation_details_csv, sim_prepped_csv, settings["bucket_size"], settings["num_lineups"]
+        )
+        if not projection_sets:
+            return pd.DataFrame()
+        lineup_pool = run_builder(
+            projection_sets, settings["salary_cap"], settings["roster_size"], pool_size,
+            solver=settings["solver"], lineups_per_set=settings["lineups_per_set"], rules=settings["rules"],
+            cache_solves=settings["cache_solves"]
+        )
+    if lineup_pool.empty:
+        return lineup_pool
+    return select_valid_lineups(
+        lineup_pool, settings["num_lineups"], settings["unique_players_between_lineups"], rules=settings["rules"]
+    )
+
+
+def run_slate(slate, sim_prepped, executor, variance_model=None):
+    """
+    Simulates and optimizes one prepped slate, running the heavy work on the shared pool.
+
+    Matches are submitted as separate tasks and the optimizer as one task, so
+    the pool interleaves work from every slate in flight.
+
+    Args:
+        slate (dict): Slate definition from `load_slates`.
+        sim_prepped (pd.DataFrame): The slate's prepped matches.
+        executor (concurrent.futures.ProcessPoolExecutor): Shared worker pool.
+        variance_model (dict, optional): Correlated variance model, shared by all slates.
+
+    Returns:
+        pd.DataFrame: The selected lineups.
+    """
+    output_dir = slate["output_dir"]
+    settings = slate["simulation"]
+    seed = slate.get("seed")
+    seeds = np.random.SeedSequence(seed).generate_state(2).tolist() if seed is not None else [None, None]
+
+    logger.info(f"[{slate['name']}] Simulating {sim_prepped['MatchID'].nunique()} matches...")
+    simulation_results, simulation_details, _ = run_simulation_pipeline(
+        sim_prepped_df=sim_prepped,
+        pre_match_variance=settings["pre_match_variance"],
+        in_match_variance=settings["in_match_variance"],
+        num_simulations=settings["num_simulations"],
+        variance_model=variance_model if settings["correlated_variance"] else None,
+        engine=settings["engine"],
+        importance_sampling=settings["importance_sampling"],
+        executor=executor,
+        seed=seeds[0],
+    )
+    simulation_results.to_csv(os.path.join(output_dir, "simulation_results.csv"), index=False)
+    simulation_details_csv = os.path.join(output_dir, "simulation_details.csv")
+    simulation_details.to_csv(simulation_details_csv, index=False)
+
+    logger.info(f"[{slate['name']}] Optimizing lineups...")
+    lineups = executor.submit(
+        optimize_slate, slate["player_pool_csv"], simulation_details_csv,
+        os.path.join(output_dir, "sim_prepped.csv"), slate["optimizer"], seeds[1]
+    ).result()
+    lineups.to_csv(os.path.join(output_dir, "optimized_lineups.csv"), index=False)
+    logger.info(f"[{slate['name']}] Saved {lineups['LineupID'].nunique() if not lineups.empty else 0} lineups.")
+    return lineups
+
+
+def run_batch(slates, max_workers=None):
+    """
+    Runs several slates through prep, simulation and optimization on one process pool.
+
+    Stats, baselines and the name index are loaded once for all slates. Prep
+    runs in this process, one slate at a time, so registry and index writes do
+    not contend; each prepped slate is handed straight to the pool, so its
+    simulations run while later slates are still being prepped.
+
+    Args:
+        slates (list of dict): Slate definitions from `load_slates`.
+        max_workers (int, optional): Worker processes; defaults to the number of CPUs.
+
+    Returns:
+        dict: Slate name -> selected lineups (None for a slate that failed).
+    """
+    stats_df = load_stats(ATP_CSV, WTA_CSV)
+    variance_model = None
+    if any(slate["simulation"]["correlated_variance"] for slate in slates):
+        variance_model = build_variance_model(stats_df)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor, \
+            ThreadPoolExecutor(max_workers=max(len(slates), 1)) as slate_threads:
+        running = {}
+        for slate in slates:
+            try:
+                logger.info(f"[{slate['name']}] Preparing slate...")
+                sim_prepped = prepare_slate(slate, stats_df)
+            except Exception as e:
+                logger.error(f"[{slate['name']}] Prep failed: {e}")
+                results[slate["name"]] = None
+                continue
+            running[slate["name"]] = slate_threads.submit(run_slate, slate, sim_prepped, executor, variance_model)
+
+        for name, future in running.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f"[{name}] Failed: {e}")
+                results[name] = None
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several slates on one shared worker pool.")
+    parser.add_argument("slates_json", help="JSON file with a list of slate definitions.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    args = parser.parse_args()
+
+    results = run_batch(load_slates(args.slates_json), max_workers=args.workers)
+    failed = [name for name, lineups in results.items() if lineups is None]
+    if failed:
+        logger.error(f"Failed slates: {failed}")
+        sys.exit(1)
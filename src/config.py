@@ -17,10 +17,16 @@ RAW_NAMES_CSV = os.path.join(RAW_DATA_DIR, "names.csv")
 MATCH_CONTEXT_CSV = os.path.join(PROCESSED_DATA_DIR, "match_context.csv")
 NAMES_CSV = os.path.join(PROCESSED_DATA_DIR, "names.csv")
 PENDING_APPROVALS_CSV = os.path.join(PROCESSED_DATA_DIR, "pending_approvals.csv")
+NAME_REGISTRY_DB = os.path.join(PROCESSED_DATA_DIR, "names.db")
+NAME_INDEX_DB = os.path.join(PROCESSED_DATA_DIR, "name_index.db")
+BASELINE_STORE_JSON = os.path.join(PROCESSED_DATA_DIR, "baseline_store.json")
 SIM_READY_CSV = os.path.join(PROCESSED_DATA_DIR, "sim_ready.csv")
 SIM_RESULTS_CSV = os.path.join(PROCESSED_DATA_DIR, "sim_results.csv")
 MANUAL_BASELINES_CSV = os.path.join(PROCESSED_DATA_DIR, "manual_baselines.csv")
 
+# Batch runs: one output directory per slate
+SLATES_DIR = os.path.join(PROCESSED_DATA_DIR, "slates")
+
 # Logging
 LOG_FILE = os.path.join(LOGS_DIR, "application.log")
 
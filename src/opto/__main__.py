@@ -1,6 +1,7 @@
 import logging
 from data_prep import run_opto_data_prep
 from builder import run_builder
+from lineup_universe import run_lineup_universe
 from utils import display_optimal_lineup, display_player_exposure, lineup_summary, select_valid_lineups
 from config import *
 
@@ -29,10 +30,26 @@ def main():
 
         # Step 2: Lineup Builder
         large_pool_size = NUM_LINEUPS * LARGER_POOL_MULTIPLE
-        lineup_pool = run_builder(projection_sets, SALARY_CAP, ROSTER_SIZE, large_pool_size)
+        rules = {
+            "max_per_match": MAX_PLAYERS_PER_MATCH,
+            "match_limits": MATCH_LIMITS,
+            "locked_players": LOCKED_PLAYERS,
+            "excluded_players": EXCLUDED_PLAYERS,
+        }
+        if LINEUP_POOL_SOURCE == "universe":
+            lineup_pool = run_lineup_universe(
+                PLAYER_POOL_PATH, SIMULATION_DETAILS_PATH, SIM_PREPPED_PATH, SALARY_CAP, ROSTER_SIZE,
+                large_pool_size, rank_by=UNIVERSE_RANK_BY, rules=rules
+            )
+        else:
+            lineup_pool = run_builder(
+                projection_sets, SALARY_CAP, ROSTER_SIZE, large_pool_size,
+                solver=SOLVER, lineups_per_set=LINEUPS_PER_PROJECTION, rules=rules,
+                cache_solves=CACHE_SOLVES, max_workers=BUILDER_WORKERS
+            )
 
         # Step 3: Select Valid Lineups
-        final_lineups = select_valid_lineups(lineup_pool, NUM_LINEUPS, UNIQUE_PLAYERS_BETWEEN_LINEUPS)
+        final_lineups = select_valid_lineups(lineup_pool, NUM_LINEUPS, UNIQUE_PLAYERS_BETWEEN_LINEUPS, rules=rules)
 
         # Step 4: Display Summaries
         lineup_summary(lineup_pool, final_lineups)
@@ -1,9 +1,19 @@
-from pulp import LpProblem, LpVariable, LpMaximize, lpSum, LpStatus
+import os
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from solvers import SolveCache, create_lineup_model
 
+# Projection sets solved per worker task by `build_lineups_parallel`
+PARALLEL_CHUNK_SIZE = 16
 
-def build_lineup(projection_set, salary_cap, roster_size):
+# Per-process state of `build_lineups_parallel` workers: the persistent lineup model
+_worker = {}
+
+
+def build_lineup(projection_set, salary_cap, roster_size, model=None, solver="exact", rules=None):
     """
     Builds a single lineup while checking for validity.
 
@@ -11,60 +21,93 @@ def build_lineup(projection_set, salary_cap, roster_size):
         projection_set (pd.DataFrame): The player pool with projections and salaries.
         salary_cap (int): The maximum salary cap for the lineup.
         roster_size (int): The number of players required in the lineup.
+        model (object, optional): Lineup model built for this slate's players (see
+            `solvers.create_lineup_model`); a new one is built when omitted.
+        solver (str): Solver of the new model.
+        rules (dict, optional): Lineup rules of the new model (see `lineup_rules.DEFAULT_LINEUP_RULES`).
 
     Returns:
         pd.DataFrame: The selected lineup as a subset of the projection set.
     """
-    # Create the LP problem
-    prob = LpProblem("Lineup_Optimization", LpMaximize)
-
-    # Decision variables
-    player_vars = LpVariable.dicts("Player", projection_set.index, cat='Binary')
+    if model is None:
+        model = create_lineup_model(solver, projection_set, salary_cap, roster_size, rules)
+    selected_rows = model.solve(projection_set['Projection'].to_numpy())
+    return projection_set.iloc[selected_rows].copy()
 
-    # Objective: Maximize projected score
-    prob += lpSum(projection_set.loc[i, 'Projection'] * player_vars[i] for i in projection_set.index)
 
-    # Constraints
-    prob += lpSum(projection_set.loc[i, 'Salary'] * player_vars[i] for i in projection_set.index) <= salary_cap
-    prob += lpSum(player_vars[i] for i in projection_set.index) == roster_size
+def build_top_lineups(projection_set, salary_cap, roster_size, k, model=None, solver="exact", rules=None):
+    """
+    Builds the `k` best distinct lineups for one projection set in a single call.
 
-    prob.solve()
+    Args:
+        projection_set (pd.DataFrame): The player pool with projections and salaries.
+        salary_cap (int): The maximum salary cap for the lineup.
+        roster_size (int): The number of players required in the lineup.
+        k (int): The number of lineups to build.
+        model (object, optional): Lineup model built for this slate's players (see
+            `solvers.create_lineup_model`); a new one is built when omitted.
+        solver (str): Solver of the new model.
+        rules (dict, optional): Lineup rules of the new model (see `lineup_rules.DEFAULT_LINEUP_RULES`).
 
-    if LpStatus[prob.status] != 'Optimal':
+    Returns:
+        list of pd.DataFrame: The lineups as subsets of the projection set, best first.
+    """
+    if model is None:
+        model = create_lineup_model(solver, projection_set, salary_cap, roster_size, rules)
+    projections = projection_set['Projection'].to_numpy()
+    selected = [model.solve(projections)] if k == 1 else model.solve_top_k(projections, k)
+    if not selected:
         raise ValueError("No optimal lineup could be created.")
+    return [projection_set.iloc[selected_rows].copy() for selected_rows in selected]
 
-    selected_indices = [i for i in projection_set.index if player_vars[i].varValue == 1]
-    lineup = projection_set.loc[selected_indices].copy()
 
-    return lineup
+def _add_unique_lineups(candidate_lineups, lineup_hashes, lineups, large_pool_size):
+    """Appends the lineups not seen before, numbering them in arrival order, until the pool is full."""
+    for lineup in lineups:
+        # Lineups are identified by their sorted PlayerIDs
+        lineup_hash = tuple(sorted(lineup['PlayerID'].tolist()))
+        if lineup_hash not in lineup_hashes and len(candidate_lineups) < large_pool_size:
+            lineup['LineupID'] = len(candidate_lineups) + 1  # Assign a unique LineupID
+            lineup_hashes.add(lineup_hash)
+            candidate_lineups.append(lineup)
 
 
-def build_lineups(projection_sets, salary_cap, roster_size, large_pool_size):
+def build_lineups(projection_sets, salary_cap, roster_size, large_pool_size, solver="exact", lineups_per_set=1,
+                  rules=None, cache_solves=True):
     """
     Builds multiple lineups by generating a large pool.
 
+    Args:
+        solver (str): Key of `solvers.LINEUP_SOLVERS`; all find the same optimum.
+        lineups_per_set (int): Distinct lineups taken from each projection set, best first.
+        rules (dict, optional): Lineup rules every lineup satisfies (see
+            `lineup_rules.DEFAULT_LINEUP_RULES`); by default at most one player per match.
+        cache_solves (bool): Answer repeated or provably unchanged problems from a
+            `solvers.SolveCache` instead of solving them again.
+
     Returns:
         pd.DataFrame: The larger pool of all generated lineups with full details.
     """
     candidate_lineups = []
     lineup_hashes = set()
+    model = None
+    cache = SolveCache() if cache_solves else None
 
     for projection_set in projection_sets:
         try:
-            lineup = build_lineup(projection_set, salary_cap, roster_size)
-
-            # Generate a unique hash for the lineup
-            lineup_hash = tuple(sorted(lineup['Player'].tolist()))
-            if lineup_hash not in lineup_hashes:
-                lineup['LineupID'] = len(candidate_lineups) + 1  # Assign a unique LineupID
-                lineup_hashes.add(lineup_hash)
-                candidate_lineups.append(lineup)
+            # Projection sets of a slate share their players; only rebuild the model if they differ
+            if model is None or not model.matches(projection_set):
+                model = create_lineup_model(solver, projection_set, salary_cap, roster_size, rules, cache=cache)
+            lineups = build_top_lineups(projection_set, salary_cap, roster_size, lineups_per_set, model=model)
+            _add_unique_lineups(candidate_lineups, lineup_hashes, lineups, large_pool_size)
         except ValueError as e:
             logging.warning(f"Skipped lineup due to error: {e}")
 
         if len(candidate_lineups) >= large_pool_size:
             break
 
+    if cache is not None:
+        logging.info(f"Lineup solves: {cache.summary()}")
     if candidate_lineups:
         return pd.concat(candidate_lineups, ignore_index=True)
     else:
@@ -72,7 +115,108 @@ def build_lineups(projection_sets, salary_cap, roster_size, large_pool_size):
     return larger_pool
 
 
-def run_builder(projection_sets, salary_cap, roster_size, large_pool_size):
+def _init_worker(players, salary_cap, roster_size, solver, rules, cache_solves):
+    """Builds the worker's persistent lineup model once, when the worker process starts."""
+    cache = SolveCache() if cache_solves else None
+    _worker["model"] = create_lineup_model(solver, players, salary_cap, roster_size, rules, cache=cache)
+
+
+def _solve_projection_chunk(projections, lineups_per_set):
+    """
+    Solves consecutive projection sets on the worker's model.
+
+    Returns:
+        list: Selected row positions per lineup for each set, or an error message
+            for a set with no valid lineup.
+    """
+    model = _worker["model"]
+    results = []
+    for set_projections in projections:
+        try:
+            if lineups_per_set == 1:
+                results.append([model.solve(set_projections)])
+            else:
+                results.append(model.solve_top_k(set_projections, lineups_per_set) or "No optimal lineup could be created.")
+        except ValueError as e:
+            results.append(str(e))
+    return results
+
+
+def build_lineups_parallel(projection_sets, salary_cap, roster_size, large_pool_size, solver="exact",
+                           lineups_per_set=1, rules=None, cache_solves=True, max_workers=None,
+                           chunk_size=PARALLEL_CHUNK_SIZE):
+    """
+    Builds the lineup pool like `build_lineups`, solving projection sets on a process pool.
+
+    Each worker builds its own persistent lineup model (and solve cache) once
+    and solves chunks of consecutive projection sets. Chunks are submitted a
+    few at a time and their results consumed in projection-set order, so
+    LineupIDs match a serial build. Once the pool holds `large_pool_size`
+    unique lineups, chunks not yet started are cancelled.
+
+    Args:
+        projection_sets (ProjectionSets or list of pd.DataFrame): Projection sets sharing one player table.
+        max_workers (int, optional): Worker processes; defaults to the number of CPUs.
+        chunk_size (int): Projection sets per worker task.
+
+    Other arguments are as for `build_lineups`.
+
+    Returns:
+        pd.DataFrame: The larger pool of all generated lineups with full details.
+    """
+    if hasattr(projection_sets, "projections"):
+        players, projections = projection_sets.players, projection_sets.projections
+    elif len(projection_sets) and all(
+            np.array_equal(projection_set['PlayerID'].to_numpy(), projection_sets[0]['PlayerID'].to_numpy())
+            for projection_set in projection_sets):
+        players = projection_sets[0].drop(columns='Projection')
+        projections = np.vstack([projection_set['Projection'].to_numpy() for projection_set in projection_sets])
+    else:
+        logging.warning("Projection sets do not share one player table; building serially.")
+        return build_lineups(projection_sets, salary_cap, roster_size, large_pool_size, solver=solver,
+                             lineups_per_set=lineups_per_set, rules=rules, cache_solves=cache_solves)
+
+    candidate_lineups = []
+    lineup_hashes = set()
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker,
+        initargs=(players, salary_cap, roster_size, solver, rules, cache_solves)
+    )
+    try:
+        in_flight = deque()
+        next_start = 0
+        max_in_flight = 2 * (max_workers or os.cpu_count() or 1)
+        while next_start < len(projections) or in_flight:
+            # Keep a few chunks queued per worker, so a full pool stops new work quickly
+            while next_start < len(projections) and len(in_flight) < max_in_flight:
+                stop = min(next_start + chunk_size, len(projections))
+                in_flight.append((next_start, executor.submit(
+                    _solve_projection_chunk, projections[next_start:stop], lineups_per_set
+                )))
+                next_start = stop
+
+            start, future = in_flight.popleft()
+            for offset, selected in enumerate(future.result()):
+                if isinstance(selected, str):
+                    logging.warning(f"Skipped lineup due to error: {selected}")
+                    continue
+                set_projections = projections[start + offset]
+                lineups = [players.iloc[rows].assign(Projection=set_projections[rows]) for rows in selected]
+                _add_unique_lineups(candidate_lineups, lineup_hashes, lineups, large_pool_size)
+
+            if len(candidate_lineups) >= large_pool_size:
+                break
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    if candidate_lineups:
+        return pd.concat(candidate_lineups, ignore_index=True)
+    else:
+        return pd.DataFrame()
+
+
+def run_builder(projection_sets, salary_cap, roster_size, large_pool_size, solver="exact", lineups_per_set=1,
+                rules=None, cache_solves=True, max_workers=1):
     """
     Wrapper for the lineup builder.
 
@@ -81,6 +225,13 @@ def run_builder(projection_sets, salary_cap, roster_size, large_pool_size):
         salary_cap (int): The maximum salary cap for each lineup.
         roster_size (int): The number of players required in each lineup.
         large_pool_size (int): The size of the larger lineup pool.
+        solver (str): "exact", "highs" or "pulp" (see `solvers.LINEUP_SOLVERS`).
+        lineups_per_set (int): Distinct lineups taken from each projection set, best first.
+        rules (dict, optional): Lineup rules every lineup satisfies (see
+            `lineup_rules.DEFAULT_LINEUP_RULES`); by default at most one player per match.
+        cache_solves (bool): Reuse the optima of repeated or provably unchanged problems.
+        max_workers (int, optional): Worker processes solving projection sets in parallel;
+            1 builds in this process, None uses every CPU.
 
     Returns:
         pd.DataFrame: The larger pool of all generated lineups.
@@ -88,6 +239,15 @@ def run_builder(projection_sets, salary_cap, roster_size, large_pool_size):
     logging.info("Starting lineup builder...")
 
     # Build a larger pool of lineups
-    larger_pool = build_lineups(projection_sets, salary_cap, roster_size, large_pool_size)
+    if max_workers == 1:
+        larger_pool = build_lineups(
+            projection_sets, salary_cap, roster_size, large_pool_size, solver=solver, lineups_per_set=lineups_per_set,
+            rules=rules, cache_solves=cache_solves
+        )
+    else:
+        larger_pool = build_lineups_parallel(
+            projection_sets, salary_cap, roster_size, large_pool_size, solver=solver, lineups_per_set=lineups_per_set,
+            rules=rules, cache_solves=cache_solves, max_workers=max_workers
+        )
 
     return larger_pool
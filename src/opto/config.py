@@ -8,3 +8,13 @@ SALARY_CAP = 50000
 ROSTER_SIZE = 6
 UNIQUE_PLAYERS_BETWEEN_LINEUPS = 1
 LARGER_POOL_MULTIPLE = 5
+SOLVER = "exact"  # Lineup solver: "exact", "highs" or "pulp"
+LINEUPS_PER_PROJECTION = 1  # Distinct best lineups taken from each projection set
+CACHE_SOLVES = True  # Reuse optima of repeated or provably unchanged lineup problems
+BUILDER_WORKERS = 1  # Processes solving projection sets in parallel; None uses every CPU
+LINEUP_POOL_SOURCE = "builder"  # "builder" (one solve per projection set) or "universe" (every valid lineup scored on all sims)
+UNIVERSE_RANK_BY = "Mean"  # Universe pool ranking: "Mean", "OptimalRate" or a percentile such as "P90"
+MAX_PLAYERS_PER_MATCH = 1  # Most players a lineup may take from one match
+MATCH_LIMITS = {}  # MatchID -> most players from that match, overriding MAX_PLAYERS_PER_MATCH
+LOCKED_PLAYERS = []  # Player names every lineup must include
+EXCLUDED_PLAYERS = []  # Player names no lineup may include
@@ -1,13 +1,22 @@
 #opto_data_prep
 
 
+import numpy as np
 import pandas as pd
 import logging
 import random
+from scipy import sparse
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Prefix of the per-match importance weight columns written by the simulator
+# when importance sampling is on (one SimWeight_<MatchID> column per match)
+SIM_WEIGHT_COLUMN = "SimWeight"
+
+# Dense slate-level player ID assigned at prep time (see the simulator's PLAYER_ID_COLUMN)
+PLAYER_ID_COLUMN = "PlayerID"
+
 
 def load_player_pool(player_pool_path):
     """Loads the player pool with salaries from a CSV file."""
@@ -42,50 +51,107 @@ def load_sim_prepped(sim_prepped_path):
         return pd.DataFrame()
 
 
-def prepare_projection_sets(player_pool, simulation_details, sim_prepped, bucket_size, num_lineups):
-    """Prepares multiple projection sets for optimization with MatchID."""
-    projection_sets = []
-    usage_summary = []
-
-    # Merge MatchID from sim_prepped with simulation details
-    simulation_details_with_ids = pd.merge(
-        simulation_details.transpose().reset_index(),
-        sim_prepped[['MatchID', 'Player']],
-        left_on='index',
-        right_on='Player',
-        how='left'
-    )
-    simulation_details_with_ids.drop(columns='index', inplace=True)
-
-    for i in range(num_lineups):
-        # Select random simulations for the bucket
-        selected_indices = random.sample(range(len(simulation_details)), bucket_size)
-        averaged_projection = simulation_details.iloc[selected_indices].mean().to_frame().T
-
-        # Reshape the DataFrame
-        reshaped_data = averaged_projection.transpose().reset_index()
-        reshaped_data.columns = ['Player', 'Projection']
-
-        # Merge with player pool to add salary
-        player_pool = player_pool.rename(columns={"Name": "Player"})
-        merged_data = reshaped_data.merge(player_pool[['Player', 'Salary']], on='Player', how='left')
-
-        # Merge with MatchID
-        merged_data = pd.merge(
-            merged_data,
-            sim_prepped[['MatchID', 'Player']],
-            on='Player',
-            how='left'
-        )
+def build_player_table(player_pool, simulation_details, sim_prepped):
+    """
+    Maps the simulated players to their PlayerIDs once, with salary and MatchID.
+
+    Args:
+        player_pool (pd.DataFrame): Player pool with Name and Salary.
+        simulation_details (pd.DataFrame): Simulated scores, one column per player.
+        sim_prepped (pd.DataFrame): Prepped slate with Player and MatchID (and PlayerID when
+            assigned at prep time; row order otherwise).
+
+    Returns:
+        pd.DataFrame: PlayerID, Player, Salary and MatchID of every simulated player, sorted by PlayerID.
+    """
+    if PLAYER_ID_COLUMN not in sim_prepped.columns:
+        sim_prepped = sim_prepped.assign(**{PLAYER_ID_COLUMN: range(len(sim_prepped))})
+    players = sim_prepped[[PLAYER_ID_COLUMN, 'Player', 'MatchID']]
+    players = players[players['Player'].isin(simulation_details.columns)]
+    unknown = [column for column in simulation_details.columns
+               if column not in set(players['Player']) and not str(column).startswith(f"{SIM_WEIGHT_COLUMN}_")]
+    if unknown:
+        logging.warning(f"Simulated players missing from sim_prepped, skipped: {unknown}")
+
+    salaries = player_pool.rename(columns={"Name": "Player"}).drop_duplicates('Player').set_index('Player')['Salary']
+    players = players.assign(Salary=players['Player'].map(salaries))
+    return players[[PLAYER_ID_COLUMN, 'Player', 'Salary', 'MatchID']].sort_values(PLAYER_ID_COLUMN).reset_index(drop=True)
+
+
+class ProjectionSets:
+    """
+    All projection sets of a slate, held as one (num_sets, n_players) array.
+
+    Indexing returns a projection set as a DataFrame built on demand from the
+    shared player table and one row of the array, so sets cost nothing until
+    they are solved.
+    """
+
+    def __init__(self, players, projections):
+        """
+        Args:
+            players (pd.DataFrame): PlayerID, Player, Salary and MatchID (see `build_player_table`).
+            projections (np.ndarray): Projection per set and player, shape (num_sets, len(players)).
+        """
+        self.players = players
+        self.projections = projections
+
+    def __len__(self):
+        return len(self.projections)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.players.assign(Projection=self.projections[index])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+def bucket_matrix(num_sims, bucket_size, num_sets):
+    """
+    Samples the simulations of every projection set into a sparse selection matrix.
+
+    Args:
+        num_sims (int): Number of simulated slates.
+        bucket_size (int): Simulations per projection set, sampled without replacement.
+        num_sets (int): Number of projection sets.
+
+    Returns:
+        tuple: Sparse (num_sets, num_sims) matrix with a 1 for every sampled
+            simulation, and the sampled indices per set.
+    """
+    selected = [random.sample(range(num_sims), bucket_size) for _ in range(num_sets)]
+    columns = np.array(selected, dtype=np.int64).reshape(num_sets, bucket_size)
+    rows = np.repeat(np.arange(num_sets), bucket_size)
+    matrix = sparse.csr_matrix((np.ones(rows.size), (rows, columns.ravel())), shape=(num_sets, num_sims))
+    return matrix, selected
 
-        # Ensure the projection set has the correct column names
-        projection_set = merged_data[['Player', 'Salary', 'MatchID', 'Projection']]
-        projection_sets.append(projection_set)
 
-        # Log simulation indices used for this projection set
-        usage_summary.append(f"Projection Set {i + 1} - Slate Sims: {', '.join(map(str, selected_indices))}")
-
-    return projection_sets, usage_summary
+def prepare_projection_sets(player_pool, simulation_details, sim_prepped, bucket_size, num_lineups):
+    """Prepares multiple projection sets for optimization with MatchID."""
+    # Players are joined with salary and MatchID once; every set is one row of a matrix product
+    weight_columns = [column for column in simulation_details.columns
+                      if str(column).startswith(f"{SIM_WEIGHT_COLUMN}_")]
+    players = build_player_table(player_pool, simulation_details, sim_prepped)
+    scores = simulation_details[players['Player']].to_numpy(dtype=float)
+
+    buckets, selected = bucket_matrix(len(simulation_details), bucket_size, num_lineups)
+    if weight_columns:
+        # Importance-weighted sims are averaged with each player's match weights
+        player_weights = simulation_details[
+            [f"{SIM_WEIGHT_COLUMN}_{match_id}" for match_id in players['MatchID']]
+        ].to_numpy(dtype=float)
+        projections = (buckets @ (scores * player_weights)) / (buckets @ player_weights)
+    else:
+        projections = (buckets @ scores) / bucket_size
+
+    # Log simulation indices used for each projection set
+    usage_summary = [
+        f"Projection Set {i + 1} - Slate Sims: {', '.join(map(str, selected_indices))}"
+        for i, selected_indices in enumerate(selected)
+    ]
+    return ProjectionSets(players, projections), usage_summary
 
 
 def run_opto_data_prep(player_pool_path, simulation_details_path, sim_prepped_path, bucket_size, num_lineups):
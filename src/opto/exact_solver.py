@@ -0,0 +1,260 @@
+import math
+import heapq
+import numpy as np
+from lineup_rules import resolve_lineup_rules
+
+
+class UnsupportedConstraints(ValueError):
+    """Raised when lineup rules cannot be expressed in the exact solver's dynamic program."""
+
+
+def salary_unit(salaries, salary_cap):
+    """Returns the largest unit all salaries and the cap are multiples of (100 on DraftKings)."""
+    unit = int(salary_cap)
+    for salary in salaries:
+        unit = math.gcd(unit, int(salary))
+    return max(unit, 1)
+
+
+def solve_lineup_exact(projections, salaries, salary_cap, roster_size, groups=None):
+    """
+    Exact in-process solver for picking `roster_size` players under a salary cap.
+
+    Dynamic program over (players picked, salary spent): each state holds the
+    best total projection reachable with exactly that many players and that
+    salary. Spend is counted above the floor of k cheapest-salary players, which
+    shrinks the table to the cap's slack over a minimum-price roster. Salaries are counted in their common unit (see `salary_unit`), so
+    the result is exact, and each player is one vectorized update of the whole
+    table. Players in the same group are mutually exclusive (e.g. one
+    player per match).
+
+    Args:
+        projections (np.ndarray): Projection per player.
+        salaries (np.ndarray): Integer salary per player.
+        salary_cap (int): The maximum total salary.
+        roster_size (int): The number of players required.
+        groups (list of np.ndarray, optional): Player positions that exclude each other;
+            every player is its own group when omitted. Players in no group cannot be picked.
+
+    Returns:
+        np.ndarray: Sorted positions of the selected players.
+
+    Raises:
+        ValueError: When no lineup satisfies the constraints.
+    """
+    projections = np.asarray(projections, dtype=float)
+    salaries = np.asarray(salaries)
+    if groups is None:
+        groups = [np.array([i]) for i in range(len(projections))]
+
+    valid = np.isfinite(salaries) & np.isfinite(projections)
+    if valid.sum() < roster_size:
+        raise ValueError("No optimal lineup could be created.")
+    unit = salary_unit(salaries[valid], salary_cap)
+    units = np.zeros(len(salaries), dtype=int)
+    units[valid] = salaries[valid].astype(np.int64) // unit
+
+    # A lineup of k players spends at least k times the cheapest salary, so states are
+    # indexed by the spend above that floor; the last pick must stay within the cap
+    min_units = int(units[valid].min())
+    width = int(salary_cap) // unit - roster_size * min_units
+    if width < 0:
+        raise ValueError("No optimal lineup could be created.")
+    extra = units - min_units
+
+    # tables[g, k, r]: best projection over the first g groups with k players spending
+    # r units above the floor; -inf when unreachable. Two in-place array ops per player.
+    tables = np.full((len(groups) + 1, roster_size + 1, width + 1), -np.inf)
+    tables[0, 0, 0] = 0.0
+    for g, members in enumerate(groups):
+        before, after = tables[g], tables[g + 1]
+        after[:] = before
+        for player in members:
+            cost = extra[player]
+            if valid[player] and cost <= width:
+                # Adding the player moves every state one pick up and `cost` units right
+                target = after[1:, cost:]
+                np.maximum(target, before[:-1, :width + 1 - cost] + projections[player], out=target)
+
+    spent = int(np.argmax(tables[-1, roster_size]))
+    if not np.isfinite(tables[-1, roster_size, spent]):
+        raise ValueError("No optimal lineup could be created.")
+
+    # Walk the groups backwards: a state that improved on group g was reached by one of its players
+    selected = []
+    picked = roster_size
+    for g in range(len(groups) - 1, -1, -1):
+        value = tables[g + 1, picked, spent]
+        if value == tables[g, picked, spent]:
+            continue
+        for player in groups[g]:
+            cost = extra[player]
+            if (valid[player] and cost <= spent
+                    and tables[g, picked - 1, spent - cost] + projections[player] == value):
+                selected.append(player)
+                picked -= 1
+                spent -= cost
+                break
+    return np.sort(np.array(selected, dtype=int))
+
+
+def solve_top_k_exact(projections, salaries, salary_cap, roster_size, k, groups=None, locked=()):
+    """
+    Finds the `k` best distinct lineups with Lawler's partitioning scheme.
+
+    Each search node fixes some players in and some out. Solving a node gives
+    its best lineup; the rest of the node is split into disjoint children, one
+    per selected player that is not fixed: the i-th child excludes that player
+    and keeps the selected players before it. Every lineup lives in exactly
+    one node, so popping nodes by value yields lineups in order without
+    duplicates. Each node is one `solve_lineup_exact` call on the free players,
+    with the fixed players (and players sharing a group with them) removed.
+
+    Args:
+        projections (np.ndarray): Projection per player.
+        salaries (np.ndarray): Integer salary per player.
+        salary_cap (int): The maximum total salary.
+        roster_size (int): The number of players required.
+        k (int): The number of lineups to return.
+        groups (list of np.ndarray, optional): Player positions that exclude each other.
+        locked (iterable of int): Positions every lineup must include.
+
+    Returns:
+        list of np.ndarray: Sorted positions of the selected players of up to `k`
+            lineups, best first; fewer when fewer valid lineups exist.
+    """
+    projections = np.asarray(projections, dtype=float)
+    salaries = np.asarray(salaries, dtype=float)
+    group_of = np.arange(len(projections))
+    if groups is not None:
+        for g, members in enumerate(groups):
+            group_of[members] = len(projections) + g
+
+    def solve_node(included, excluded):
+        """Best lineup containing `included` and none of `excluded`, as (value, positions), or None."""
+        included = np.array(sorted(included), dtype=int)
+        spent = salaries[included].sum()
+        if (len(included) > roster_size or spent > salary_cap or not np.isfinite(projections[included]).all()
+                or len(np.unique(group_of[included])) < len(included)):
+            return None
+        if len(included) == roster_size:
+            return projections[included].sum(), included
+
+        node_projections = projections.copy()
+        node_projections[list(excluded)] = -np.inf
+        node_projections[np.isin(group_of, group_of[included])] = -np.inf
+        try:
+            rest = solve_lineup_exact(
+                node_projections, salaries, salary_cap - spent, roster_size - len(included), groups
+            )
+        except ValueError:
+            return None
+        lineup = np.sort(np.concatenate([included, rest]))
+        return projections[lineup].sum(), lineup
+
+    lineups = []
+    root_included = tuple(sorted(int(player) for player in locked))
+    root = solve_node(root_included, ())
+    if root is None:
+        return lineups
+    # Heap entries: (-value, insertion order, lineup, included, excluded)
+    heap = [(-root[0], 0, root[1], root_included, ())]
+    pushed = 1
+    while heap and len(lineups) < k:
+        _, _, lineup, included, excluded = heapq.heappop(heap)
+        lineups.append(lineup)
+
+        free = [player for player in lineup.tolist() if player not in included]
+        for i, player in enumerate(free):
+            child_included = included + tuple(free[:i])
+            child_excluded = excluded + (player,)
+            child = solve_node(child_included, child_excluded)
+            if child is not None:
+                heapq.heappush(heap, (-child[0], pushed, child[1], child_included, child_excluded))
+                pushed += 1
+    return lineups
+
+
+class ExactLineupModel:
+    """
+    In-process counterpart of `solvers.PulpLineupModel`: the groups and salary units
+    are fixed per slate and each solve runs `solve_lineup_exact` on new projections.
+
+    Lineup rules map onto the dynamic program directly: a match capped at one
+    player is an exclusion group, excluded players (and matches capped at zero)
+    are removed, and locked players are fixed into the lineup. Caps between one
+    and a match's size have no group form and are left to the other solvers.
+    """
+
+    def __init__(self, players, salary_cap, roster_size, rules=None):
+        """
+        Args:
+            players (pd.DataFrame): The slate's players with PlayerID, Player, Salary and MatchID.
+            salary_cap (int): The maximum salary cap for the lineup.
+            roster_size (int): The number of players required in the lineup.
+            rules (dict, optional): Lineup rules (see `lineup_rules.DEFAULT_LINEUP_RULES`).
+
+        Raises:
+            UnsupportedConstraints: When a match cap is between one and the match's size.
+        """
+        self.player_ids = players['PlayerID'].to_numpy()
+        self.salaries = players['Salary'].to_numpy(dtype=float)
+        self.salary_cap = salary_cap
+        self.roster_size = roster_size
+
+        resolved = resolve_lineup_rules(players, rules)
+        self.locked = resolved["locked"]
+        self.blocked = resolved["blocked"].copy()
+        grouped = np.zeros(len(players), dtype=bool)
+        self.groups = []
+        for positions, cap in resolved["match_caps"]:
+            if cap == 0:
+                self.blocked[positions] = True
+            elif cap == 1:
+                self.groups.append(positions)
+                grouped[positions] = True
+            else:
+                raise UnsupportedConstraints(f"The exact solver only supports match caps of 0 or 1, got {cap}.")
+        self.groups += [np.array([i]) for i in np.flatnonzero(~grouped)]
+
+    def matches(self, projection_set):
+        """Checks that a projection set lists the same players in the same order as the model."""
+        return np.array_equal(projection_set['PlayerID'].to_numpy(), self.player_ids)
+
+    def _masked(self, projections):
+        """Projections with excluded players made unselectable."""
+        projections = np.array(projections, dtype=float)
+        projections[self.blocked] = -np.inf
+        return projections
+
+    def solve(self, projections):
+        """
+        Solves for new projections.
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+
+        Returns:
+            np.ndarray: Row positions of the selected players.
+        """
+        if len(self.locked):
+            lineups = self.solve_top_k(projections, 1)
+            if not lineups:
+                raise ValueError("No optimal lineup could be created.")
+            return lineups[0]
+        return solve_lineup_exact(self._masked(projections), self.salaries, self.salary_cap, self.roster_size, self.groups)
+
+    def solve_top_k(self, projections, k):
+        """
+        Finds the `k` best distinct lineups for new projections (see `solve_top_k_exact`).
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+            k (int): The number of lineups to return.
+
+        Returns:
+            list of np.ndarray: Row positions of each lineup's players, best lineup first.
+        """
+        return solve_top_k_exact(
+            self._masked(projections), self.salaries, self.salary_cap, self.roster_size, k, self.groups, self.locked
+        )
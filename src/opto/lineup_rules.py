@@ -0,0 +1,71 @@
+import logging
+import numpy as np
+
+# Rules applied when a setting is left out:
+# - max_per_match: most players from any one match
+# - match_limits: MatchID -> most players from that match, overriding max_per_match
+# - locked_players: player names every lineup must include
+# - excluded_players: player names no lineup may include
+DEFAULT_LINEUP_RULES = {
+    "max_per_match": 1,
+    "match_limits": {},
+    "locked_players": [],
+    "excluded_players": [],
+}
+
+
+def match_cap(rules, match_id):
+    """
+    Returns the most players a lineup may take from one match.
+
+    Args:
+        rules (dict): Lineup rules with every setting of DEFAULT_LINEUP_RULES.
+        match_id: The match's MatchID. Match limits may come from JSON, where
+            MatchIDs are strings, so IDs are compared as text.
+    """
+    key = str(int(match_id)) if isinstance(match_id, float) and match_id.is_integer() else str(match_id)
+    match_limits = {str(limit_id): cap for limit_id, cap in rules["match_limits"].items()}
+    return int(match_limits.get(key, rules["max_per_match"]))
+
+
+def resolve_lineup_rules(players, rules=None):
+    """
+    Translates lineup rules into player positions for the lineup models.
+
+    Args:
+        players (pd.DataFrame): The slate's players with Player and MatchID, in model row order.
+        rules (dict, optional): Settings of DEFAULT_LINEUP_RULES; missing ones take the defaults.
+
+    Returns:
+        dict: "locked" (positions every lineup includes), "blocked" (bool mask of players
+            no lineup may include) and "match_caps" (list of (positions, cap) for every
+            match whose cap is below its number of players).
+
+    Raises:
+        ValueError: When a player is both locked and excluded.
+    """
+    rules = {**DEFAULT_LINEUP_RULES, **(rules or {})}
+    names = players['Player'].to_numpy()
+    positions_by_name = {name: i for i, name in enumerate(names)}
+
+    def positions_of(setting):
+        unknown = [name for name in rules[setting] if name not in positions_by_name]
+        if unknown:
+            logging.warning(f"Players in {setting} are not on the slate, ignored: {unknown}")
+        return np.array(sorted(positions_by_name[name] for name in rules[setting] if name in positions_by_name), dtype=int)
+
+    locked = positions_of("locked_players")
+    blocked = np.zeros(len(players), dtype=bool)
+    blocked[positions_of("excluded_players")] = True
+    if blocked[locked].any():
+        raise ValueError(f"Players cannot be both locked and excluded: {names[locked[blocked[locked]]].tolist()}")
+
+    match_ids = players['MatchID'].to_numpy()
+    match_caps = []
+    for match_id in dict.fromkeys(match_id for match_id in match_ids if match_id == match_id):
+        positions = np.flatnonzero(match_ids == match_id)
+        cap = match_cap(rules, match_id)
+        if cap < len(positions):
+            match_caps.append((positions, cap))
+
+    return {"locked": locked, "blocked": blocked, "match_caps": match_caps}
@@ -0,0 +1,372 @@
+import logging
+import numpy as np
+import pandas as pd
+from data_prep import (
+    SIM_WEIGHT_COLUMN, load_player_pool, load_simulation_details, load_sim_prepped, build_player_table
+)
+from lineup_rules import resolve_lineup_rules
+
+# Percentiles of each lineup's simulated score reported by `score_lineups`
+LINEUP_PERCENTILES = (10, 25, 50, 75, 90)
+
+# Simulated lineup totals held in memory at once while scoring (n_sims x lineups per chunk)
+SCORE_CHUNK_ENTRIES = 1 << 24
+
+# Slate weights whose effective sample size falls below this share of the sims
+# are too degenerate to compute OptimalRate with; it is reported as NaN instead
+MIN_EFFECTIVE_SAMPLE_FRACTION = 0.1
+
+
+# ============================
+# Enumeration
+# ============================
+def enumerate_lineups(players, salary_cap, roster_size, rules=None):
+    """
+    Enumerates every lineup of `roster_size` players within the salary cap that
+    satisfies the lineup rules (by default, at most one player per match).
+
+    Players of a match capped at one player form a group; every other player
+    is a group of its own. Lineups are grown one group at a time, in group
+    order, so each lineup is built exactly once. A partial lineup is dropped as
+    soon as its salary plus the cheapest way to fill the remaining spots from
+    later groups exceeds the cap, so every partial lineup that survives
+    completes to at least one valid lineup. Each step extends all partial
+    lineups at once with array operations. Locked players and match caps above
+    one are applied to the finished lineups.
+
+    Args:
+        players (pd.DataFrame): The slate's players with Player, Salary and MatchID (see `build_player_table`).
+        salary_cap (int): The maximum total salary.
+        roster_size (int): The number of players per lineup.
+        rules (dict, optional): Lineup rules (see `lineup_rules.DEFAULT_LINEUP_RULES`).
+
+    Returns:
+        np.ndarray: int16 array of shape (n_lineups, roster_size) with the row positions
+            of each lineup's players in `players`, ascending within each lineup.
+    """
+    if len(players) > np.iinfo(np.int16).max:
+        raise ValueError(f"Too many players to enumerate: {len(players)}")
+
+    salaries = players['Salary'].to_numpy(dtype=float)
+    resolved = resolve_lineup_rules(players, rules)
+    eligible = np.isfinite(salaries) & ~resolved["blocked"]
+    groups = np.arange(len(players))
+    wide_caps = []
+    for positions, cap in resolved["match_caps"]:
+        if cap == 0:
+            eligible[positions] = False
+        elif cap == 1:
+            groups[positions] = positions[0]
+        else:
+            wide_caps.append((positions, cap))
+    groups = np.unique(groups, return_inverse=True)[1]
+    num_groups = groups.max() + 1 if len(groups) else 0
+
+    # floors[g + 1, r]: cheapest salary of r players from distinct matches after group g
+    cheapest = np.full(num_groups, np.inf)
+    np.minimum.at(cheapest, groups[eligible], salaries[eligible])
+    floors = np.full((num_groups + 1, roster_size + 1), np.inf)
+    for g in range(-1, num_groups):
+        remaining = np.sort(cheapest[g + 1:])[:roster_size]
+        floors[g + 1, 0] = 0.0
+        floors[g + 1, 1:len(remaining) + 1] = np.cumsum(remaining)
+
+    members = np.zeros((1, 0), dtype=np.int16)
+    spent = np.zeros(1)
+    last_group = np.full(1, -1)
+    candidates = np.flatnonzero(eligible)
+    for picked in range(roster_size):
+        still_needed = roster_size - picked - 1
+        candidate_groups = groups[candidates]
+        completion = salaries[candidates] + floors[candidate_groups + 1, still_needed]
+        keep = (
+            (candidate_groups[None, :] > last_group[:, None])
+            & (spent[:, None] + completion[None, :] <= salary_cap)
+        )
+        states, picks = np.nonzero(keep)
+        players_picked = candidates[picks]
+        members = np.hstack([members[states], players_picked[:, None].astype(np.int16)])
+        spent = spent[states] + salaries[players_picked]
+        last_group = groups[players_picked]
+        if not len(members):
+            break
+
+    keep = np.ones(len(members), dtype=bool)
+    for player in resolved["locked"]:
+        keep &= (members == player).any(axis=1)
+    for positions, cap in wide_caps:
+        keep &= np.isin(members, positions).sum(axis=1) <= cap
+    return np.sort(members[keep], axis=1)
+
+
+# ============================
+# Scoring
+# ============================
+def _weight_columns(simulation_details):
+    """The SimWeight_<MatchID> columns the simulator writes with importance sampling."""
+    return [column for column in simulation_details.columns if str(column).startswith(f"{SIM_WEIGHT_COLUMN}_")]
+
+
+def effective_sample_size(weights):
+    """Kish effective sample size of importance weights, (sum w)^2 / sum w^2."""
+    return np.sum(weights) ** 2 / np.sum(np.square(weights))
+
+
+def simulation_weights(players, simulation_details, min_effective_fraction=MIN_EFFECTIVE_SAMPLE_FRACTION):
+    """
+    Collects the importance weights `score_lineups` needs, or None for plain sims.
+
+    The simulator writes one SimWeight_<MatchID> column per match, and matches
+    are sampled independently. A lineup's totals depend only on its own
+    matches, so they are weighted exactly by the product of those matches'
+    weights, which stays well-behaved for a handful of matches. Only the
+    OptimalRate compares lineups across the whole slate and needs the product
+    over every match. That product degenerates as matches are added, so it is
+    kept only while its effective sample size is at least `min_effective_fraction`
+    of the sims; otherwise OptimalRate is not reported.
+
+    Args:
+        players (pd.DataFrame): The slate's players with MatchID (see `build_player_table`).
+        simulation_details (pd.DataFrame): Simulated scores with any SimWeight_<MatchID> columns.
+        min_effective_fraction (float): Smallest effective sample size of the slate
+            weights, as a share of the sims.
+
+    Returns:
+        dict or None: "player_match" (each player's row in "match_log_weights", -1 for
+            players without weights), "match_log_weights" (log weight per match and sim,
+            shape (n_matches, n_sims)) and "slate" (slate weights with mean 1, or None
+            when they are degenerate).
+    """
+    weight_columns = _weight_columns(simulation_details)
+    if not weight_columns:
+        return None
+
+    match_log_weights = np.log(simulation_details[weight_columns].to_numpy(dtype=float)).T
+    row_by_column = {column: i for i, column in enumerate(weight_columns)}
+    player_match = np.array([row_by_column.get(f"{SIM_WEIGHT_COLUMN}_{match_id}", -1)
+                             for match_id in players['MatchID']], dtype=np.int64)
+
+    # Multiplied in log space so long slates cannot overflow
+    log_slate = match_log_weights.sum(axis=0)
+    slate = np.exp(log_slate - log_slate.max())
+    slate *= len(slate) / slate.sum()
+    effective_size = effective_sample_size(slate)
+    if effective_size < min_effective_fraction * len(slate):
+        logging.warning(
+            f"Slate importance weights are degenerate (effective sample size {effective_size:.0f} "
+            f"of {len(slate)} sims); OptimalRate is not reported."
+        )
+        slate = None
+
+    return {"player_match": player_match, "match_log_weights": match_log_weights, "slate": slate}
+
+
+def _lineup_weights(chunk, weights):
+    """
+    Importance weight of every lineup in every sim, the product of the weights of the
+    lineup's distinct matches, shape (len(chunk), n_sims).
+    """
+    match_log_weights = weights["match_log_weights"]
+    matches = weights["player_match"][chunk]
+    incidence = np.zeros((len(chunk), len(match_log_weights) + 1))
+    # Column -1 collects players without weights and is dropped
+    incidence[np.arange(len(chunk))[:, None], matches] = 1.0
+    log_weights = incidence[:, :-1] @ match_log_weights
+    return np.exp(log_weights - log_weights.max(axis=1, keepdims=True)).astype(np.float32)
+
+
+def player_projections(players, scores, simulation_details):
+    """
+    Returns each player's mean simulated score.
+
+    With importance sampling each player is weighted by their own match's
+    weights, which are exact for a single match and do not degenerate.
+
+    Args:
+        players (pd.DataFrame): The slate's players with MatchID (see `build_player_table`).
+        scores (np.ndarray): Simulated scores, shape (n_sims, n_players), in player row order.
+        simulation_details (pd.DataFrame): Simulated scores with any SimWeight_<MatchID> columns.
+
+    Returns:
+        np.ndarray: Projection per player, in player row order.
+    """
+    if not _weight_columns(simulation_details):
+        return scores.mean(axis=0)
+    player_weights = simulation_details[
+        [f"{SIM_WEIGHT_COLUMN}_{match_id}" for match_id in players['MatchID']]
+    ].to_numpy(dtype=float)
+    return (scores * player_weights).sum(axis=0) / player_weights.sum(axis=0)
+
+
+def _percentiles(totals, percentiles):
+    """
+    Percentiles of each row of `totals`, interpolated like `np.percentile`.
+
+    A full sort of the rows is several times faster than the partition
+    `np.percentile` runs for short float32 rows.
+    """
+    sorted_totals = np.sort(totals, axis=1)
+    result = []
+    for q in percentiles:
+        position = q / 100 * (totals.shape[1] - 1)
+        lower = int(np.floor(position))
+        upper = min(lower + 1, totals.shape[1] - 1)
+        fraction = position - lower
+        result.append(sorted_totals[:, lower] * (1 - fraction) + sorted_totals[:, upper] * fraction)
+    return result
+
+
+def _weighted_percentiles(totals, weights, percentiles):
+    """
+    Percentiles of each row of `totals` with the columns weighted by `weights`,
+    either one weight per column or one per entry of `totals`.
+    """
+    order = np.argsort(totals, axis=1)
+    cumulative = np.cumsum(np.take_along_axis(np.broadcast_to(weights, totals.shape), order, axis=1), axis=1)
+    cumulative /= cumulative[:, -1:]
+    sorted_totals = np.take_along_axis(totals, order, axis=1)
+    result = []
+    for q in percentiles:
+        position = np.minimum((cumulative < q / 100).sum(axis=1), totals.shape[1] - 1)
+        result.append(sorted_totals[np.arange(len(totals)), position])
+    return result
+
+
+def score_lineups(lineups, scores, weights=None, percentiles=LINEUP_PERCENTILES, chunk_entries=SCORE_CHUNK_ENTRIES):
+    """
+    Scores every lineup against every simulated slate.
+
+    Lineups are processed in chunks: each chunk becomes a player-by-lineup
+    indicator matrix, and one matrix product with the sims gives every
+    lineup's total in every sim. A sim's optimal lineup is the highest total
+    across all chunks (the first one on ties).
+
+    With importance weights, each lineup's Mean and percentiles are weighted
+    by its own matches' weights, and OptimalRate by the slate weights; it is
+    NaN when the slate weights are degenerate (see `simulation_weights`).
+
+    Args:
+        lineups (np.ndarray): Lineups from `enumerate_lineups`.
+        scores (np.ndarray): Simulated scores, shape (n_sims, n_players), in player row order.
+        weights (dict, optional): Importance weights from `simulation_weights`.
+        percentiles (tuple of float): Percentiles of each lineup's total to report.
+        chunk_entries (int): Lineup totals computed per chunk (n_sims x chunk size).
+
+    Returns:
+        pd.DataFrame: Mean, P<q> per percentile and OptimalRate (share of sims in which
+            the lineup scores highest) per lineup, in lineup order.
+    """
+    num_sims, num_players = scores.shape
+    scores_by_player = np.ascontiguousarray(scores.T, dtype=np.float32)
+    chunk_size = max(1, chunk_entries // max(num_sims, 1))
+
+    means = np.empty(len(lineups))
+    quantiles = np.empty((len(percentiles), len(lineups)))
+    best_total = np.full(num_sims, -np.inf)
+    best_lineup = np.zeros(num_sims, dtype=np.int64)
+
+    for start in range(0, len(lineups), chunk_size):
+        chunk = lineups[start:start + chunk_size]
+        indicator = np.zeros((len(chunk), num_players), dtype=np.float32)
+        indicator[np.arange(len(chunk))[:, None], chunk] = 1.0
+        # Lineup x sim totals, so each lineup's distribution is one contiguous row
+        totals = indicator @ scores_by_player
+
+        if weights is None:
+            means[start:start + len(chunk)] = totals.mean(axis=1)
+            quantiles[:, start:start + len(chunk)] = _percentiles(totals, percentiles)
+        else:
+            lineup_weights = _lineup_weights(chunk, weights)
+            means[start:start + len(chunk)] = (totals * lineup_weights).sum(axis=1) / lineup_weights.sum(axis=1)
+            quantiles[:, start:start + len(chunk)] = _weighted_percentiles(totals, lineup_weights, percentiles)
+
+        chunk_best = totals.argmax(axis=0)
+        chunk_best_total = totals[chunk_best, np.arange(num_sims)]
+        improved = chunk_best_total > best_total
+        best_total[improved] = chunk_best_total[improved]
+        best_lineup[improved] = start + chunk_best[improved]
+
+    if weights is None:
+        optimal_rate = np.bincount(best_lineup, minlength=len(lineups)) / num_sims
+    elif weights["slate"] is None:
+        optimal_rate = np.full(len(lineups), np.nan)
+    else:
+        optimal_rate = np.bincount(best_lineup, weights=weights["slate"], minlength=len(lineups)) / weights["slate"].sum()
+
+    stats = pd.DataFrame({"Mean": means})
+    for q, values in zip(percentiles, quantiles):
+        stats[f"P{q:g}"] = values
+    stats["OptimalRate"] = optimal_rate
+    return stats
+
+
+# ============================
+# Lineup Pool
+# ============================
+def universe_lineup_pool(players, lineups, lineup_stats, pool_size, rank_by="Mean"):
+    """
+    Turns the best enumerated lineups into a lineup pool in the builder's format.
+
+    Args:
+        players (pd.DataFrame): The slate's players (see `build_player_table`).
+        lineups (np.ndarray): Lineups from `enumerate_lineups`.
+        lineup_stats (pd.DataFrame): Scores from `score_lineups`.
+        pool_size (int): The number of lineups to keep.
+        rank_by (str): Column of `lineup_stats` the lineups are ranked by.
+
+    Returns:
+        pd.DataFrame: One row per player per lineup, with LineupID, the player columns,
+            Projection (the player's mean simulated score) and the lineup's stats.
+    """
+    order = np.argsort(-lineup_stats[rank_by].to_numpy(), kind="stable")[:pool_size]
+    rows = lineups[order].ravel()
+    lineup_pool = players.iloc[rows].reset_index(drop=True)
+    lineup_pool.insert(0, "LineupID", np.repeat(np.arange(1, len(order) + 1), lineups.shape[1]))
+    lineup_pool["Projection"] = players["Projection"].to_numpy()[rows]
+    stats = lineup_stats.iloc[order].reset_index(drop=True)
+    return pd.concat([lineup_pool, stats.loc[stats.index.repeat(lineups.shape[1])].reset_index(drop=True)], axis=1)
+
+
+def run_lineup_universe(player_pool_path, simulation_details_path, sim_prepped_path, salary_cap, roster_size,
+                        pool_size, rank_by="Mean", rules=None):
+    """
+    Enumerates and scores every valid lineup of a slate and returns the best as a lineup pool.
+
+    Args:
+        player_pool_path (str): Player pool with salaries.
+        simulation_details_path (str): Simulated scores, one column per player.
+        sim_prepped_path (str): Prepped slate with Player and MatchID.
+        salary_cap (int): The maximum salary cap for each lineup.
+        roster_size (int): The number of players per lineup.
+        pool_size (int): The number of lineups to keep.
+        rank_by (str): "Mean", "OptimalRate" or a percentile column such as "P90".
+        rules (dict, optional): Lineup rules (see `lineup_rules.DEFAULT_LINEUP_RULES`).
+
+    Returns:
+        pd.DataFrame: The lineup pool (see `universe_lineup_pool`); empty when data is missing.
+
+    Raises:
+        ValueError: When ranking by OptimalRate with importance weights too degenerate to report it.
+    """
+    player_pool = load_player_pool(player_pool_path)
+    simulation_details = load_simulation_details(simulation_details_path)
+    sim_prepped = load_sim_prepped(sim_prepped_path)
+    if player_pool.empty or simulation_details.empty or sim_prepped.empty:
+        logging.error("Failed to load necessary data files. Exiting.")
+        return pd.DataFrame()
+
+    players = build_player_table(player_pool, simulation_details, sim_prepped)
+    scores = simulation_details[players['Player']].to_numpy(dtype=float)
+    weights = simulation_weights(players, simulation_details)
+    if rank_by == "OptimalRate" and weights is not None and weights["slate"] is None:
+        raise ValueError("Cannot rank by OptimalRate: the slate importance weights are degenerate. "
+                         "Rank by Mean or a percentile, or simulate without importance sampling.")
+
+    lineups = enumerate_lineups(players, salary_cap, roster_size, rules)
+    logging.info(f"Enumerated {len(lineups)} valid lineups from {len(players)} players.")
+    if not len(lineups):
+        return pd.DataFrame()
+
+    lineup_stats = score_lineups(lineups, scores, weights)
+    players = players.assign(Projection=player_projections(players, scores, simulation_details))
+    return universe_lineup_pool(players, lineups, lineup_stats, pool_size, rank_by)
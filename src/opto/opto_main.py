@@ -15,6 +15,7 @@ BUCKET_SIZE = 15  # Number of simulations to average per projection set
 NUM_LINEUPS = 20  # Number of projection sets to generate
 SALARY_CAP = 50000  # Salary cap for each lineup
 ROSTER_SIZE = 6  # Number of players per lineup
+SOLVER = "exact"  # Lineup solver: "exact", "highs" or "pulp"
 
 
 def main():
@@ -38,7 +39,7 @@ def main():
             logging.info(summary)
 
         # Step 2: Lineup Builder
-        final_lineups = run_builder(projection_sets, SALARY_CAP, ROSTER_SIZE, NUM_LINEUPS)
+        final_lineups = run_builder(projection_sets, SALARY_CAP, ROSTER_SIZE, NUM_LINEUPS, solver=SOLVER)
 
         if not final_lineups.empty:
             logging.info("Optimization workflow completed successfully.")
@@ -0,0 +1,451 @@
+import time
+import hashlib
+import logging
+from collections import deque
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from pulp import LpProblem, LpVariable, LpMaximize, LpAffineExpression, lpSum, LpStatus, PULP_CBC_CMD
+from exact_solver import ExactLineupModel, UnsupportedConstraints
+from lineup_rules import resolve_lineup_rules
+
+try:
+    from scipy.optimize import milp, LinearConstraint, Bounds
+except ImportError:  # scipy < 1.9
+    milp = None
+
+
+# ============================
+# Lineup Models
+# ============================
+# Every model is built once per slate from the players (PlayerID, Salary, MatchID)
+# and exposes matches(projection_set), solve(projections) -> selected row positions and
+# solve_top_k(projections, k) -> the k best distinct lineups' row positions, best first.
+
+class PulpLineupModel:
+    """
+    Lineup optimization model for one slate, built once and re-solved per projection set.
+
+    The variables and the salary and roster constraints depend only on the
+    slate's players, so only the objective changes between projection sets.
+    Each solve is warm-started from the previous lineup, which stays feasible.
+    """
+
+    def __init__(self, players, salary_cap, roster_size, rules=None):
+        """
+        Args:
+            players (pd.DataFrame): The slate's players with salaries, in projection-set row order.
+            salary_cap (int): The maximum salary cap for the lineup.
+            roster_size (int): The number of players required in the lineup.
+            rules (dict, optional): Lineup rules (see `lineup_rules.DEFAULT_LINEUP_RULES`).
+        """
+        self.player_ids = players['PlayerID'].to_numpy()
+        self.prob = LpProblem("Lineup_Optimization", LpMaximize)
+        self.player_vars = [LpVariable(f"Player_{i}", cat='Binary') for i in range(len(players))]
+
+        # Constraints
+        self.prob += LpAffineExpression(zip(self.player_vars, players['Salary'].tolist())) <= salary_cap
+        self.prob += lpSum(self.player_vars) == roster_size
+
+        # Lineup rules: locked and excluded players are fixed, capped matches get a row each
+        resolved = resolve_lineup_rules(players, rules)
+        for i in resolved["locked"]:
+            self.player_vars[i].lowBound = 1
+        for i in np.flatnonzero(resolved["blocked"]):
+            self.player_vars[i].upBound = 0
+        for positions, cap in resolved["match_caps"]:
+            self.prob += lpSum(self.player_vars[i] for i in positions) <= cap
+
+        self.solver = PULP_CBC_CMD(msg=False, warmStart=True)
+        self.solution = None
+
+    def matches(self, projection_set):
+        """Checks that a projection set lists the same players in the same order as the model."""
+        return np.array_equal(projection_set['PlayerID'].to_numpy(), self.player_ids)
+
+    def solve(self, projections):
+        """
+        Solves for new projections.
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+
+        Returns:
+            np.ndarray: Row positions of the selected players.
+        """
+        # Objective: Maximize projected score
+        self.prob.setObjective(LpAffineExpression(zip(self.player_vars, np.asarray(projections, dtype=float).tolist())))
+        if self.solution is not None:
+            for var, value in zip(self.player_vars, self.solution):
+                var.setInitialValue(value)
+
+        self.prob.solve(self.solver)
+        if LpStatus[self.prob.status] != 'Optimal':
+            self.solution = None
+            raise ValueError("No optimal lineup could be created.")
+
+        self.solution = [int(round(var.varValue or 0)) for var in self.player_vars]
+        return np.flatnonzero(self.solution)
+
+    def solve_top_k(self, projections, k):
+        """
+        Finds the `k` best distinct lineups for new projections.
+
+        After each solve a no-good cut (at most roster_size - 1 of the lineup's
+        players) is added to the persistent model, so the next solve returns
+        the next-best lineup. The cuts are removed afterwards.
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+            k (int): The number of lineups to return.
+
+        Returns:
+            list of np.ndarray: Row positions of each lineup's players, best lineup first.
+        """
+        lineups = []
+        try:
+            while len(lineups) < k:
+                try:
+                    selected = self.solve(projections)
+                except ValueError:
+                    break
+                lineups.append(selected)
+                self.prob += lpSum(self.player_vars[i] for i in selected) <= len(selected) - 1, f"NoGood_{len(lineups)}"
+        finally:
+            for i in range(1, len(lineups) + 1):
+                self.prob.constraints.pop(f"NoGood_{i}", None)
+            # The last lineup violates the remaining cuts, so it no longer warm-starts the next solve
+            self.solution = None
+        return lineups
+
+
+class HighsLineupModel:
+    """
+    Lineup optimization model solved in-process by HiGHS through `scipy.optimize.milp`.
+
+    The constraint matrix is built once per slate as a sparse matrix (salary row
+    and roster row); each solve only passes the new objective vector.
+    """
+
+    def __init__(self, players, salary_cap, roster_size, rules=None):
+        """
+        Args:
+            players (pd.DataFrame): The slate's players with salaries, in projection-set row order.
+            salary_cap (int): The maximum salary cap for the lineup.
+            roster_size (int): The number of players required in the lineup.
+            rules (dict, optional): Lineup rules (see `lineup_rules.DEFAULT_LINEUP_RULES`).
+        """
+        if milp is None:
+            raise ImportError("scipy.optimize.milp requires scipy >= 1.9.")
+        self.player_ids = players['PlayerID'].to_numpy()
+        num_players = len(players)
+        resolved = resolve_lineup_rules(players, rules)
+
+        # Rows: salary, roster size, then one row per capped match
+        match_caps = resolved["match_caps"]
+        rows = np.concatenate([np.zeros(num_players), np.ones(num_players)]
+                              + [np.full(len(positions), 2 + m) for m, (positions, _) in enumerate(match_caps)])
+        columns = np.concatenate([np.arange(num_players), np.arange(num_players)]
+                                 + [positions for positions, _ in match_caps])
+        values = np.concatenate([players['Salary'].to_numpy(dtype=float), np.ones(num_players)]
+                                + [np.ones(len(positions)) for positions, _ in match_caps])
+        constraint_matrix = sparse.csr_matrix((values, (rows, columns)), shape=(2 + len(match_caps), num_players))
+        self.constraints = LinearConstraint(
+            constraint_matrix,
+            [-np.inf, roster_size] + [-np.inf] * len(match_caps),
+            [salary_cap, roster_size] + [cap for _, cap in match_caps],
+        )
+        self.integrality = np.ones(num_players)
+
+        # Locked players are fixed at one and excluded players at zero
+        lower = np.zeros(num_players)
+        lower[resolved["locked"]] = 1
+        upper = np.where(resolved["blocked"], 0.0, 1.0)
+        self.bounds = Bounds(lower, upper)
+
+    def matches(self, projection_set):
+        """Checks that a projection set lists the same players in the same order as the model."""
+        return np.array_equal(projection_set['PlayerID'].to_numpy(), self.player_ids)
+
+    def solve(self, projections):
+        """
+        Solves for new projections.
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+
+        Returns:
+            np.ndarray: Row positions of the selected players.
+        """
+        # milp minimizes, so the projections are negated
+        result = milp(
+            -np.asarray(projections, dtype=float),
+            constraints=self.constraints, integrality=self.integrality, bounds=self.bounds
+        )
+        if result.status != 0:
+            raise ValueError(f"No optimal lineup could be created: {result.message}")
+        return np.flatnonzero(np.round(result.x))
+
+    def solve_top_k(self, projections, k):
+        """
+        Finds the `k` best distinct lineups for new projections.
+
+        Each found lineup adds a no-good cut row (at most roster_size - 1 of its
+        players) to a sparse cut matrix passed alongside the slate constraints,
+        so the next solve returns the next-best lineup.
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+            k (int): The number of lineups to return.
+
+        Returns:
+            list of np.ndarray: Row positions of each lineup's players, best lineup first.
+        """
+        objective = -np.asarray(projections, dtype=float)
+        num_players = len(objective)
+        lineups = []
+        while len(lineups) < k:
+            constraints = [self.constraints]
+            if lineups:
+                rows = np.repeat(np.arange(len(lineups)), [len(lineup) for lineup in lineups])
+                cuts = sparse.csr_matrix(
+                    (np.ones(len(rows)), (rows, np.concatenate(lineups))), shape=(len(lineups), num_players)
+                )
+                constraints.append(LinearConstraint(cuts, -np.inf, [len(lineup) - 1 for lineup in lineups]))
+            result = milp(objective, constraints=constraints, integrality=self.integrality, bounds=self.bounds)
+            if result.status != 0:
+                break
+            lineups.append(np.flatnonzero(np.round(result.x)))
+        return lineups
+
+
+# ============================
+# Solve Cache
+# ============================
+class SolveCache:
+    """
+    Optimal lineups of solved problems, shared by the lineup models of a build.
+
+    Lineups are keyed by the problem (players, salaries, cap, roster size and
+    rules) and the objective rounded to `tolerance`, so a repeated projection
+    vector is answered without a solve. The most recent optima also serve as
+    anchors: a new objective provably keeps an anchor's optimum when no swap of
+    j lineup players for j others gains under the change in objective (see
+    `CachedLineupModel.solve`).
+    """
+
+    def __init__(self, tolerance=1e-6, max_anchors=16):
+        """
+        Args:
+            tolerance (float): Objective values closer than this are treated as equal.
+            max_anchors (int): Recent optima checked per solve.
+        """
+        self.tolerance = tolerance
+        self.max_anchors = max_anchors
+        self.lineups = {}
+        self.anchors = {}
+        self.hits = 0
+        self.certified = 0
+        self.misses = 0
+
+    def key(self, signature, projections, k=1):
+        """Cache key of a problem and its objective rounded to the tolerance."""
+        rounded = np.round(np.asarray(projections, dtype=float) / self.tolerance).astype(np.int64)
+        return signature, k, hashlib.sha1(rounded.tobytes()).hexdigest()
+
+    def summary(self):
+        """Hit counts, for logging."""
+        return f"{self.hits} cached, {self.certified} certified, {self.misses} solved"
+
+
+def problem_signature(players, salary_cap, roster_size, rules=None):
+    """Hashes everything but the objective that defines a lineup problem."""
+    resolved = resolve_lineup_rules(players, rules)
+    digest = hashlib.sha1()
+    digest.update(players['PlayerID'].to_numpy(dtype=np.int64).tobytes())
+    digest.update(players['Salary'].to_numpy(dtype=float).tobytes())
+    digest.update(repr((salary_cap, roster_size)).encode())
+    digest.update(resolved["locked"].tobytes())
+    digest.update(resolved["blocked"].tobytes())
+    for positions, cap in resolved["match_caps"]:
+        digest.update(positions.astype(np.int64).tobytes())
+        digest.update(repr(cap).encode())
+    return digest.hexdigest()
+
+
+class CachedLineupModel:
+    """
+    Lineup model that answers repeated or provably unchanged problems from a `SolveCache`.
+    """
+
+    def __init__(self, model, signature, cache):
+        """
+        Args:
+            model (object): The lineup model that solves cache misses.
+            signature (str): The problem's `problem_signature`.
+            cache (SolveCache): Cache shared with the build's other models.
+        """
+        self.model = model
+        self.signature = signature
+        self.cache = cache
+        self.anchors = cache.anchors.setdefault(signature, deque(maxlen=cache.max_anchors))
+
+    def matches(self, projection_set):
+        """Checks that a projection set lists the same players in the same order as the model."""
+        return self.model.matches(projection_set)
+
+    def _certified(self, projections):
+        """
+        Returns an anchor optimum that stays optimal for `projections`, or None.
+
+        Lineup x* was optimal for c0. For c = c0 + d, any other lineup x has
+        c.x* - c.x >= d.x* - d.x. It swaps some j players of x* for j others,
+        so d.x - d.x* is at most the j largest changes outside x* minus the j
+        smallest inside it. When that is always negative, x* is still the
+        only optimum, so the answer does not depend on which anchors exist.
+        """
+        if not self.anchors:
+            return None
+        anchor_projections = np.array([anchor for anchor, _ in self.anchors])
+        inside = np.zeros(anchor_projections.shape, dtype=bool)
+        for i, (_, lineup) in enumerate(self.anchors):
+            inside[i, lineup] = True
+
+        change = projections[None, :] - anchor_projections
+        size = inside.sum(axis=1).min()
+        gains = -np.sort(-np.where(inside, -np.inf, change), axis=1)[:, :size]
+        losses = np.sort(np.where(inside, change, np.inf), axis=1)[:, :size]
+        best_swap = np.cumsum(gains - losses, axis=1).max(axis=1)
+        unchanged = np.flatnonzero(best_swap < -self.cache.tolerance)
+        return self.anchors[unchanged[-1]][1] if len(unchanged) else None
+
+    def solve(self, projections):
+        """
+        Solves for new projections, reusing cached and certified optima.
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+
+        Returns:
+            np.ndarray: Row positions of the selected players.
+        """
+        projections = np.asarray(projections, dtype=float)
+        key = self.cache.key(self.signature, projections)
+        if key in self.cache.lineups:
+            self.cache.hits += 1
+            return self.cache.lineups[key].copy()
+
+        selected = self._certified(projections)
+        if selected is not None:
+            self.cache.certified += 1
+        else:
+            self.cache.misses += 1
+            selected = self.model.solve(projections)
+            self.anchors.append((projections, selected))
+        self.cache.lineups[key] = selected
+        return selected.copy()
+
+    def solve_top_k(self, projections, k):
+        """
+        Finds the `k` best distinct lineups for new projections, reusing cached results.
+
+        Args:
+            projections (array-like): Projection per player, in model row order.
+            k (int): The number of lineups to return.
+
+        Returns:
+            list of np.ndarray: Row positions of each lineup's players, best lineup first.
+        """
+        key = self.cache.key(self.signature, projections, k)
+        if key in self.cache.lineups:
+            self.cache.hits += 1
+        else:
+            self.cache.misses += 1
+            self.cache.lineups[key] = self.model.solve_top_k(projections, k)
+        return [lineup.copy() for lineup in self.cache.lineups[key]]
+
+
+# Lineup model per solver setting: "exact" runs the in-process dynamic program,
+# "highs" runs HiGHS in-process and "pulp" runs CBC through PuLP
+LINEUP_SOLVERS = {"exact": ExactLineupModel, "highs": HighsLineupModel, "pulp": PulpLineupModel}
+
+
+def create_lineup_model(solver, players, salary_cap, roster_size, rules=None, cache=None):
+    """
+    Builds the lineup model of the configured solver, falling back to PuLP when
+    the solver is not available or cannot express the lineup rules.
+
+    Args:
+        solver (str): Key of LINEUP_SOLVERS.
+        players (pd.DataFrame): The slate's players with PlayerID, Player, Salary and MatchID.
+        salary_cap (int): The maximum salary cap for the lineup.
+        roster_size (int): The number of players required in the lineup.
+        rules (dict, optional): Lineup rules (see `lineup_rules.DEFAULT_LINEUP_RULES`);
+            by default at most one player per match.
+        cache (SolveCache, optional): Cache the model answers repeated problems from.
+
+    Returns:
+        object: A lineup model with `matches`, `solve` and `solve_top_k`.
+    """
+    if solver not in LINEUP_SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}'. Expected one of {list(LINEUP_SOLVERS)}.")
+    try:
+        model = LINEUP_SOLVERS[solver](players, salary_cap, roster_size, rules)
+    except (ImportError, UnsupportedConstraints) as e:
+        logging.warning(f"Solver '{solver}' cannot be used ({e}). Falling back to PuLP.")
+        model = PulpLineupModel(players, salary_cap, roster_size, rules)
+
+    if cache is not None:
+        model = CachedLineupModel(model, problem_signature(players, salary_cap, roster_size, rules), cache)
+    return model
+
+
+# ============================
+# Benchmark
+# ============================
+def benchmark_solvers(projection_sets, salary_cap, roster_size, solvers=None, rules=None):
+    """
+    Times every solver on the same projection sets and checks they agree on the optimum.
+
+    Args:
+        projection_sets (list of pd.DataFrame): Projection sets of one slate.
+        salary_cap (int): The maximum salary cap for each lineup.
+        roster_size (int): The number of players required in each lineup.
+        solvers (list of str, optional): Solvers to compare; defaults to all of LINEUP_SOLVERS.
+        rules (dict, optional): Lineup rules (see `lineup_rules.DEFAULT_LINEUP_RULES`).
+
+    Returns:
+        pd.DataFrame: Solver, Lineups, Seconds, LineupsPerSecond and MatchesExact (whether
+            every lineup's total projection equals the first solver's).
+    """
+    rows = []
+    reference = None
+    for solver in solvers or list(LINEUP_SOLVERS):
+        model = create_lineup_model(solver, projection_sets[0], salary_cap, roster_size, rules)
+        totals = []
+        start = time.perf_counter()
+        for projection_set in projection_sets:
+            projections = projection_set['Projection'].to_numpy()
+            totals.append(projections[model.solve(projections)].sum())
+        seconds = time.perf_counter() - start
+
+        if reference is None:
+            reference = totals
+        rows.append({
+            "Solver": solver,
+            "Lineups": len(projection_sets),
+            "Seconds": seconds,
+            "LineupsPerSecond": len(projection_sets) / seconds,
+            "MatchesExact": bool(np.allclose(totals, reference)),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    from config import PLAYER_POOL_PATH, SIMULATION_DETAILS_PATH, SIM_PREPPED_PATH, BUCKET_SIZE, SALARY_CAP, ROSTER_SIZE
+    from data_prep import run_opto_data_prep
+
+    projection_sets, _ = run_opto_data_prep(
+        PLAYER_POOL_PATH, SIMULATION_DETAILS_PATH, SIM_PREPPED_PATH, BUCKET_SIZE, 200
+    )
+    print(benchmark_solvers(projection_sets, SALARY_CAP, ROSTER_SIZE).to_string(index=False))
@@ -1,5 +1,7 @@
 import logging
+import numpy as np
 import pandas as pd
+from lineup_rules import DEFAULT_LINEUP_RULES, match_cap
 
 # ============================
 # Lineup Display Functions
@@ -40,63 +42,157 @@ def display_player_exposure(lineup_pool, selected_lineups):
         logging.warning("Cannot calculate exposure. One or both DataFrames are empty.")
         return
 
-    # Calculate exposure in the larger pool
-    pool_exposure = lineup_pool['Player'].value_counts()
-
-    # Calculate exposure in the selected lineup set
-    lineup_exposure = selected_lineups['Player'].value_counts()
+    # Count lineups per PlayerID from the pools' bitsets
+    pool_exposure = CompactLineupPool(lineup_pool).exposure()
+    lineup_exposure = CompactLineupPool(selected_lineups).exposure()
+    lineup_exposure = np.pad(lineup_exposure, (0, max(len(pool_exposure) - len(lineup_exposure), 0)))
 
     # Merge into a single DataFrame
+    players = lineup_pool.drop_duplicates("PlayerID").set_index("PlayerID")["Player"]
+    player_ids = np.flatnonzero(pool_exposure)
+    player_ids = player_ids[np.argsort(-pool_exposure[player_ids], kind="stable")]
     exposure_df = pd.DataFrame({
-        "Player": pool_exposure.index,
-        "Larger Pool Exposure": pool_exposure.values,
-        "Lineup Set Exposure": lineup_exposure.reindex(pool_exposure.index, fill_value=0).values
+        "Player": players.reindex(player_ids).values,
+        "Larger Pool Exposure": pool_exposure[player_ids],
+        "Lineup Set Exposure": lineup_exposure[player_ids]
     })
 
     # Sort by lineup set exposure, descending
-    exposure_df = exposure_df.sort_values(by="Lineup Set Exposure", ascending=False)
+    exposure_df = exposure_df.sort_values(by="Lineup Set Exposure", ascending=False, kind="stable")
 
     logging.info("\nPlayer Exposure:\n")
     print(exposure_df.to_string(index=False))
 
 
+# ============================
+# Compact Lineup Pool
+# ============================
+def _popcount(words):
+    """Counts the set bits of each uint64 word."""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(words)
+    return np.unpackbits(words.view(np.uint8), axis=-1).reshape(*words.shape, 64).sum(axis=-1)
+
+
+class CompactLineupPool:
+    """
+    A lineup pool as per-lineup arrays, built once so selection and summaries
+    run as array operations instead of per-lineup DataFrame work.
+
+    Attributes:
+        lineup_ids (np.ndarray): LineupID of each lineup, ascending.
+        rows (np.ndarray): (n_lineups, max_size) positions of each lineup's rows in
+            the pool, in pool order; -1 pads shorter lineups.
+        sizes (np.ndarray): Players per lineup.
+        masks (np.ndarray): (n_lineups, n_words) uint64 bitsets of each lineup's PlayerIDs.
+        match_counts (np.ndarray): (n_lineups, n_matches) players per match.
+        match_ids (np.ndarray): MatchID of each match_counts column.
+        total_projection, total_salary (np.ndarray): Lineup totals.
+    """
+
+    def __init__(self, lineup_pool):
+        """
+        Args:
+            lineup_pool (pd.DataFrame): One row per player per lineup, with LineupID,
+                PlayerID, MatchID, Projection and Salary.
+        """
+        order = np.argsort(lineup_pool["LineupID"].to_numpy(), kind="stable")
+        self.lineup_ids, starts, self.sizes = np.unique(
+            lineup_pool["LineupID"].to_numpy()[order], return_index=True, return_counts=True
+        )
+        lineup_of_row = np.repeat(np.arange(len(self.lineup_ids)), self.sizes)
+        slot = np.arange(len(order)) - np.repeat(starts, self.sizes)
+        self.rows = np.full((len(self.lineup_ids), self.sizes.max(initial=0)), -1, dtype=np.int64)
+        self.rows[lineup_of_row, slot] = order
+
+        player_ids = lineup_pool["PlayerID"].to_numpy(dtype=np.int64)[order]
+        self.masks = np.zeros((len(self.lineup_ids), player_ids.max(initial=0) // 64 + 1), dtype=np.uint64)
+        np.bitwise_or.at(
+            self.masks, (lineup_of_row, player_ids // 64), np.left_shift(np.uint64(1), (player_ids % 64).astype(np.uint64))
+        )
+
+        # Players without a MatchID are not counted against any match
+        match_codes, self.match_ids = pd.factorize(lineup_pool["MatchID"].to_numpy()[order])
+        self.match_counts = np.zeros((len(self.lineup_ids), len(self.match_ids)), dtype=np.int16)
+        known = match_codes >= 0
+        np.add.at(self.match_counts, (lineup_of_row[known], match_codes[known]), 1)
+
+        self.total_projection = np.bincount(
+            lineup_of_row, weights=lineup_pool["Projection"].to_numpy(dtype=float)[order], minlength=len(self.lineup_ids)
+        )
+        self.total_salary = np.bincount(
+            lineup_of_row, weights=lineup_pool["Salary"].to_numpy(dtype=float)[order], minlength=len(self.lineup_ids)
+        )
+
+    def __len__(self):
+        return len(self.lineup_ids)
+
+    def within_match_caps(self, rules=None):
+        """Flags the lineups with no match over its cap (see `lineup_rules.match_cap`)."""
+        rules = {**DEFAULT_LINEUP_RULES, **(rules or {})}
+        caps = np.array([match_cap(rules, match_id) for match_id in self.match_ids], dtype=np.int64)
+        return (self.match_counts <= caps).all(axis=1)
+
+    def overlaps(self, players_mask, lineups=None):
+        """Counts how many of `players_mask`'s players each lineup (or the given lineups) contains."""
+        masks = self.masks if lineups is None else self.masks[lineups]
+        return _popcount(masks & players_mask).sum(axis=1)
+
+    def duplicate_count(self):
+        """Counts the lineups whose players equal another lineup's."""
+        _, inverse, counts = np.unique(self.masks, axis=0, return_inverse=True, return_counts=True)
+        return int((counts[inverse.ravel()] > 1).sum())
+
+    def exposure(self, lineups=None):
+        """Counts the lineups (all, or the given ones) each PlayerID appears in."""
+        masks = self.masks if lineups is None else self.masks[lineups]
+        bits = np.unpackbits(masks.view(np.uint8), axis=1, bitorder="little")
+        return bits.sum(axis=0)
+
+
 # ============================
 # Lineup Selection Functions
 # ============================
-def select_valid_lineups(lineup_pool, num_lineups, unique_players_between_lineups):
+def select_valid_lineups(lineup_pool, num_lineups, unique_players_between_lineups, rules=None):
     """
     Selects the highest-scoring valid lineups from a pool.
 
+    Lineups are taken in order of total projection. A lineup is kept when no
+    match is over its cap and it shares fewer than its size minus
+    `unique_players_between_lineups` players with all lineups kept so far.
+    The kept players only grow, so a lineup that fails once fails for good:
+    each step checks every remaining lineup against the kept players' bitset
+    at once and drops the failures.
+
+    Args:
+        rules (dict, optional): Lineup rules the pool was built with (see
+            `lineup_rules.DEFAULT_LINEUP_RULES`); lineups over a match cap are skipped.
+
     Returns:
         pd.DataFrame: The selected valid lineups.
     """
-    valid_lineups = []
-    selected_players = set()
-
-    # Group by LineupID and sort by total projection
-    grouped_lineups = lineup_pool.groupby("LineupID").agg(
-        TotalProjection=("Projection", "sum"),
-        TotalSalary=("Salary", "sum")
-    ).sort_values(by="TotalProjection", ascending=False)
-
-    for lineup_id, _ in grouped_lineups.iterrows():
-        lineup = lineup_pool[lineup_pool["LineupID"] == lineup_id]
+    if lineup_pool.empty:
+        return pd.DataFrame()
+    pool = CompactLineupPool(lineup_pool)
 
-        # Ensure no duplicate match IDs in the lineup
-        if len(lineup["MatchID"]) > len(lineup["MatchID"].drop_duplicates()):
-            continue
+    candidates = np.argsort(-pool.total_projection, kind="stable")
+    candidates = candidates[pool.within_match_caps(rules)[candidates]]
+    limits = pool.sizes - unique_players_between_lineups
 
+    selected = []
+    selected_players = np.zeros(pool.masks.shape[1], dtype=np.uint64)
+    while len(candidates) and len(selected) < num_lineups:
         # Check for unique players between lineups
-        lineup_players = set(lineup["Player"])
-        if len(selected_players.intersection(lineup_players)) < len(lineup_players) - unique_players_between_lineups:
-            valid_lineups.append(lineup)
-            selected_players.update(lineup_players)
-
-        if len(valid_lineups) >= num_lineups:
+        candidates = candidates[pool.overlaps(selected_players, candidates) < limits[candidates]]
+        if not len(candidates):
             break
+        selected.append(candidates[0])
+        selected_players |= pool.masks[candidates[0]]
+        candidates = candidates[1:]
 
-    if valid_lineups:
-        return pd.concat(valid_lineups, ignore_index=True)
+    if selected:
+        rows = pool.rows[selected].ravel()
+        return lineup_pool.iloc[rows[rows >= 0]].reset_index(drop=True)
     else:
         return pd.DataFrame()
 
@@ -116,29 +212,22 @@ def lineup_summary(lineup_pool, selected_lineups):
         logging.warning("Lineup pool is empty. Cannot compute summary.")
         return
 
+    pool = CompactLineupPool(lineup_pool)
+
     # Identify duplicate lineups in the pool
-    lineup_hashes = lineup_pool.groupby("LineupID")["Player"].apply(tuple)
-    duplicate_count = lineup_hashes.duplicated(keep=False).sum()
+    duplicate_count = pool.duplicate_count()
 
     # Identify lineups with players from the same match
-    def contains_duplicate_matches(group):
-        match_ids = group['MatchID']
-        return len(match_ids) > len(match_ids.drop_duplicates())
-
-    lineups_with_same_match = lineup_pool.groupby("LineupID").apply(contains_duplicate_matches).sum()
+    lineups_with_same_match = int((pool.match_counts > 1).any(axis=1).sum())
 
     # Summary statistics for lineup pool
-    pool_summary = lineup_pool.groupby("LineupID").agg(
-        TotalProjection=("Projection", "sum"),
-        TotalSalary=("Salary", "sum")
-    )
     pool_stats = {
-        "Average Projection": pool_summary["TotalProjection"].mean(),
-        "Min Projection": pool_summary["TotalProjection"].min(),
-        "Max Projection": pool_summary["TotalProjection"].max(),
-        "Average Salary": pool_summary["TotalSalary"].mean(),
-        "Min Salary": pool_summary["TotalSalary"].min(),
-        "Max Salary": pool_summary["TotalSalary"].max(),
+        "Average Projection": pool.total_projection.mean(),
+        "Min Projection": pool.total_projection.min(),
+        "Max Projection": pool.total_projection.max(),
+        "Average Salary": pool.total_salary.mean(),
+        "Min Salary": pool.total_salary.min(),
+        "Max Salary": pool.total_salary.max(),
     }
 
     # Summary statistics for selected lineups
@@ -1,64 +1,52 @@
 # src/sim/dk_scoring.py
 
-def calculate_dk_score(player, stats, match_stats):
+import numpy as np
+from src.sim.scoring import score_dk
+
+
+def build_scoring_stats(player, stats, match_stats):
     """
-    Calculates DraftKings score for a player based on official scoring.
+    Collects a single player's scoring stats from the per-match stat dicts.
 
     Args:
         player (dict): Player's stats after variance application.
-        stats (dict): Aggregated match stats (games_won, sets_won, breaks).
+        stats (dict): Aggregated match stats (games_won, sets_won, breaks, Aces, DoubleFaults).
         match_stats (dict): Additional match-specific stats (e.g., clean sets, straight sets).
 
     Returns:
-        float: Calculated DraftKings score.
+        dict: Scoring stats keyed by the names used in the scoring rule table.
     """
-    score = 0.0
-
-    # Match played
-    score += 30
-
-    # Games won and lost
-    games_won = stats["games_won"][player["Player"]]
-    games_lost = stats["games_won"][player["Opponent"]]
-    score += games_won * 2.5
-    score -= games_lost * 2
-
-    # Sets won and lost
     sets_won = stats["sets_won"][player["Player"]]
     sets_lost = stats["sets_won"][player["Opponent"]]
-    score += sets_won * 6
-    score -= sets_lost * 3
-
-    # Match won
-    if sets_won > sets_lost:
-        score += 6
-
-    # Aces
-    aaces = player.get("AcesPerMatch", 0)
-    score += aaces * 0.4
 
-    # Double faults
-    double_faults = player.get("DoubleFaultsPerMatch", 0)
-    score -= double_faults * 1
+    return {
+        "games_won": stats["games_won"][player["Player"]],
+        "games_lost": stats["games_won"][player["Opponent"]],
+        "sets_won": sets_won,
+        "sets_lost": sets_lost,
+        "match_won": sets_won > sets_lost,
+        "aces": stats["Aces"][player["Player"]],
+        "double_faults": stats["DoubleFaults"][player["Player"]],
+        "breaks": stats["breaks"][player["Player"]],
+        "clean_set": match_stats.get("clean_set", False),
+        "straight_sets": match_stats.get("straight_set", False),
+    }
 
-    # Breaks
-    breaks = stats["breaks"][player["Player"]]
-    score += breaks * 0.75
 
-    # Clean set bonus (6-0)
-    if match_stats.get("clean_set", False):
-        score += 4
-
-    # Straight set bonus (win match without losing a set)
-    if match_stats.get("straight_set", False):
-        score += 6
+def calculate_dk_score(player, stats, match_stats):
+    """
+    Calculates DraftKings score for a player based on official scoring.
 
-    # No double fault bonus
-    if double_faults == 0:
-        score += 2.5
+    Point values come from the rule table in `src.sim.scoring`; use `score_dk`
+    directly to score many player-sims at once.
 
-    # 10+ aces bonus
-    if aaces >= 10:
-        score += 2
+    Args:
+        player (dict): Player's stats after variance application.
+        stats (dict): Aggregated match stats (games_won, sets_won, breaks, Aces, DoubleFaults).
+        match_stats (dict): Additional match-specific stats (e.g., clean sets, straight sets).
 
-    return score
+    Returns:
+        float: Calculated DraftKings score.
+    """
+    scoring_stats = build_scoring_stats(player, stats, match_stats)
+    return float(score_dk({stat: np.atleast_1d(value) for stat, value in scoring_stats.items()})[0])
@@ -1,111 +1,209 @@
 # src/sim/full_slate_simulation.py
 
-from src.sim.game_simulation import simulate_match
+from src.sim.game_simulation import simulate_match_batch
+from src.sim.scoring import score_dk
+from src.sim.importance_sampling import SIM_WEIGHT_COLUMN, weighted_percentile
 import pandas as pd
 import numpy as np
 
-def run_full_slate_simulations(sim_prepped_df, pre_match_variance, in_match_variance, num_simulations):
+SUMMARY_PERCENTILES = [10, 25, 50, 75, 90, 95, 99]
+
+# Dense slate-level player ID assigned at prep time; sim results are indexed by it
+PLAYER_ID_COLUMN = "PlayerID"
+
+def assign_player_ids(sim_prepped_df):
+    """
+    Returns the slate's rows with a dense integer PlayerID, keeping IDs assigned at prep time.
+
+    Args:
+        sim_prepped_df (pd.DataFrame): Prepped matches data.
+
+    Returns:
+        pd.DataFrame: Rows with a PlayerID column numbering players 0..n-1.
+    """
+    if PLAYER_ID_COLUMN in sim_prepped_df.columns:
+        return sim_prepped_df
+    return sim_prepped_df.assign(**{PLAYER_ID_COLUMN: np.arange(len(sim_prepped_df))})
+
+def summarize_scores(scores, weights=None):
+    """
+    Calculates the average and summary percentiles of a player's simulated scores.
+
+    Args:
+        scores (np.ndarray): Simulated DraftKings scores.
+        weights (np.ndarray, optional): Importance weights per sim.
+
+    Returns:
+        tuple: (average, percentiles in SUMMARY_PERCENTILES order)
+    """
+    if weights is None:
+        return np.mean(scores), np.percentile(scores, SUMMARY_PERCENTILES)
+    return np.average(scores, weights=weights), weighted_percentile(scores, weights, SUMMARY_PERCENTILES)
+
+def simulate_slate_match(player1, player2, pre_match_variance, in_match_variance, num_simulations,
+                         variance_model=None, engine="game", importance_sampling=False, seed=None):
+    """
+    Simulates and scores every run of one match. Self-contained so it can run in a worker process.
+
+    Args:
+        player1 (dict): First player's row from the prepped slate.
+        player2 (dict): Second player's row from the prepped slate.
+        pre_match_variance (float): Pre-match variance factor.
+        in_match_variance (float): In-match variance factor.
+        num_simulations (int): Number of simulations.
+        variance_model (dict, optional): Correlated variance model from `build_variance_model`.
+        engine (str): "game" for game-level or "point" for point-level simulation.
+        importance_sampling (bool): Oversample tail outcomes (see `simulate_match_batch`).
+        seed (int, optional): Reseeds NumPy's global generator first, so forked workers
+            do not share a random stream.
+
+    Returns:
+        tuple: (player1_scores, player2_scores, player1_won, weights); weights is None
+            without importance sampling.
+    """
+    if seed is not None:
+        np.random.seed(seed)
+
+    # Simulate every run of the match at once
+    p1_stats, p2_stats, player1_won, weights = simulate_match_batch(
+        player1, player2, pre_match_variance, in_match_variance, num_simulations,
+        variance_model=variance_model,
+        engine=engine,
+        importance_sampling=importance_sampling
+    )
+
+    # Score both players' simulations in one vectorized pass
+    scores = score_dk({
+        stat: np.concatenate([p1_stats[stat], p2_stats[stat]])
+        for stat in score_dk.required_stats
+    })
+    return scores[:num_simulations], scores[num_simulations:], player1_won, weights if importance_sampling else None
+
+def run_full_slate_simulations(sim_prepped_df, pre_match_variance, in_match_variance, num_simulations,
+                               variance_model=None, engine="game", importance_sampling=False,
+                               executor=None, seed=None):
     """
     Runs simulations for the entire slate of matches.
 
     Args:
-        sim_prepped_df (pd.DataFrame): Prepped matches data with required columns.
+        sim_prepped_df (pd.DataFrame): Prepped matches data with required columns. Players
+            are indexed by their PlayerID, assigned from row order when absent.
         pre_match_variance (float): Pre-match variance factor.
         in_match_variance (float): In-match variance factor.
         num_simulations (int): Number of simulations per match.
+        variance_model (dict, optional): Correlated variance model from `build_variance_model`.
+            When omitted, stats are perturbed independently.
+        engine (str): "game" for game-level or "point" for point-level simulation.
+        importance_sampling (bool): Oversample tail outcomes (upsets, bagels, straight-set
+            blowouts) and report importance-weighted averages, percentiles and win counts.
+        executor (concurrent.futures.Executor, optional): Pool the matches are submitted to
+            (one task per match); they run in this process when omitted.
+        seed (int, optional): Seed every match's random stream is derived from. With an
+            executor and no seed, one is drawn from NumPy's global generator.
 
     Returns:
         pd.DataFrame: Summary of simulation results with percentiles and win-loss records.
-        pd.DataFrame: Detailed simulation scores for optimizer.
+        pd.DataFrame: Detailed simulation scores for optimizer, one column per player in
+            PlayerID order. With importance sampling it also holds a SimWeight_<MatchID>
+            column per match with that match's sim weights.
         dict: Win-loss records for all players.
     """
+    sim_prepped_df = assign_player_ids(sim_prepped_df)
+    num_players = int(sim_prepped_df[PLAYER_ID_COLUMN].max()) + 1 if len(sim_prepped_df) else 0
+    player_names = np.empty(num_players, dtype=object)
+    player_names[sim_prepped_df[PLAYER_ID_COLUMN].to_numpy()] = sim_prepped_df["Player"].to_numpy()
+
+    # Per-player results indexed by PlayerID
+    player_scores = np.zeros((num_simulations, num_players))
+    player_wins = np.zeros(num_players, dtype=int)
+    simulated = np.zeros(num_players, dtype=bool)
     results = []
-    detailed_scores = {}
-    win_loss_records = {}
+    match_weights = {}
 
+    matches = []
     for match_id, match_data in sim_prepped_df.groupby("MatchID"):
         if len(match_data) < 2:
             print(f"Warning: MatchID {match_id} does not have two players. Skipping.")
             continue
 
         # Extract player stats
-        player1 = match_data.iloc[0].to_dict()
-        player2 = match_data.iloc[1].to_dict()
-
-        # Initialize lists to store simulation data
-        player1_scores = []
-        player2_scores = []
-        match_winners = []
-
-        for _ in range(num_simulations):
-            # Simulate match
-            p1_score, p2_score, match_winner = simulate_match(
-                player1, player2, pre_match_variance, in_match_variance
-            )
-            player1_scores.append(p1_score)
-            player2_scores.append(p2_score)
-            match_winners.append(match_winner)
-
-        # Calculate statistics for Player 1
-        player1_avg = np.mean(player1_scores)
-        player1_p10 = np.percentile(player1_scores, 10)
-        player1_p25 = np.percentile(player1_scores, 25)
-        player1_p50 = np.percentile(player1_scores, 50)
-        player1_p75 = np.percentile(player1_scores, 75)
-        player1_p90 = np.percentile(player1_scores, 90)
-        player1_wins = match_winners.count(player1["Player"])
+        matches.append((match_id, match_data.iloc[0].to_dict(), match_data.iloc[1].to_dict()))
+
+    # Independent random streams per match when matches may run in other processes
+    if executor is not None and seed is None:
+        seed = int(np.random.randint(2 ** 31))
+    match_seeds = [None] * len(matches)
+    if seed is not None:
+        match_seeds = np.random.SeedSequence(seed).generate_state(len(matches)).tolist()
+
+    match_args = [
+        (player1, player2, pre_match_variance, in_match_variance, num_simulations,
+         variance_model, engine, importance_sampling, match_seed)
+        for (_, player1, player2), match_seed in zip(matches, match_seeds)
+    ]
+    if executor is None:
+        outcomes = [simulate_slate_match(*args) for args in match_args]
+    else:
+        outcomes = [future.result() for future in [executor.submit(simulate_slate_match, *args) for args in match_args]]
+
+    for (match_id, player1, player2), (player1_scores, player2_scores, player1_won, weights) in zip(matches, outcomes):
+        player1_id = int(player1[PLAYER_ID_COLUMN])
+        player2_id = int(player2[PLAYER_ID_COLUMN])
+
+        # Matches are simulated independently, so weights stay per match rather than
+        # being multiplied into one slate weight that would degenerate
+        if weights is not None:
+            match_weights[f"{SIM_WEIGHT_COLUMN}_{match_id}"] = weights
+        player_scores[:, player1_id] = player1_scores
+        player_scores[:, player2_id] = player2_scores
+
+        # Calculate statistics for both players
+        player1_avg, player1_percentiles = summarize_scores(player1_scores, weights)
+        player2_avg, player2_percentiles = summarize_scores(player2_scores, weights)
+        if weights is None:
+            player1_wins = int(player1_won.sum())
+        else:
+            player1_wins = int(round(weights[player1_won].sum()))
         player1_losses = num_simulations - player1_wins
-
-        # Calculate statistics for Player 2
-        player2_avg = np.mean(player2_scores)
-        player2_p10 = np.percentile(player2_scores, 10)
-        player2_p25 = np.percentile(player2_scores, 25)
-        player2_p50 = np.percentile(player2_scores, 50)
-        player2_p75 = np.percentile(player2_scores, 75)
-        player2_p90 = np.percentile(player2_scores, 90)
-        player2_wins = match_winners.count(player2["Player"])
-        player2_losses = num_simulations - player2_wins
-
-        # Append results for Player 1
-        results.append({
-            "MatchID": match_id,
-            "Player": player1["Player"],
-            "Average Score": player1_avg,
-            "10th Percentile": player1_p10,
-            "25th Percentile": player1_p25,
-            "50th Percentile (Median)": player1_p50,
-            "75th Percentile": player1_p75,
-            "90th Percentile": player1_p90,
-            "Total Wins": player1_wins,
-            "Total Losses": player1_losses,
-        })
-
-        # Append results for Player 2
-        results.append({
-            "MatchID": match_id,
-            "Player": player2["Player"],
-            "Average Score": player2_avg,
-            "10th Percentile": player2_p10,
-            "25th Percentile": player2_p25,
-            "50th Percentile (Median)": player2_p50,
-            "75th Percentile": player2_p75,
-            "90th Percentile": player2_p90,
-            "Total Wins": player2_wins,
-            "Total Losses": player2_losses,
-        })
-
-        # Store detailed simulation scores for optimizer
-        detailed_scores[player1["Player"]] = player1_scores
-        detailed_scores[player2["Player"]] = player2_scores
-
-        # Store win-loss records
-        win_loss_records[player1["Player"]] = {"Wins": player1_wins, "Losses": player1_losses}
-        win_loss_records[player2["Player"]] = {"Wins": player2_wins, "Losses": player2_losses}
+        player2_wins = player1_losses
+        player2_losses = player1_wins
+        player_wins[[player1_id, player2_id]] = player1_wins, player2_wins
+        simulated[[player1_id, player2_id]] = True
+
+        # Append results for both players
+        for player, average, percentiles, wins, losses in [
+            (player1, player1_avg, player1_percentiles, player1_wins, player1_losses),
+            (player2, player2_avg, player2_percentiles, player2_wins, player2_losses),
+        ]:
+            results.append({
+                "MatchID": match_id,
+                PLAYER_ID_COLUMN: int(player[PLAYER_ID_COLUMN]),
+                "Player": player["Player"],
+                "Average Score": average,
+                "10th Percentile": percentiles[0],
+                "25th Percentile": percentiles[1],
+                "50th Percentile (Median)": percentiles[2],
+                "75th Percentile": percentiles[3],
+                "90th Percentile": percentiles[4],
+                "95th Percentile": percentiles[5],
+                "99th Percentile": percentiles[6],
+                "Total Wins": wins,
+                "Total Losses": losses,
+            })
 
     # Convert results to DataFrame
     results_df = pd.DataFrame(results)
 
-    # Convert detailed_scores to DataFrame
-    detailed_scores_df = pd.DataFrame.from_dict(detailed_scores, orient="index").transpose()
+    # Detailed scores have one column per simulated player in PlayerID order, then the weight columns
+    simulated_ids = np.flatnonzero(simulated)
+    detailed_scores_df = pd.DataFrame(player_scores[:, simulated_ids], columns=player_names[simulated_ids])
+    if match_weights:
+        detailed_scores_df = pd.concat([detailed_scores_df, pd.DataFrame(match_weights)], axis=1)
+
+    win_loss_records = {
+        player_names[player_id]: {"Wins": int(player_wins[player_id]),
+                                  "Losses": int(num_simulations - player_wins[player_id])}
+        for player_id in simulated_ids
+    }
 
     return results_df, detailed_scores_df, win_loss_records
@@ -1,10 +1,25 @@
 # src/sim/game_simulation.py
 
-from src.sim.variance import apply_variance, apply_in_match_variance, STAT_DIRECTIONALITY
-from src.sim.dk_scoring import calculate_dk_score
+from src.sim.variance import (
+    apply_variance, apply_in_match_variance, apply_variance_batch, draw_correlated_shocks, STAT_DIRECTIONALITY
+)
+from src.sim.dk_scoring import build_scoring_stats
+from src.sim.scoring import score_dk
+from src.sim.point_simulation import (
+    SERVICE_POINTS_PER_GAME, calculate_point_probabilities, calculate_serve_thresholds, simulate_service_games,
+    simulate_tiebreaks
+)
+from src.sim.importance_sampling import (
+    IMPORTANCE_GAME_TILT, IMPORTANCE_POINT_TILT, IMPORTANCE_VARIANCE_SCALE, draw_proposal_directions,
+    inflated_normal_log_ratio, mixture_weights, tilt_probability
+)
 import random
 import numpy as np
 
+# Service games per player before a set reaches the 6-6 tiebreak; the
+# point-level engine pre-simulates all of them for each set.
+POINT_ENGINE_SERVICE_GAMES_PER_SET = 6
+
 def calculate_server_edge(server, returner):
     """
     Calculates the probability of the server winning a game based on player stats.
@@ -28,17 +43,19 @@ def calculate_server_edge(server, returner):
     server_edge = serve_effectiveness * (1 - return_effectiveness)
     return max(min(server_edge, 0.99), 0.01)  # Clamp between 0.01 and 0.99 to avoid extremes
 
-def simulate_game(server, returner, expected_service_games):
+def simulate_game(server, returner):
     """
-    Simulates a single game, returning the winner, number of aces, and double faults.
+    Simulates a single game, returning the winner.
+
+    Aces and double faults are not sampled per game; they are drawn once per
+    match from the number of service games played (see `sample_aces_and_double_faults`).
 
     Args:
         server (dict): Server's stats.
         returner (dict): Returner's stats.
-        expected_service_games (int): Expected number of service games per match.
 
     Returns:
-        tuple: (Winner of the game, Aces by server, Double Faults by server)
+        str: Winner of the game.
     """
     # Calculate the server's edge using available stats
     first_serve_success = server.get("FirstServePercentage", 0.5) * server.get("FirstServeWonPercentage", 0.5)
@@ -53,33 +70,56 @@ def simulate_game(server, returner, expected_service_games):
     server_edge = max(min(server_edge, 0.99), 0.01)  # Clamp between 0.01 and 0.99
 
     # Determine the game winner
-    game_winner = server["Player"] if random.random() < server_edge else returner["Player"]
+    return server["Player"] if random.random() < server_edge else returner["Player"]
+
+def calculate_server_edge_batch(server, returner):
+    """
+    Vectorized server edge used by `simulate_match_batch`, matching the formula in `simulate_game`.
+
+    Args:
+        server (dict): Server's stats; values may be per-sim arrays.
+        returner (dict): Returner's stats; values may be per-sim arrays.
+
+    Returns:
+        np.ndarray: Probability of the server holding, clamped to [0.01, 0.99].
+    """
+    first_serve = server.get("FirstServePercentage", 0.5)
+    serve_effectiveness = (first_serve * server.get("FirstServeWonPercentage", 0.5) +
+                           (1 - first_serve) * server.get("SecondServeWonPercentage", 0.5))
 
-    # Calculate per-game expected aces and double faults
-    aces_per_match = server.get("AcePercentage", 0) * expected_service_games
-    double_faults_per_match = server.get("DoubleFaultsPerServiceGame", 0) * expected_service_games
+    return_effectiveness = (returner.get("FirstServeReturnPointsWonPercentage", 0.3) +
+                            returner.get("SecondServeReturnPointsWonPercentage", 0.3)) / 2
 
-    # Avoid division by zero
-    expected_service_games = max(expected_service_games, 1)
+    return np.clip(serve_effectiveness * (1 - return_effectiveness), 0.01, 0.99)
 
-    # Per-game expected values
-    lambda_aces = aces_per_match / expected_service_games
-    lambda_double_faults = double_faults_per_match / expected_service_games
+def sample_aces_and_double_faults(player, service_games):
+    """
+    Draws a player's match ace and double-fault totals from service games played.
 
-    # Simulate number of aces and double faults using Poisson distribution
-    aces = np.random.poisson(lam=lambda_aces)
-    double_faults = np.random.poisson(lam=lambda_double_faults)
+    One Poisson draw per stat covers the whole match, and `service_games` may be
+    an array so every simulation of a match is sampled in the same call.
 
-    return game_winner, aces, double_faults
+    Args:
+        player (dict): Player stats after pre-match variance (scalars or per-sim arrays).
+        service_games (int or np.ndarray): Service games played by the player.
 
-def simulate_set(player1, player2, expected_service_games):
+    Returns:
+        tuple: (aces, double_faults)
     """
-    Simulates a single set.
+    aces_per_service_game = np.nan_to_num(player.get("AcePercentage", 0)) * SERVICE_POINTS_PER_GAME
+    double_faults_per_service_game = np.nan_to_num(player.get("DoubleFaultsPerServiceGame", 0))
+
+    aces = np.random.poisson(lam=np.maximum(aces_per_service_game * service_games, 0))
+    double_faults = np.random.poisson(lam=np.maximum(double_faults_per_service_game * service_games, 0))
+    return aces, double_faults
+
+def simulate_set(player1, player2):
+    """
+    Simulates a single set. Player 1 serves first.
 
     Args:
         player1 (dict): Player 1 stats.
         player2 (dict): Player 2 stats.
-        expected_service_games (int): Expected number of service games per match.
 
     Returns:
         tuple: (Games won by Player 1, Games won by Player 2, Breaks by Player 1, Breaks by Player 2)
@@ -94,7 +134,7 @@ def simulate_set(player1, player2, expected_service_games):
         else:
             server, returner = player2, player1
 
-        game_winner, aces, double_faults = simulate_game(server, returner, expected_service_games)
+        game_winner = simulate_game(server, returner)
 
         # Update games won
         if game_winner == player1["Player"]:
@@ -106,21 +146,15 @@ def simulate_set(player1, player2, expected_service_games):
             if server["Player"] != player2["Player"]:
                 player2_breaks += 1
 
-        # Update Aces and Double Faults
-        stats = {}  # Initialize stats for this set
-        server_stats = stats.setdefault(server["Player"], {"Aces": 0, "DoubleFaults": 0})
-        server_stats["Aces"] += aces
-        server_stats["DoubleFaults"] += double_faults
-
         # Check if set is won
         if max(player1_games, player2_games) >= 6 and abs(player1_games - player2_games) >= 2:
             break
 
     return player1_games, player2_games, player1_breaks, player2_breaks
 
-def simulate_match(player1, player2, pre_match_variance, in_match_variance):
+def simulate_match_outcome(player1, player2, pre_match_variance, in_match_variance):
     """
-    Simulates a full match and calculates DraftKings scores.
+    Simulates a full match and returns each player's scoring stats.
 
     Args:
         player1 (dict): Player 1 base stats.
@@ -129,7 +163,7 @@ def simulate_match(player1, player2, pre_match_variance, in_match_variance):
         in_match_variance (float): In-match variance factor.
 
     Returns:
-        tuple: (player1_score, player2_score, match_winner)
+        tuple: (player1_scoring_stats, player2_scoring_stats, match_winner)
     """
     # Apply pre-match variance
     player1 = apply_variance(player1, pre_match_variance)
@@ -140,6 +174,7 @@ def simulate_match(player1, player2, pre_match_variance, in_match_variance):
         "games_won": {player1["Player"]: 0, player2["Player"]: 0},
         "sets_won": {player1["Player"]: 0, player2["Player"]: 0},
         "breaks": {player1["Player"]: 0, player2["Player"]: 0},
+        "service_games": {player1["Player"]: 0, player2["Player"]: 0},
         "Aces": {player1["Player"]: 0, player2["Player"]: 0},
         "DoubleFaults": {player1["Player"]: 0, player2["Player"]: 0},
     }
@@ -150,10 +185,6 @@ def simulate_match(player1, player2, pre_match_variance, in_match_variance):
     player1_straight_set = False
     player2_straight_set = False
 
-    # Expected number of service games per match (Best of 3 sets)
-    # Assuming roughly 10 service games per player per match
-    expected_service_games = 10
-
     # Simulate Best of 3 sets
     player1_sets, player2_sets = 0, 0
     for _ in range(3):
@@ -165,12 +196,16 @@ def simulate_match(player1, player2, pre_match_variance, in_match_variance):
         player2_in_match = apply_in_match_variance(player2, in_match_variance)
 
         # Simulate a set
-        p1_games, p2_games, p1_breaks, p2_breaks = simulate_set(player1_in_match, player2_in_match, expected_service_games)
+        p1_games, p2_games, p1_breaks, p2_breaks = simulate_set(player1_in_match, player2_in_match)
         stats["games_won"][player1["Player"]] += p1_games
         stats["games_won"][player2["Player"]] += p2_games
         stats["breaks"][player1["Player"]] += p1_breaks
         stats["breaks"][player2["Player"]] += p2_breaks
 
+        # Player 1 serves first in every set
+        stats["service_games"][player1["Player"]] += (p1_games + p2_games + 1) // 2
+        stats["service_games"][player2["Player"]] += (p1_games + p2_games) // 2
+
         # Check for clean set bonus (6-0)
         if p1_games == 6 and p2_games == 0:
             player1_clean_set = True
@@ -191,6 +226,12 @@ def simulate_match(player1, player2, pre_match_variance, in_match_variance):
     if player2_sets == 2 and player1_sets == 0:
         player2_straight_set = True
 
+    # Draw match ace and double-fault totals from service games played
+    for player in (player1, player2):
+        aces, double_faults = sample_aces_and_double_faults(player, stats["service_games"][player["Player"]])
+        stats["Aces"][player["Player"]] = aces
+        stats["DoubleFaults"][player["Player"]] = double_faults
+
     # Determine the winner
     match_winner = player1["Player"] if player1_sets > player2_sets else player2["Player"]
 
@@ -200,16 +241,249 @@ def simulate_match(player1, player2, pre_match_variance, in_match_variance):
         "straight_set": player1_straight_set if match_winner == player1["Player"] else player2_straight_set,
     }
 
-    # Calculate DraftKings scores
-    p1_score = calculate_dk_score(
+    # Collect the stats the scoring rules need
+    p1_stats = build_scoring_stats(
         player=player1,
         stats=stats,
         match_stats=match_stats if match_winner == player1["Player"] else {}
     )
-    p2_score = calculate_dk_score(
+    p2_stats = build_scoring_stats(
         player=player2,
         stats=stats,
         match_stats=match_stats if match_winner == player2["Player"] else {}
     )
 
-    return p1_score, p2_score, match_winner
+    return p1_stats, p2_stats, match_winner
+
+def simulate_match(player1, player2, pre_match_variance, in_match_variance):
+    """
+    Simulates a full match and calculates DraftKings scores.
+
+    Args:
+        player1 (dict): Player 1 base stats.
+        player2 (dict): Player 2 base stats.
+        pre_match_variance (float): Pre-match variance factor.
+        in_match_variance (float): In-match variance factor.
+
+    Returns:
+        tuple: (player1_score, player2_score, match_winner)
+    """
+    p1_stats, p2_stats, match_winner = simulate_match_outcome(
+        player1, player2, pre_match_variance, in_match_variance
+    )
+    scores = score_dk({
+        stat: np.array([p1_stats[stat], p2_stats[stat]]) for stat in p1_stats
+    })
+
+    return scores[0], scores[1], match_winner
+
+def _draw_shocks(variance_model, num_simulations):
+    """Draws both players' stat shocks together, or defers to independent draws without a model."""
+    if variance_model is None:
+        return None, None
+    return draw_correlated_shocks(variance_model, 2, num_simulations)
+
+def _draw_proposal_shocks(variance_model, directions):
+    """
+    Draws both players' pre-match shocks, inflated for the sims of the tilted proposals.
+
+    Returns:
+        tuple: (shocks per player, log(q / p) of each sim's shocks under the inflated proposal)
+    """
+    stats = variance_model["stats"] if variance_model is not None else list(STAT_DIRECTIONALITY)
+    scale = np.where(directions != 0, IMPORTANCE_VARIANCE_SCALE, 1.0)
+    independent = np.random.standard_normal((2, len(directions), len(stats))) * scale[:, None]
+    log_ratio = inflated_normal_log_ratio(independent, IMPORTANCE_VARIANCE_SCALE).sum(axis=0)
+
+    if variance_model is None:
+        shocks = [dict(zip(stats, player_shocks.T)) for player_shocks in independent]
+    else:
+        shocks = draw_correlated_shocks(variance_model, 2, len(directions), independent=independent)
+    return shocks, log_ratio
+
+def _proposal_log_ratios(probability, tilt):
+    """
+    Returns [(log success ratio, log failure ratio)] of a per-sim probability for the
+    proposals tilted toward player 1 and toward player 2, where `tilt` is the signed
+    logit shift that favours player 1.
+    """
+    return [tilt_probability(probability, shift)[1:] for shift in (tilt, -tilt)]
+
+def simulate_match_batch(player1, player2, pre_match_variance, in_match_variance, num_simulations,
+                         variance_model=None, engine="game", importance_sampling=False):
+    """
+    Simulates a match `num_simulations` times at once, vectorized across sims.
+
+    Every sim plays the same game number together. With the "game" engine each
+    game is decided by one draw at the server's edge and aces and double faults
+    are drawn once per player over the service games played. With the "point"
+    engine service games are played point by point (see `simulate_service_games`),
+    sets at 6-6 are decided by a tiebreak (see `simulate_tiebreaks`), and games,
+    breaks, aces and double faults all come from the point stream.
+
+    With importance sampling, sims are drawn from an equal mixture of the plain
+    model and two proposals that inflate the pre-match shocks and tilt serve
+    probabilities toward one player, so upsets and blowouts are oversampled.
+    Each sim carries a mixture weight that restores the original distribution
+    in weighted statistics.
+
+    Args:
+        player1 (dict): Player 1 base stats.
+        player2 (dict): Player 2 base stats.
+        pre_match_variance (float): Pre-match variance factor.
+        in_match_variance (float): In-match variance factor.
+        num_simulations (int): Number of simulations to run.
+        variance_model (dict, optional): Correlated variance model from `build_variance_model`.
+            When omitted, each stat is perturbed independently.
+        engine (str): "game" for game-level or "point" for point-level simulation.
+        importance_sampling (bool): Whether to oversample tail outcomes and weight the sims.
+
+    Returns:
+        tuple: (player1_scoring_stats, player2_scoring_stats, player1_won, weights), where the
+            scoring stats are dicts of per-sim arrays, player1_won is a bool array and
+            weights are per-sim importance weights with mean 1 (all ones without importance sampling).
+    """
+    if engine not in ("game", "point"):
+        raise ValueError(f"Unknown simulation engine '{engine}'. Expected 'game' or 'point'.")
+
+    # Apply pre-match variance
+    if importance_sampling:
+        # log(q / p) of each sim's path under the proposals tilted toward player 1 and player 2
+        directions = draw_proposal_directions(num_simulations)
+        shocks, shock_log_ratio = _draw_proposal_shocks(variance_model, directions)
+        log_ratios = np.tile(shock_log_ratio, (2, 1))
+        # Tilts favour player 1 on their own serve and player 2 on theirs
+        tilt = IMPORTANCE_POINT_TILT if engine == "point" else IMPORTANCE_GAME_TILT
+        server_tilts = (tilt, -tilt)
+    else:
+        shocks = _draw_shocks(variance_model, num_simulations)
+    players = (
+        apply_variance_batch(player1, pre_match_variance, num_simulations, shocks[0]),
+        apply_variance_batch(player2, pre_match_variance, num_simulations, shocks[1]),
+    )
+
+    # Row 0 is player 1, row 1 is player 2
+    games = np.zeros((2, num_simulations), dtype=np.int64)
+    sets = np.zeros((2, num_simulations), dtype=np.int64)
+    breaks = np.zeros((2, num_simulations), dtype=np.int64)
+    service_games = np.zeros((2, num_simulations), dtype=np.int64)
+    aces = np.zeros((2, num_simulations), dtype=np.int64)
+    double_faults = np.zeros((2, num_simulations), dtype=np.int64)
+    clean_set = np.zeros((2, num_simulations), dtype=bool)
+
+    # Simulate Best of 3 sets
+    for _ in range(3):
+        in_match = sets.max(axis=0) < 2
+        if not in_match.any():
+            break
+
+        # Apply in-match variance
+        shocks = _draw_shocks(variance_model, num_simulations)
+        player1_in_match = apply_variance_batch(players[0], in_match_variance, num_simulations, shocks[0])
+        player2_in_match = apply_variance_batch(players[1], in_match_variance, num_simulations, shocks[1])
+        in_match_players = (player1_in_match, player2_in_match)
+        if engine == "point":
+            serve_thresholds = []
+            proposal_log_ratios = []
+            for i in range(2):
+                probabilities = calculate_point_probabilities(in_match_players[i], in_match_players[1 - i])
+                point_tilt = 0.0
+                if importance_sampling:
+                    point_tilt = directions * server_tilts[i]
+                    proposal_log_ratios.append(_proposal_log_ratios(probabilities["won"], server_tilts[i]))
+                serve_thresholds.append(calculate_serve_thresholds(probabilities, num_simulations, tilt=point_tilt))
+            service_game_results = [
+                simulate_service_games(thresholds, POINT_ENGINE_SERVICE_GAMES_PER_SET)
+                for thresholds in serve_thresholds
+            ]
+        else:
+            hold_probability = [
+                calculate_server_edge_batch(in_match_players[i], in_match_players[1 - i]) for i in range(2)
+            ]
+            if importance_sampling:
+                proposal_log_ratios = [_proposal_log_ratios(hold_probability[i], server_tilts[i]) for i in range(2)]
+                hold_probability = [
+                    tilt_probability(hold_probability[i], directions * server_tilts[i])[0] for i in range(2)
+                ]
+
+        # Simulate a set; player 1 serves first
+        set_games = np.zeros((2, num_simulations), dtype=np.int64)
+        in_set = in_match.copy()
+        game_number = 0
+        while in_set.any():
+            server = game_number % 2
+            returner = 1 - server
+
+            if engine == "point":
+                results = {key: value[:, game_number // 2] for key, value in service_game_results[server].items()}
+                held = results["held"]
+                aces[server] += in_set * results["aces"]
+                double_faults[server] += in_set * results["double_faults"]
+                if importance_sampling:
+                    for j, (log_won_ratio, log_lost_ratio) in enumerate(proposal_log_ratios[server]):
+                        log_ratios[j] += in_set * (results["points_won"] * log_won_ratio +
+                                                   results["points_lost"] * log_lost_ratio)
+            else:
+                held = np.random.random(num_simulations) < hold_probability[server]
+                if importance_sampling:
+                    for j, (log_held_ratio, log_broken_ratio) in enumerate(proposal_log_ratios[server]):
+                        log_ratios[j] += in_set * np.where(held, log_held_ratio, log_broken_ratio)
+
+            set_games[server] += in_set & held
+            set_games[returner] += in_set & ~held
+            breaks[returner] += in_set & ~held
+            service_games[server] += in_set
+
+            set_won = (set_games.max(axis=0) >= 6) & (np.abs(set_games[0] - set_games[1]) >= 2)
+            in_set &= ~set_won
+            game_number += 1
+
+            if engine == "point":
+                # Sets at 6-6 are decided by a tiebreak, counted as one game for its winner
+                sims = np.flatnonzero(in_set & (set_games[0] == 6) & (set_games[1] == 6))
+                if len(sims):
+                    tiebreaks = simulate_tiebreaks(serve_thresholds, sims, first_server=game_number % 2)
+                    set_games[0, sims] += tiebreaks["player1_won"]
+                    set_games[1, sims] += ~tiebreaks["player1_won"]
+                    aces[:, sims] += tiebreaks["aces"]
+                    double_faults[:, sims] += tiebreaks["double_faults"]
+                    if importance_sampling:
+                        for i in range(2):
+                            for j, ratios in enumerate(proposal_log_ratios[i]):
+                                log_won_ratio, log_lost_ratio = (np.broadcast_to(ratio, num_simulations)[sims]
+                                                                 for ratio in ratios)
+                                log_ratios[j, sims] += (tiebreaks["points_won"][i] * log_won_ratio +
+                                                        tiebreaks["points_lost"][i] * log_lost_ratio)
+                    in_set[sims] = False
+
+        games += set_games
+        clean_set |= (set_games == 6) & (set_games[::-1] == 0)
+        sets[0] += in_match & (set_games[0] > set_games[1])
+        sets[1] += in_match & (set_games[1] > set_games[0])
+
+    player1_won = sets[0] > sets[1]
+    match_won = np.stack([player1_won, ~player1_won])
+    straight_sets = match_won & (sets[::-1] == 0)
+
+    # The game engine draws match ace and double-fault totals from service games played
+    if engine == "game":
+        for i, player in enumerate(players):
+            aces[i], double_faults[i] = sample_aces_and_double_faults(player, service_games[i])
+
+    scoring_stats = []
+    for i in range(2):
+        scoring_stats.append({
+            "games_won": games[i],
+            "games_lost": games[1 - i],
+            "sets_won": sets[i],
+            "sets_lost": sets[1 - i],
+            "match_won": match_won[i],
+            "aces": aces[i],
+            "double_faults": double_faults[i],
+            "breaks": breaks[i],
+            "clean_set": clean_set[i] & match_won[i],
+            "straight_sets": straight_sets[i],
+        })
+
+    weights = mixture_weights(log_ratios) if importance_sampling else np.ones(num_simulations)
+    return scoring_stats[0], scoring_stats[1], player1_won, weights
@@ -0,0 +1,115 @@
+# src/sim/importance_sampling.py
+
+import numpy as np
+
+# Prefix of the per-match importance weight columns in the simulation details output
+SIM_WEIGHT_COLUMN = "SimWeight"
+
+# Pre-match stat shocks of the tilted proposals are drawn with their standard deviation inflated by this factor
+IMPORTANCE_VARIANCE_SCALE = 1.1
+
+# Logit shift of the hold probability in the game-level engine's tilted proposals
+IMPORTANCE_GAME_TILT = 0.8
+
+# Logit shift of the point-won probability in the point-level engine's tilted proposals.
+# Smaller than the game tilt because a service game compounds several points.
+IMPORTANCE_POINT_TILT = 0.25
+
+# Sims are split evenly between the plain model (0) and proposals tilted toward
+# player 1 (+1) and toward player 2 (-1). Tilting toward the underdog oversamples
+# upsets, tilting toward the favourite oversamples bagels and straight-set blowouts.
+PROPOSAL_DIRECTIONS = np.array([0.0, 1.0, -1.0])
+
+
+def draw_proposal_directions(num_simulations):
+    """
+    Assigns every sim to one of the mixture components in PROPOSAL_DIRECTIONS.
+
+    Args:
+        num_simulations (int): Number of simulations.
+
+    Returns:
+        np.ndarray: Tilt direction per sim (0 for the plain model).
+    """
+    return np.random.choice(PROPOSAL_DIRECTIONS, num_simulations)
+
+
+def inflated_normal_log_ratio(draws, scale):
+    """
+    Calculates log N(0, scale^2) - log N(0, 1) for standard-normal variates.
+
+    Args:
+        draws (np.ndarray): Realized variates; the last axis holds the variates of one draw.
+        scale (float): Standard deviation of the inflated proposal.
+
+    Returns:
+        np.ndarray: Log density ratio summed over the last axis.
+    """
+    return (-draws.shape[-1] * np.log(scale)
+            + 0.5 * (1 - 1 / scale ** 2) * np.square(draws).sum(axis=-1))
+
+
+def tilt_probability(probability, tilt):
+    """
+    Shifts a probability on the logit scale.
+
+    Args:
+        probability (float or np.ndarray): Target probability, strictly between 0 and 1.
+        tilt (float or np.ndarray): Logit shift; positive values raise the probability.
+
+    Returns:
+        tuple: (tilted_probability, log_success_ratio, log_failure_ratio), the
+            ratios being log(p' / p) and log((1 - p') / (1 - p)) of the tilted
+            proposal against the target.
+    """
+    probability = np.asarray(probability, dtype=np.float64)
+    tilted = 1 / (1 + np.exp(-(np.log(probability / (1 - probability)) + tilt)))
+    return tilted, np.log(tilted / probability), np.log((1 - tilted) / (1 - probability))
+
+
+def mixture_weights(log_ratios):
+    """
+    Converts proposal log-likelihood ratios into self-normalized mixture weights.
+
+    Every sim is weighted by p / q_mix, where q_mix is the equal mixture of the
+    plain model and the tilted proposals. Each sim is weighted against the whole
+    mixture, not just the component that drew it, so weights are bounded by
+    the number of components and never degenerate. Weights are computed in log
+    space, so large log ratios cannot overflow.
+
+    Args:
+        log_ratios (np.ndarray): log(q_j / p) of every sim's realized path, one row
+            per tilted proposal.
+
+    Returns:
+        np.ndarray: Weights with mean 1.
+    """
+    log_ratios = np.asarray(log_ratios, dtype=np.float64)
+    num_components = len(log_ratios) + 1
+    # log(p / q_mix) = log(num_components) - log(1 + sum_j q_j / p)
+    log_weights = np.log(num_components) - np.logaddexp.reduce(
+        np.vstack([np.zeros((1, log_ratios.shape[1])), log_ratios]), axis=0
+    )
+    weights = np.exp(log_weights - log_weights.max())
+    return weights * (len(weights) / weights.sum())
+
+
+def weighted_percentile(values, weights, percentiles):
+    """
+    Calculates percentiles of weighted samples by interpolating the weighted CDF.
+
+    Args:
+        values (np.ndarray): Sample values.
+        weights (np.ndarray): Non-negative sample weights.
+        percentiles (float or array-like): Percentiles in [0, 100].
+
+    Returns:
+        float or np.ndarray: Weighted percentile(s) of `values`.
+    """
+    order = np.argsort(values)
+    sorted_values = np.asarray(values)[order]
+    sorted_weights = np.asarray(weights, dtype=np.float64)[order]
+
+    cumulative = np.cumsum(sorted_weights)
+    cdf = (cumulative - 0.5 * sorted_weights) / cumulative[-1]
+    return np.interp(np.asarray(percentiles) / 100, cdf, sorted_values)
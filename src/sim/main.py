@@ -2,7 +2,9 @@
 
 from src.sim.full_slate_simulation import run_full_slate_simulations
 
-def run_simulation_pipeline(sim_prepped_df, pre_match_variance, in_match_variance, num_simulations):
+def run_simulation_pipeline(sim_prepped_df, pre_match_variance, in_match_variance, num_simulations,
+                            variance_model=None, engine="game", importance_sampling=False,
+                            executor=None, seed=None):
     """
     Orchestrates the simulation process for the entire slate of matches.
 
@@ -11,6 +13,11 @@ def run_simulation_pipeline(sim_prepped_df, pre_match_variance, in_match_varianc
         pre_match_variance (float): Pre-match variance factor.
         in_match_variance (float): In-match variance factor.
         num_simulations (int): Number of simulations per match.
+        variance_model (dict, optional): Correlated variance model from `build_variance_model`.
+        engine (str): "game" for game-level or "point" for point-level simulation.
+        importance_sampling (bool): Oversample tail outcomes and report importance-weighted results.
+        executor (concurrent.futures.Executor, optional): Pool to run matches on.
+        seed (int, optional): Seed the per-match random streams are derived from.
 
     Returns:
         pd.DataFrame: Summary of simulation results with percentiles and win-loss records.
@@ -22,5 +29,10 @@ def run_simulation_pipeline(sim_prepped_df, pre_match_variance, in_match_varianc
         sim_prepped_df=sim_prepped_df,
         pre_match_variance=pre_match_variance,
         in_match_variance=in_match_variance,
-        num_simulations=num_simulations
+        num_simulations=num_simulations,
+        variance_model=variance_model,
+        engine=engine,
+        importance_sampling=importance_sampling,
+        executor=executor,
+        seed=seed
     )
@@ -0,0 +1,263 @@
+# src/sim/point_simulation.py
+
+import numpy as np
+from src.sim.importance_sampling import tilt_probability
+
+# Average number of points in a service game, used to turn per-game rates into per-point rates.
+SERVICE_POINTS_PER_GAME = 6.3
+
+# Bounds of the probability of the server winning a point. Tour-level serve
+# points won rarely leave this band, and beyond it service games are all but
+# certain holds or breaks.
+POINT_WON_BOUNDS = (0.35, 0.85)
+
+# Points needed to win a tiebreak, by two clear
+TIEBREAK_POINTS = 7
+
+# Points drawn per service game in one batch. Eight points pack into one byte,
+# so a batch is resolved with 256-entry lookup tables. Games still level after
+# a batch are always at deuce and are continued with another batch.
+POINTS_PER_BATCH = 8
+
+# Points are drawn as 16-bit uniforms; probabilities are scaled to this range
+_DRAW_RANGE = 1 << 16
+
+# Multiplier that gathers the low bit of each of 8 bytes into one byte: with a
+# bool array viewed as little-endian uint64, (value * _BIT_GATHER) >> 56 puts
+# byte i's bit at bit i.
+_BIT_GATHER = np.uint64(sum(1 << (56 - 7 * byte) for byte in range(8)))
+
+# Number of set bits in every byte
+_POPCOUNT = np.array([bin(code).count("1") for code in range(256)], dtype=np.int64)
+
+
+def _build_game_tables(at_deuce):
+    """
+    Precomputes game results for every 8-point sequence of server wins (bit i = point i).
+
+    Returns:
+        tuple: (finished, held, played) lookup arrays, where `played` is a bitmask
+            of the points actually played before the game ended.
+    """
+    finished = np.zeros(256, dtype=bool)
+    held = np.zeros(256, dtype=bool)
+    played = np.full(256, 0xFF, dtype=np.uint8)
+
+    for code in range(256):
+        server_points = returner_points = 3 if at_deuce else 0
+        for point in range(POINTS_PER_BATCH):
+            if code >> point & 1:
+                server_points += 1
+            else:
+                returner_points += 1
+
+            if max(server_points, returner_points) >= 4 and abs(server_points - returner_points) >= 2:
+                finished[code] = True
+                held[code] = server_points > returner_points
+                played[code] = (1 << (point + 1)) - 1
+                break
+
+    return finished, held, played
+
+
+_NEW_GAME_TABLES = _build_game_tables(at_deuce=False)
+_DEUCE_TABLES = _build_game_tables(at_deuce=True)
+
+
+def calculate_point_probabilities(server, returner):
+    """
+    Calculates per-point serve outcome probabilities, vectorized across sims.
+
+    The serve is modelled as first serve in/out, then first or second serve
+    won, with aces and double faults as sub-outcomes of won and lost points:
+
+        P(won)          = FirstServeIn * FirstServeWon + (1 - FirstServeIn) * SecondServeWon
+        P(ace)          = aces per service point (part of P(won))
+        P(double fault) = double faults per service point (part of P(lost))
+
+    Serve-won rates blend the server's serve stats with the returner's return
+    stats, and P(won) is clamped to POINT_WON_BOUNDS.
+
+    Args:
+        server (dict): Server's stats; values may be per-sim arrays.
+        returner (dict): Returner's stats; values may be per-sim arrays.
+
+    Returns:
+        dict: "won", "ace" and "double_fault" probabilities per point.
+    """
+    first_serve_in = np.clip(server.get("FirstServePercentage", 0.5), 0.01, 0.99)
+
+    first_serve_won = (server.get("FirstServeWonPercentage", 0.5) +
+                       1 - returner.get("FirstServeReturnPointsWonPercentage", 0.3)) / 2
+    second_serve_won = (server.get("SecondServeWonPercentage", 0.5) +
+                        1 - returner.get("SecondServeReturnPointsWonPercentage", 0.3)) / 2
+
+    won = np.clip(first_serve_in * first_serve_won + (1 - first_serve_in) * second_serve_won, *POINT_WON_BOUNDS)
+
+    ace = (server.get("AcePercentage", 0.0) +
+           returner.get("AceAgainstPercentage", server.get("AcePercentage", 0.0))) / 2
+    double_fault = server.get("DoubleFaultsPerServiceGame", 0.0) / SERVICE_POINTS_PER_GAME
+
+    return {
+        "won": won,
+        "ace": np.clip(np.nan_to_num(ace), 0.0, won),
+        "double_fault": np.clip(np.nan_to_num(double_fault), 0.0, 1 - won),
+    }
+
+
+def calculate_serve_thresholds(probabilities, num_simulations, tilt=0.0):
+    """
+    Converts point probabilities into the uniform-draw boundaries used by `simulate_service_games`.
+
+    Each point uses a single 16-bit uniform draw split into disjoint regions:
+    [0, ace) ace, [ace, won) other point won, [won, double_fault] other point
+    lost, (double_fault, max] double fault.
+
+    With a non-zero `tilt` the points are drawn from a proposal whose won
+    probability is shifted on the logit scale. Aces and double faults keep their
+    share of won and lost points, so a point's importance weight only depends
+    on whether the server won it.
+
+    Args:
+        probabilities (dict): Point probabilities from `calculate_point_probabilities`.
+        num_simulations (int): Number of simulations.
+        tilt (float or np.ndarray): Logit shift of the point-won probability, per sim.
+
+    Returns:
+        tuple: (won, ace, double_fault) uint16 boundaries, each of shape (num_simulations, 1, 1).
+    """
+    won = probabilities["won"]
+    ace = probabilities["ace"]
+    double_fault = probabilities["double_fault"]
+    if np.any(tilt):
+        won = tilt_probability(probabilities["won"], tilt)[0]
+        ace = ace * won / probabilities["won"]
+        double_fault = double_fault * (1 - won) / (1 - probabilities["won"])
+
+    return tuple(
+        np.broadcast_to(threshold, num_simulations).astype(np.uint16)[:, None, None]
+        for threshold in (
+            np.floor(won * _DRAW_RANGE),
+            np.floor(ace * _DRAW_RANGE),
+            _DRAW_RANGE - 1 - np.floor(double_fault * _DRAW_RANGE),
+        )
+    )
+
+
+def simulate_service_games(thresholds, num_games, sims=None):
+    """
+    Plays `num_games` service games point by point for every simulation.
+
+    All games for all sims are drawn in one batch; only games that reach deuce
+    are continued.
+
+    Args:
+        thresholds (tuple): Boundaries from `calculate_serve_thresholds`.
+        num_games (int): Service games to play per simulation.
+        sims (np.ndarray, optional): Indices of the sims to play; defaults to all.
+
+    Returns:
+        dict: "held", "aces", "double_faults", "points_won" and "points_lost" arrays
+            of shape (len(sims), num_games).
+    """
+    if sims is not None:
+        thresholds = tuple(threshold[sims] for threshold in thresholds)
+    num_simulations = len(thresholds[0])
+
+    # First batch covers every game; most finish inside it
+    results, finished = _play_points(thresholds, (num_simulations, num_games), _NEW_GAME_TABLES)
+
+    # Continue games still at deuce
+    unfinished = ~finished
+    while unfinished.any():
+        rows, games = np.nonzero(unfinished)
+        extra, extra_finished = _play_points(
+            tuple(threshold[rows] for threshold in thresholds), (len(rows), 1), _DEUCE_TABLES
+        )
+        results["held"][rows, games] = extra["held"][:, 0]
+        for key in ("aces", "double_faults", "points_won", "points_lost"):
+            results[key][rows, games] += extra[key][:, 0]
+        unfinished[rows, games] = ~extra_finished[:, 0]
+
+    return results
+
+
+def simulate_tiebreaks(serve_thresholds, sims, first_server=0):
+    """
+    Plays a tiebreak point by point for the given sims.
+
+    The first server serves one point, then the players alternate every two
+    points until one of them has TIEBREAK_POINTS points and leads by two.
+
+    Args:
+        serve_thresholds (list): Boundaries from `calculate_serve_thresholds`, one per player.
+        sims (np.ndarray): Indices of the sims playing a tiebreak.
+        first_server (int): Player (0 or 1) serving the first point.
+
+    Returns:
+        dict: "player1_won" (bool per sim), plus "aces", "double_faults", "points_won" and
+            "points_lost" on each player's serve, as arrays of shape (2, len(sims)).
+    """
+    thresholds = [tuple(threshold[sims, 0, 0] for threshold in player_thresholds)
+                  for player_thresholds in serve_thresholds]
+    results = {key: np.zeros((2, len(sims)), dtype=np.int64)
+               for key in ("aces", "double_faults", "points_won", "points_lost")}
+    score = np.zeros((2, len(sims)), dtype=np.int64)
+    playing = np.ones(len(sims), dtype=bool)
+
+    point = 0
+    while playing.any():
+        server = (first_server + (point + 1) // 2) % 2
+        won_threshold, ace_threshold, double_fault_threshold = thresholds[server]
+        draws = np.random.randint(0, _DRAW_RANGE, size=len(sims), dtype=np.uint16)
+        won = draws < won_threshold
+
+        results["aces"][server] += playing & (draws < ace_threshold)
+        results["double_faults"][server] += playing & (draws > double_fault_threshold)
+        results["points_won"][server] += playing & won
+        results["points_lost"][server] += playing & ~won
+        score[server] += playing & won
+        score[1 - server] += playing & ~won
+
+        playing &= ~((score.max(axis=0) >= TIEBREAK_POINTS) & (np.abs(score[0] - score[1]) >= 2))
+        point += 1
+
+    results["player1_won"] = score[0] > score[1]
+    return results
+
+
+def _play_points(thresholds, shape, tables):
+    """
+    Draws one batch of points per game and resolves it through the lookup tables.
+
+    Args:
+        thresholds (tuple): (won, ace, double_fault) region boundaries, broadcastable to `shape`.
+        shape (tuple): Games to play, as (sims, games).
+        tables (tuple): Lookup tables from `_build_game_tables`.
+
+    Returns:
+        tuple: (results, finished), where results holds "held", "aces", "double_faults",
+            "points_won" and "points_lost" arrays of shape `shape`.
+    """
+    won_threshold, ace_threshold, double_fault_threshold = thresholds
+    finished_table, held_table, played_table = tables
+
+    points = np.random.randint(0, _DRAW_RANGE, size=shape + (POINTS_PER_BATCH,), dtype=np.uint16)
+    won = _pack_points(points < won_threshold)
+    ace = _pack_points(points < ace_threshold)
+    double_fault = _pack_points(points > double_fault_threshold)
+
+    played = played_table[won]
+    results = {
+        "held": held_table[won],
+        "aces": _POPCOUNT[ace & played],
+        "double_faults": _POPCOUNT[double_fault & played],
+        "points_won": _POPCOUNT[won & played],
+        "points_lost": _POPCOUNT[~won & played],
+    }
+    return results, finished_table[won]
+
+
+def _pack_points(mask):
+    """Packs a bool array with 8 points on the last axis into one byte code per game."""
+    return (mask.view(np.uint64)[..., 0] * _BIT_GATHER) >> np.uint64(56)
@@ -0,0 +1,96 @@
+# src/sim/scoring.py
+
+import numpy as np
+
+# Declarative DraftKings tennis scoring table.
+#
+# Rule types:
+#   "constant":  flat points awarded to every player-sim.
+#   "per_event": points multiplied by the count in `stat`.
+#   "threshold": points awarded when `stat` compares true against `value` using `op`.
+#   "flag":      points awarded when the boolean `stat` is set.
+DK_SCORING_RULES = [
+    {"name": "match_played", "type": "constant", "points": 30},
+    {"name": "game_won", "type": "per_event", "stat": "games_won", "points": 2.5},
+    {"name": "game_lost", "type": "per_event", "stat": "games_lost", "points": -2},
+    {"name": "set_won", "type": "per_event", "stat": "sets_won", "points": 6},
+    {"name": "set_lost", "type": "per_event", "stat": "sets_lost", "points": -3},
+    {"name": "match_won", "type": "flag", "stat": "match_won", "points": 6},
+    {"name": "ace", "type": "per_event", "stat": "aces", "points": 0.4},
+    {"name": "double_fault", "type": "per_event", "stat": "double_faults", "points": -1},
+    {"name": "break", "type": "per_event", "stat": "breaks", "points": 0.75},
+    {"name": "clean_set", "type": "flag", "stat": "clean_set", "points": 4},
+    {"name": "straight_sets", "type": "flag", "stat": "straight_sets", "points": 6},
+    {"name": "no_double_fault", "type": "threshold", "stat": "double_faults", "op": "==", "value": 0, "points": 2.5},
+    {"name": "ten_plus_aces", "type": "threshold", "stat": "aces", "op": ">=", "value": 10, "points": 2},
+]
+
+_COMPARISONS = {
+    ">=": np.greater_equal,
+    ">": np.greater,
+    "<=": np.less_equal,
+    "<": np.less,
+    "==": np.equal,
+}
+
+
+def compile_scoring_rules(rules):
+    """
+    Compiles a scoring rule table into a vectorized scoring function.
+
+    Per-event rules on the same stat are folded into a single coefficient, so
+    each stat array is touched once for the linear part of the score.
+
+    Args:
+        rules (list of dict): Scoring rules (see DK_SCORING_RULES).
+
+    Returns:
+        callable: Function taking a dict of equal-length arrays keyed by stat name
+            and returning a float64 array of fantasy points, one per player-sim.
+    """
+    constant = 0.0
+    coefficients = {}
+    conditionals = []
+
+    for rule in rules:
+        rule_type = rule["type"]
+        points = float(rule["points"])
+
+        if rule_type == "constant":
+            constant += points
+        elif rule_type == "per_event":
+            coefficients[rule["stat"]] = coefficients.get(rule["stat"], 0.0) + points
+        elif rule_type == "threshold":
+            if rule["op"] not in _COMPARISONS:
+                raise ValueError(f"Unsupported comparison '{rule['op']}' in scoring rule '{rule['name']}'.")
+            conditionals.append((rule["stat"], _COMPARISONS[rule["op"]], rule["value"], points))
+        elif rule_type == "flag":
+            conditionals.append((rule["stat"], np.not_equal, 0, points))
+        else:
+            raise ValueError(f"Unknown scoring rule type '{rule_type}' in scoring rule '{rule['name']}'.")
+
+    linear_terms = tuple(coefficients.items())
+    conditional_terms = tuple(conditionals)
+    required_stats = frozenset(coefficients) | frozenset(stat for stat, _, _, _ in conditionals)
+
+    def score(stats):
+        missing = required_stats.difference(stats)
+        if missing:
+            raise KeyError(f"Missing stats for scoring: {sorted(missing)}")
+
+        size = np.shape(stats[next(iter(required_stats))]) if required_stats else ()
+        total = np.full(size, constant, dtype=np.float64)
+
+        for stat, points in linear_terms:
+            total += points * np.asarray(stats[stat], dtype=np.float64)
+
+        for stat, compare, value, points in conditional_terms:
+            total += points * compare(stats[stat], value)
+
+        return total
+
+    score.required_stats = required_stats
+    return score
+
+
+score_dk = compile_scoring_rules(DK_SCORING_RULES)
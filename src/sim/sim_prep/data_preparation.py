@@ -1,3 +1,6 @@
+import os
+import json
+import hashlib
 import pandas as pd
 import logging
 
@@ -14,6 +17,34 @@ def setup_logger(name):
 
 logger = setup_logger("data_preparation")
 
+# Columns retained from the ATP/WTA stats files
+STATS_COLUMNS = [
+    "Player",
+    "Surface",
+    "FirstServePercentage",
+    "FirstServeWonPercentage",
+    "SecondServeWonPercentage",
+    "AcePercentage",
+    "DoubleFaultsPerServiceGame",
+    "BreakPointsFacedPerServiceGame",
+    "BreakPointsSavedPercentage",
+    "FirstServeReturnPointsWonPercentage",
+    "SecondServeReturnPointsWonPercentage",
+    "ReturnGamesWonPercentage",
+    "AceAgainstPercentage",
+    "BreakPointsConvertedPercentage"
+]
+
+# Explicit dtypes so the CSVs are parsed once into compact columns
+STATS_DTYPES = {col: "float32" for col in STATS_COLUMNS if col not in ("Player", "Surface")}
+STATS_DTYPES.update({"Player": "string", "Surface": "string"})
+
+# League of each stats file, stored as a categorical column in the snapshot
+SNAPSHOT_COLUMNS = STATS_COLUMNS + ["League"]
+
+# Stats snapshot written next to the ATP stats file (Parquet when pyarrow is installed, else pickle)
+STATS_SNAPSHOT_NAME = "stats_snapshot"
+
 def load_and_validate_match_context(match_context_csv):
     """Loads and validates the match context file."""
     try:
@@ -34,33 +65,124 @@ def load_and_validate_match_context(match_context_csv):
         logger.error(f"Error loading match context: {e}")
         raise
 
-def load_stats(atp_csv, wta_csv):
-    """Loads and combines ATP and WTA stats."""
+def _snapshot_format():
+    """Returns the snapshot file format: Parquet when pyarrow is installed, else pickle."""
+    try:
+        import pyarrow  # noqa: F401
+        return "parquet"
+    except ImportError:
+        return "pickle"
+
+def _file_signature(path, with_hash=False):
+    """Returns the mtime and size of a file, plus its SHA-256 when requested."""
+    stat = os.stat(path)
+    signature = {"mtime": stat.st_mtime, "size": stat.st_size}
+    if with_hash:
+        with open(path, "rb") as f:
+            signature["sha256"] = hashlib.sha256(f.read()).hexdigest()
+    return signature
+
+def _snapshot_is_current(metadata, sources):
+    """
+    Checks a snapshot's recorded source signatures against the source files.
+
+    A changed mtime alone does not invalidate the snapshot when the content hash
+    still matches (e.g. a file that was touched or re-downloaded unchanged); the
+    recorded mtime is updated so the file is not hashed again next time.
+
+    Returns:
+    - tuple: (is_current, metadata_updated)
+    """
+    if set(metadata.get("sources", {})) != set(sources) or metadata.get("columns") != SNAPSHOT_COLUMNS:
+        return False, False
+    updated = False
+    for path in sources:
+        recorded = metadata["sources"][path]
+        signature = _file_signature(path)
+        if signature == {"mtime": recorded["mtime"], "size": recorded["size"]}:
+            continue
+        if signature["size"] != recorded["size"] or _file_signature(path, with_hash=True)["sha256"] != recorded["sha256"]:
+            return False, False
+        recorded["mtime"] = signature["mtime"]
+        updated = True
+    return True, updated
+
+def _snapshot_hash(metadata):
+    """Hashes the snapshot's source contents and columns; keys caches derived from the stats."""
+    digest = hashlib.sha256(json.dumps(metadata["columns"]).encode())
+    for path in sorted(metadata["sources"]):
+        digest.update(metadata["sources"][path]["sha256"].encode())
+    return digest.hexdigest()
+
+def read_stats_csvs(atp_csv, wta_csv):
+    """Parses the ATP and WTA stats files into one compact frame with a League column."""
+    combined_stats = pd.concat(
+        [
+            pd.read_csv(path, usecols=STATS_COLUMNS, dtype=STATS_DTYPES)[STATS_COLUMNS].assign(League=league)
+            for path, league in ((atp_csv, "ATP"), (wta_csv, "WTA"))
+        ],
+        ignore_index=True
+    )
+    for col in ("Player", "Surface", "League"):
+        combined_stats[col] = combined_stats[col].astype("category")
+    return combined_stats
+
+def load_stats(atp_csv, wta_csv, use_cache=True):
+    """
+    Loads and combines ATP and WTA stats.
+
+    The combined frame is cached as a snapshot next to `atp_csv` and reused
+    until a source file's mtime and content hash change. The snapshot's content
+    hash is exposed as `attrs["snapshot_hash"]` for caches built on top of it.
+
+    Parameters:
+    - atp_csv (str): ATP stats file.
+    - wta_csv (str): WTA stats file.
+    - use_cache (bool): Read and write the stats snapshot (default: True).
+
+    Returns:
+    - pd.DataFrame: Player/Surface/League categoricals and float32 stat columns.
+    """
     try:
-        atp_stats = pd.read_csv(atp_csv)
-        wta_stats = pd.read_csv(wta_csv)
-        combined_stats = pd.concat([atp_stats, wta_stats], ignore_index=True)
-
-        # Columns to retain
-        keep_columns = [
-            "Player",
-            "Surface",
-            "FirstServePercentage",
-            "FirstServeWonPercentage",
-            "SecondServeWonPercentage",
-            "AcePercentage",
-            "DoubleFaultsPerServiceGame",
-            "BreakPointsFacedPerServiceGame",
-            "BreakPointsSavedPercentage",
-            "FirstServeReturnPointsWonPercentage",
-            "SecondServeReturnPointsWonPercentage",
-            "ReturnGamesWonPercentage",
-            "AceAgainstPercentage",
-            "BreakPointsConvertedPercentage"
-        ]
-
-        # Filter the DataFrame
-        combined_stats = combined_stats[keep_columns]
+        snapshot_format = _snapshot_format()
+        snapshot_path = os.path.join(os.path.dirname(os.path.abspath(atp_csv)), f"{STATS_SNAPSHOT_NAME}.{snapshot_format}")
+        metadata_path = f"{snapshot_path}.json"
+        sources = [os.path.abspath(atp_csv), os.path.abspath(wta_csv)]
+
+        if use_cache and os.path.exists(snapshot_path) and os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                metadata = json.load(f)
+            is_current, metadata_updated = _snapshot_is_current(metadata, sources)
+            if is_current:
+                if metadata_updated:
+                    with open(metadata_path, "w") as f:
+                        json.dump(metadata, f)
+                if snapshot_format == "parquet":
+                    combined_stats = pd.read_parquet(snapshot_path)
+                else:
+                    combined_stats = pd.read_pickle(snapshot_path)
+                combined_stats.attrs["snapshot_hash"] = _snapshot_hash(metadata)
+                logger.info(f"Loaded stats snapshot with {len(combined_stats)} rows from {snapshot_path}.")
+                return combined_stats
+
+        combined_stats = read_stats_csvs(atp_csv, wta_csv)
+        metadata = {
+            "columns": SNAPSHOT_COLUMNS,
+            "sources": {path: _file_signature(path, with_hash=True) for path in sources},
+        }
+        combined_stats.attrs["snapshot_hash"] = _snapshot_hash(metadata)
+
+        if use_cache:
+            try:
+                if snapshot_format == "parquet":
+                    combined_stats.to_parquet(snapshot_path, index=False)
+                else:
+                    combined_stats.to_pickle(snapshot_path)
+                with open(metadata_path, "w") as f:
+                    json.dump(metadata, f)
+                logger.info(f"Saved stats snapshot to {snapshot_path}.")
+            except Exception as e:
+                logger.warning(f"Could not save stats snapshot to {snapshot_path}: {e}")
 
         logger.info(f"Filtered stats with {len(combined_stats)} rows and {len(combined_stats.columns)} columns.")
         return combined_stats
@@ -1,16 +1,43 @@
 import os
+import glob
+import argparse
 import pandas as pd
 
 # Hardcoded paths for configuration
 MATCH_CONTEXT_CSV = "/home/ds/Desktop/ten/data/processed/match_context.csv"
 SIM_READY_CSV = "/home/ds/Desktop/ten/data/processed/sim_ready.csv"
+NAME_REGISTRY_DB = "/home/ds/Desktop/ten/data/processed/names.db"
+NAME_INDEX_DB = "/home/ds/Desktop/ten/data/processed/name_index.db"
+BASELINE_STORE_JSON = "/home/ds/Desktop/ten/data/processed/baseline_store.json"
+PREPARED_CONTEXT_CSV = "/home/ds/Desktop/ten/data/processed/prepared_context.csv"
+RESOLVED_CONTEXT_CSV = "/home/ds/Desktop/ten/data/processed/resolved_context.csv"
+STAGE_STATE_JSON = "/home/ds/Desktop/ten/data/processed/sim_prep_state.json"
 LOGS_DIR = "/home/ds/Desktop/ten/logs"
 ATP_CSV = "/home/ds/Desktop/ten/data/raw/atp.csv"
 WTA_CSV = "/home/ds/Desktop/ten/data/raw/wta.csv"
+PLAYER_DIRECTORY_CSV = "/home/ds/Desktop/ten/data/raw/player_directory.csv"
 
-from data_preparation import run_data_preparation
+# Match-by-match history (Sackmann format, e.g. one file per season). When present,
+# player stats are built from it instead of read from the scraped atp.csv/wta.csv.
+ATP_HISTORY_CSVS = sorted(glob.glob("/home/ds/Desktop/ten/data/raw/history/atp_matches_*.csv"))
+WTA_HISTORY_CSVS = sorted(glob.glob("/home/ds/Desktop/ten/data/raw/history/wta_matches_*.csv"))
+BUILT_ATP_CSV = "/home/ds/Desktop/ten/data/processed/atp_built.csv"
+BUILT_WTA_CSV = "/home/ds/Desktop/ten/data/processed/wta_built.csv"
+HISTORY_HALF_LIFE_DAYS = 365
+HISTORY_MIN_MATCHES = 5
+if ATP_HISTORY_CSVS and WTA_HISTORY_CSVS:
+    ATP_CSV, WTA_CSV = BUILT_ATP_CSV, BUILT_WTA_CSV
+
+# Files indexed for name resolution, with the column holding player names.
+# The player directory (all ATP/WTA/ITF players) is optional.
+NAME_SOURCES = {ATP_CSV: "Player", WTA_CSV: "Player", PLAYER_DIRECTORY_CSV: "Player"}
+
+from data_preparation import run_data_preparation, load_stats
 from name_resolution import run_name_resolution
+from name_registry import registry_fingerprint
 from stats_integration import run_stats_integration
+from stats_builder import build_player_stats, history_signature
+from stages import run_stages
 
 import logging
 
@@ -37,49 +64,114 @@ def save_dataframe(df, path, description):
         logger.error(f"Failed to save {description} to {path}: {e}")
         raise
 
-def run_sim_prep(sourced_strength=0.1, estimated_strength=0.1):
+def build_stages(sourced_strength=0.1, estimated_strength=0.1):
+    """
+    Declares the sim-prep stages with their inputs and outputs.
+
+    Stages hand data to each other through the prepared and resolved context
+    files; stats come from the cached snapshot in `load_stats`. The stats_build
+    stage only runs when match history files are present.
+    """
+    def build_stats():
+        build_player_stats(ATP_HISTORY_CSVS, BUILT_ATP_CSV, HISTORY_HALF_LIFE_DAYS, HISTORY_MIN_MATCHES)
+        build_player_stats(WTA_HISTORY_CSVS, BUILT_WTA_CSV, HISTORY_HALF_LIFE_DAYS, HISTORY_MIN_MATCHES)
+
+    def prepare_data():
+        match_context, _ = run_data_preparation(MATCH_CONTEXT_CSV, ATP_CSV, WTA_CSV)
+        save_dataframe(match_context, PREPARED_CONTEXT_CSV, "Prepared match context")
+
+    def resolve_names():
+        resolved_context = run_name_resolution(
+            pd.read_csv(PREPARED_CONTEXT_CSV), load_stats(ATP_CSV, WTA_CSV), NAME_REGISTRY_DB,
+            name_index_path=NAME_INDEX_DB, name_sources=NAME_SOURCES
+        )
+        save_dataframe(resolved_context, RESOLVED_CONTEXT_CSV, "Resolved match context")
+
+    def integrate_stats():
+        run_stats_integration(
+            pd.read_csv(RESOLVED_CONTEXT_CSV),
+            load_stats(ATP_CSV, WTA_CSV),
+            SIM_READY_CSV,
+            sourced_strength=sourced_strength,
+            estimated_strength=estimated_strength,
+            baseline_store_path=BASELINE_STORE_JSON,
+        )
+
+    stages = [
+        {
+            # History files can be tens of GB, so they are fingerprinted by size and
+            # mtime; build_player_stats itself only reads appended rows.
+            "name": "stats_build",
+            "run": build_stats,
+            "inputs": [],
+            "outputs": [BUILT_ATP_CSV, BUILT_WTA_CSV],
+            "params": {"half_life_days": HISTORY_HALF_LIFE_DAYS, "min_matches": HISTORY_MIN_MATCHES},
+            "fingerprints": {"history": lambda: history_signature(ATP_HISTORY_CSVS + WTA_HISTORY_CSVS)},
+        },
+        {
+            "name": "data_preparation",
+            "run": prepare_data,
+            "inputs": [MATCH_CONTEXT_CSV, ATP_CSV, WTA_CSV],
+            "outputs": [PREPARED_CONTEXT_CSV],
+        },
+        {
+            "name": "name_resolution",
+            "run": resolve_names,
+            "inputs": [PREPARED_CONTEXT_CSV, *NAME_SOURCES],
+            "outputs": [RESOLVED_CONTEXT_CSV],
+            "fingerprints": {"name_registry": lambda: registry_fingerprint(NAME_REGISTRY_DB)},
+        },
+        {
+            "name": "stats_integration",
+            "run": integrate_stats,
+            "inputs": [RESOLVED_CONTEXT_CSV, ATP_CSV, WTA_CSV],
+            "outputs": [SIM_READY_CSV],
+            "params": {"sourced_strength": sourced_strength, "estimated_strength": estimated_strength},
+        },
+    ]
+    if not (ATP_HISTORY_CSVS and WTA_HISTORY_CSVS):
+        stages = stages[1:]
+    return stages
+
+STAGE_NAMES = [stage["name"] for stage in build_stages()]
+
+def run_sim_prep(sourced_strength=0.1, estimated_strength=0.1, force=False, from_stage=None):
     """
     Orchestrate the simulation preparation process, including:
     - Data preparation
     - Name resolution
     - Stats integration
 
+    Each stage is skipped when its inputs are unchanged since its last run
+    (see `stages.run_stages`).
+
+    Args:
+        sourced_strength (float): IWP adjustment strength for sourced stats.
+        estimated_strength (float): IWP adjustment strength for estimated stats.
+        force (bool): Rerun every stage.
+        from_stage (str, optional): Rerun this stage and every stage after it.
+
     Returns:
         pd.DataFrame: The final simulation-ready DataFrame.
     """
     try:
-        # Step 1: Data Preparation
-        logger.info("Starting data preparation...")
-        match_context, combined_stats = run_data_preparation(MATCH_CONTEXT_CSV, ATP_CSV, WTA_CSV)
-        logger.info("Data preparation completed.")
-
-        # Step 2: Name Resolution
-        logger.info("Starting name resolution...")
-        resolved_context = run_name_resolution(match_context, combined_stats, SIM_READY_CSV, LOGS_DIR)
-        logger.info("Name resolution completed.")
-
-        # Step 3: Stats Integration
-        logger.info("Starting stats integration...")
-        sim_ready_df = run_stats_integration(
-            resolved_context,
-            combined_stats,
-            SIM_READY_CSV,
-            sourced_strength=sourced_strength,
-            estimated_strength=estimated_strength,
+        ran = run_stages(
+            build_stages(sourced_strength, estimated_strength), STAGE_STATE_JSON,
+            force=force, from_stage=from_stage
         )
-        logger.info("Stats integration completed.")
-
-        # Save simulation-ready data
-        save_dataframe(sim_ready_df, SIM_READY_CSV, "Simulation-ready data")
-
-        logger.info("Simulation preparation pipeline completed successfully.")
-        return sim_ready_df
+        logger.info(f"Simulation preparation pipeline completed successfully (ran: {ran or 'nothing'}).")
+        return pd.read_csv(SIM_READY_CSV)
 
     except Exception as e:
         logger.error(f"Error during simulation preparation: {e}")
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prepare simulation-ready match data.")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage.")
+    parser.add_argument("--from-stage", choices=STAGE_NAMES, help="Rerun this stage and every stage after it.")
+    args = parser.parse_args()
+
     logger.info("Starting simulation preparation pipeline...")
-    sim_ready_df = run_sim_prep()
+    sim_ready_df = run_sim_prep(force=args.force, from_stage=args.from_stage)
     logger.info("Pipeline completed. Simulation-ready data is available.")
@@ -0,0 +1,179 @@
+import os
+import re
+import sqlite3
+import logging
+import unicodedata
+from pathlib import Path
+import pandas as pd
+
+# Logger setup
+def setup_logger(name):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+logger = setup_logger("name_index")
+
+# Character n-gram length used for candidate generation
+NGRAM_SIZE = 3
+
+# Maximum candidates handed to the fuzzy scorer per name
+CANDIDATE_LIMIT = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    column_name TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    UNIQUE (source, name)
+);
+CREATE INDEX IF NOT EXISTS idx_players_key ON players (key);
+CREATE TABLE IF NOT EXISTS ngrams (
+    gram TEXT NOT NULL,
+    player_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ngrams_gram ON ngrams (gram);
+CREATE INDEX IF NOT EXISTS idx_ngrams_player ON ngrams (player_id);
+"""
+
+def normalize_name(name):
+    """
+    Builds the lookup key of a name: unicode-folded, lowercased, punctuation
+    stripped and tokens sorted, so "Begu, Irina-Camelia" and "Irina Camelia Begu"
+    share a key.
+    """
+    folded = unicodedata.normalize("NFKD", str(name))
+    folded = "".join(char for char in folded if not unicodedata.combining(char)).casefold()
+    return " ".join(sorted(re.findall(r"[^\W_]+", folded)))
+
+def name_ngrams(key, size=NGRAM_SIZE):
+    """Returns the set of character n-grams of a normalized key, padded at the edges."""
+    padded = f" {key} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+def open_name_index(index_path, sources):
+    """
+    Opens the on-disk name index and brings it up to date with its sources.
+
+    Parameters:
+    - index_path (str or Path): SQLite database file for the index.
+    - sources (dict): CSV path -> column holding player names.
+
+    Returns:
+    - sqlite3.Connection: Open connection for `find_candidates`; close it when done.
+    """
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(index_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    update_name_index(conn, sources)
+    return conn
+
+def update_name_index(conn, sources):
+    """
+    Re-indexes only the sources whose modification time or size changed, and
+    drops sources that are no longer listed or no longer exist. The whole update
+    is one transaction, so readers never see a half-built index.
+    """
+    indexed = {
+        path: (column_name, mtime, size)
+        for path, column_name, mtime, size in conn.execute("SELECT path, column_name, mtime, size FROM sources")
+    }
+
+    current = {}
+    for path, column in sources.items():
+        path = str(path)
+        if not os.path.exists(path):
+            logger.warning(f"Name source '{path}' not found. Skipping.")
+            continue
+        stat = os.stat(path)
+        current[path] = (column, stat.st_mtime, stat.st_size)
+
+    removed = set(indexed) - set(current)
+    changed = {path: signature for path, signature in current.items() if indexed.get(path) != signature}
+    if not removed and not changed:
+        return
+
+    with conn:
+        # Bulk deletes and loads are much faster without the n-gram indexes; rebuild them afterwards
+        conn.execute("DROP INDEX IF EXISTS idx_ngrams_gram")
+        conn.execute("DROP INDEX IF EXISTS idx_ngrams_player")
+
+        for path in removed | set(changed):
+            _delete_source(conn, path)
+
+        for path, (column, mtime, size) in changed.items():
+            names = pd.read_csv(path, usecols=[column])[column].dropna().astype(str).str.strip()
+            names = [name for name in dict.fromkeys(names) if name]
+            keys = [normalize_name(name) for name in names]
+
+            first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM players").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO players (id, source, name, key) VALUES (?, ?, ?, ?)",
+                ((first_id + i, path, name, key) for i, (name, key) in enumerate(zip(names, keys))),
+            )
+            conn.executemany(
+                "INSERT INTO ngrams (gram, player_id) VALUES (?, ?)",
+                ((gram, first_id + i) for i, key in enumerate(keys) for gram in name_ngrams(key)),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (path, column_name, mtime, size) VALUES (?, ?, ?, ?)",
+                (path, column, mtime, size),
+            )
+            logger.info(f"Indexed {len(names)} names from '{path}'.")
+
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ngrams_gram ON ngrams (gram)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ngrams_player ON ngrams (player_id)")
+
+    for path in removed:
+        logger.info(f"Removed name source '{path}' from the index.")
+
+def _delete_source(conn, path):
+    """Removes one source's players and n-grams (call inside a transaction)."""
+    # A source's players are inserted with one contiguous block of ids
+    first_id, last_id = conn.execute("SELECT MIN(id), MAX(id) FROM players WHERE source = ?", (path,)).fetchone()
+    if first_id is not None:
+        conn.execute("DELETE FROM ngrams WHERE player_id BETWEEN ? AND ?", (first_id, last_id))
+    conn.execute("DELETE FROM players WHERE source = ?", (path,))
+    conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+
+def find_candidates(conn, raw_name, limit=CANDIDATE_LIMIT):
+    """
+    Finds the names worth fuzzy-scoring for a raw name.
+
+    Parameters:
+    - conn (sqlite3.Connection): Connection from `open_name_index`.
+    - raw_name (str): Name to resolve.
+    - limit (int): Maximum number of candidates.
+
+    Returns:
+    - tuple: (candidate names, exact), where exact is True when the names share
+      the raw name's normalized key and need no scoring.
+    """
+    key = normalize_name(raw_name)
+    exact = [row[0] for row in conn.execute("SELECT DISTINCT name FROM players WHERE key = ?", (key,))]
+    if exact:
+        return exact, True
+
+    grams = list(name_ngrams(key))
+    rows = conn.execute(
+        f"SELECT p.name, COUNT(DISTINCT g.gram) AS hits FROM ngrams g JOIN players p ON p.id = g.player_id "
+        f"WHERE g.gram IN ({', '.join('?' * len(grams))}) "
+        f"GROUP BY p.name ORDER BY hits DESC, p.name LIMIT ?",
+        (*grams, limit),
+    ).fetchall()
+    return [name for name, _ in rows], False
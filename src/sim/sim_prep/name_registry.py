@@ -0,0 +1,197 @@
+import sqlite3
+import hashlib
+import logging
+from pathlib import Path
+import pandas as pd
+
+# Logger setup
+def setup_logger(name):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+logger = setup_logger("name_registry")
+
+# Legacy CSV files imported into a new registry created in the same directory
+LEGACY_NAMES_CSV = "names.csv"
+LEGACY_PENDING_CSV = "pending_approvals.csv"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS name_mappings (
+    raw_name TEXT PRIMARY KEY,
+    approved_name TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_name_mappings_approved ON name_mappings (approved_name);
+CREATE TABLE IF NOT EXISTS pending_approvals (
+    raw_name TEXT PRIMARY KEY,
+    candidates TEXT NOT NULL DEFAULT '',
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+def connect_registry(registry_path):
+    """
+    Opens the name registry, creating it (and importing legacy CSVs) on first use.
+
+    The database runs in WAL mode so readers never block the writer, and each
+    write helper commits in a single transaction, so concurrent runs cannot
+    leave a half-written registry.
+
+    Parameters:
+    - registry_path (str or Path): SQLite database file.
+
+    Returns:
+    - sqlite3.Connection: Open connection; close it when done.
+    """
+    registry_path = Path(registry_path)
+    is_new = not registry_path.exists()
+    registry_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(registry_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+
+    if is_new:
+        import_legacy_csvs(conn, registry_path.parent)
+    return conn
+
+def import_legacy_csvs(conn, directory):
+    """Imports names.csv and pending_approvals.csv from `directory` into a fresh registry."""
+    names_csv = Path(directory) / LEGACY_NAMES_CSV
+    pending_csv = Path(directory) / LEGACY_PENDING_CSV
+
+    with conn:
+        if names_csv.exists():
+            df = pd.read_csv(names_csv).dropna(subset=["raw_name", "approved_name"])
+            conn.executemany(
+                "INSERT OR IGNORE INTO name_mappings (raw_name, approved_name) VALUES (?, ?)",
+                df[["raw_name", "approved_name"]].itertuples(index=False, name=None),
+            )
+            logger.info(f"Imported {len(df)} name mappings from '{names_csv}'.")
+        if pending_csv.exists():
+            df = pd.read_csv(pending_csv).dropna(subset=["raw_name"])
+            conn.executemany(
+                "INSERT OR IGNORE INTO pending_approvals (raw_name, candidates) VALUES (?, ?)",
+                zip(df["raw_name"], df["candidates"].fillna("")),
+            )
+            logger.info(f"Imported {len(df)} pending approvals from '{pending_csv}'.")
+
+def format_candidates(candidates):
+    """Formats (name, score) candidates as the 'name (score);...' string stored for review."""
+    return ";".join([f"{match} ({score})" for match, score in candidates])
+
+def parse_candidates(candidates_str):
+    """Parses a stored candidates string back into candidate names."""
+    if not isinstance(candidates_str, str) or not candidates_str:
+        return []
+    return [candidate.rsplit(" (", 1)[0] for candidate in candidates_str.split(";")]
+
+def load_mappings(registry_path, raw_names=None):
+    """
+    Reads approved name mappings.
+
+    Parameters:
+    - registry_path (str or Path): SQLite database file.
+    - raw_names (iterable, optional): Only look up these names (indexed lookups); defaults to all.
+
+    Returns:
+    - dict: raw_name -> approved_name.
+    """
+    conn = connect_registry(registry_path)
+    try:
+        if raw_names is None:
+            rows = conn.execute("SELECT raw_name, approved_name FROM name_mappings").fetchall()
+        else:
+            conn.execute("CREATE TEMP TABLE lookup (raw_name TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO lookup VALUES (?)", ((name,) for name in raw_names))
+            rows = conn.execute(
+                "SELECT m.raw_name, m.approved_name FROM lookup l JOIN name_mappings m USING (raw_name)"
+            ).fetchall()
+        return dict(rows)
+    finally:
+        conn.close()
+
+def upsert_mappings(registry_path, mappings):
+    """
+    Inserts or updates approved mappings in one transaction and clears them from pending.
+
+    Parameters:
+    - registry_path (str or Path): SQLite database file.
+    - mappings (dict): raw_name -> approved_name.
+    """
+    if not mappings:
+        return
+    conn = connect_registry(registry_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO name_mappings (raw_name, approved_name) VALUES (?, ?) "
+                "ON CONFLICT (raw_name) DO UPDATE SET approved_name = excluded.approved_name, "
+                "updated_at = CURRENT_TIMESTAMP",
+                mappings.items(),
+            )
+            conn.executemany("DELETE FROM pending_approvals WHERE raw_name = ?", ((name,) for name in mappings))
+        logger.info(f"Upserted {len(mappings)} name mappings.")
+    finally:
+        conn.close()
+
+def upsert_pending(registry_path, pending):
+    """
+    Records names awaiting manual approval in one transaction.
+
+    Parameters:
+    - registry_path (str or Path): SQLite database file.
+    - pending (dict): raw_name -> list of (candidate, score).
+    """
+    if not pending:
+        return
+    conn = connect_registry(registry_path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO pending_approvals (raw_name, candidates) VALUES (?, ?) "
+                "ON CONFLICT (raw_name) DO UPDATE SET candidates = excluded.candidates, "
+                "updated_at = CURRENT_TIMESTAMP",
+                ((raw_name, format_candidates(candidates)) for raw_name, candidates in pending.items()),
+            )
+        logger.info(f"Saved {len(pending)} pending approvals.")
+    finally:
+        conn.close()
+
+def load_pending(registry_path):
+    """
+    Reads names awaiting approval.
+
+    Returns:
+    - pd.DataFrame: raw_name and candidates columns, oldest first.
+    """
+    conn = connect_registry(registry_path)
+    try:
+        return pd.read_sql_query(
+            "SELECT raw_name, candidates FROM pending_approvals ORDER BY updated_at, raw_name", conn
+        )
+    finally:
+        conn.close()
+
+def approve_name(registry_path, raw_name, approved_name):
+    """Approves a pending name, moving it into the mappings atomically."""
+    upsert_mappings(registry_path, {raw_name: approved_name})
+
+def registry_fingerprint(registry_path):
+    """Returns a hash of the approved mappings, for skipping stages whose inputs did not change."""
+    digest = hashlib.sha256()
+    conn = connect_registry(registry_path)
+    try:
+        for raw_name, approved_name in conn.execute(
+            "SELECT raw_name, approved_name FROM name_mappings ORDER BY raw_name"
+        ):
+            digest.update(f"{raw_name}\x00{approved_name}\x00".encode())
+    finally:
+        conn.close()
+    return digest.hexdigest()
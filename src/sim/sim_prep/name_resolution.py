@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
 from rapidfuzz import process, fuzz
 from pathlib import Path
 import logging
+from name_registry import load_mappings, upsert_mappings, upsert_pending
+from name_index import normalize_name, open_name_index, find_candidates
 
 # Logger setup
 def setup_logger(name):
@@ -16,101 +19,188 @@ def setup_logger(name):
 
 logger = setup_logger("name_resolution")
 
-def load_name_mapping(names_path):
-    if not names_path.exists():
-        logger.info(f"Names file '{names_path}' not found. Returning empty mapping.")
-        return {}
-
+def load_name_mapping(registry_path, raw_names=None):
     try:
-        df = pd.read_csv(names_path)
-        name_map = pd.Series(df.approved_name.values, index=df.raw_name).to_dict()
+        name_map = load_mappings(registry_path, raw_names)
         logger.info(f"Loaded name mapping with {len(name_map)} entries.")
         return name_map
     except Exception as e:
-        logger.error(f"Error loading names from '{names_path}': {e}")
+        logger.error(f"Error loading names from '{registry_path}': {e}")
         return {}
 
-def append_name_mapping(names_path, raw_name, approved_name):
+def append_name_mapping(registry_path, raw_name, approved_name):
     logger.debug(f"Appending name mapping: {raw_name} -> {approved_name}")
     try:
-        if names_path.exists():
-            df = pd.read_csv(names_path)
-        else:
-            df = pd.DataFrame(columns=["raw_name", "approved_name"])
-
-        new_mapping = {"raw_name": raw_name, "approved_name": approved_name}
-        df = pd.concat([df, pd.DataFrame([new_mapping])], ignore_index=True)
-        df.drop_duplicates(subset=["raw_name"], inplace=True)
-        df.to_csv(names_path, index=False)
-        logger.info(f"Appended name mapping: {new_mapping}")
+        upsert_mappings(registry_path, {raw_name: approved_name})
+        logger.info(f"Appended name mapping: {raw_name} -> {approved_name}")
     except Exception as e:
-        logger.error(f"Error appending name mapping to '{names_path}': {e}")
+        logger.error(f"Error appending name mapping to '{registry_path}': {e}")
+
+def build_candidate_index(choices):
+    """
+    Builds the deduplicated, normalized choice set used for fuzzy matching.
+
+    Parameters:
+    - choices (iterable): Candidate player names; repeats (one per surface) are dropped.
+
+    Returns:
+    - dict: "names" (unique original names) and "normalized" (their processed forms).
+    """
+    names = list(dict.fromkeys(str(choice) for choice in choices if pd.notna(choice) and str(choice).strip()))
+    return {"names": names, "normalized": [normalize_name(name) for name in names]}
+
+def match_names_batch(raw_names, candidate_index, threshold=80, top_k=5):
+    """
+    Scores all raw names against the candidate index in a single cdist call.
+
+    Parameters:
+    - raw_names (iterable): Names to match.
+    - candidate_index (dict): Index from `build_candidate_index`.
+    - threshold (float): Minimum WRatio score for a candidate.
+    - top_k (int or None): Candidates kept per name; None keeps every candidate above the threshold.
 
-def fuzzy_match_names(raw_name, choices, threshold=80):
-    if not raw_name or not choices:
+    Returns:
+    - dict: raw_name -> list of (candidate, score) sorted by descending score.
+    """
+    raw_names = list(dict.fromkeys(raw_names))
+    candidates = candidate_index["names"]
+    if not raw_names or not candidates:
+        return {raw_name: [] for raw_name in raw_names}
+
+    queries = [normalize_name(raw_name) for raw_name in raw_names]
+    scores = process.cdist(
+        queries, candidate_index["normalized"], scorer=fuzz.WRatio, score_cutoff=threshold, workers=-1
+    )
+
+    # Keep the top-k columns per row without sorting every candidate
+    k = scores.shape[1] if top_k is None else min(top_k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind="stable")
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    return {
+        raw_name: [
+            (candidates[column], float(score))
+            for column, score in zip(columns, row_scores) if score >= threshold
+        ]
+        for raw_name, columns, row_scores in zip(raw_names, top, top_scores)
+    }
+
+def match_names_indexed(raw_names, name_index, threshold=80, top_k=5):
+    """
+    Matches names through the on-disk name index, scoring only each name's n-gram candidates.
+
+    Parameters:
+    - raw_names (iterable): Names to match.
+    - name_index (sqlite3.Connection): Connection from `name_index.open_name_index`.
+    - threshold (float): Minimum WRatio score for a candidate.
+    - top_k (int or None): Candidates kept per name; None keeps every candidate above the threshold.
+
+    Returns:
+    - dict: raw_name -> list of (candidate, score) sorted by descending score.
+    """
+    results = {}
+    for raw_name in dict.fromkeys(raw_names):
+        candidates, exact = find_candidates(name_index, raw_name)
+        if exact:
+            # Same normalized key: no scoring needed
+            results[raw_name] = [(candidate, 100.0) for candidate in candidates[:top_k]]
+            continue
+
+        matches = process.extract(
+            normalize_name(raw_name),
+            [normalize_name(candidate) for candidate in candidates],
+            scorer=fuzz.WRatio,
+            score_cutoff=threshold,
+            limit=top_k,
+        )
+        results[raw_name] = [(candidates[position], float(score)) for _, score, position in matches]
+    return results
+
+def fuzzy_match_names(raw_name, choices=None, threshold=80, name_index=None):
+    if not raw_name or not (choices or name_index):
         logger.error("Invalid input: raw_name or choices is empty.")
         return []
 
-    matches = process.extract(raw_name, choices, scorer=fuzz.WRatio, limit=None)
-    filtered_matches = [(match[0], match[1]) for match in matches if match[1] >= threshold]
-    return filtered_matches
+    if name_index is not None:
+        return match_names_indexed([raw_name], name_index, threshold=threshold, top_k=None)[raw_name]
+    return match_names_batch([raw_name], build_candidate_index(choices), threshold=threshold, top_k=None)[raw_name]
 
-def save_pending_approval(pending_path, raw_name, candidates):
+def save_pending_approval(registry_path, raw_name, candidates):
     logger.debug(f"Saving pending approval for '{raw_name}' with candidates {candidates}.")
     try:
-        if pending_path.exists():
-            df = pd.read_csv(pending_path)
-        else:
-            df = pd.DataFrame(columns=["raw_name", "candidates"])
-
-        candidates_str = ";".join([f"{match} ({score})" for match, score in candidates])
-        new_entry = {"raw_name": raw_name, "candidates": candidates_str}
-        df = pd.concat([df, pd.DataFrame([new_entry])], ignore_index=True)
-        df.drop_duplicates(subset=["raw_name"], inplace=True)
-        df.to_csv(pending_path, index=False)
-        logger.info(f"Saved pending approval: {new_entry}")
+        upsert_pending(registry_path, {raw_name: candidates})
+        logger.info(f"Saved pending approval: {raw_name}")
     except Exception as e:
-        logger.error(f"Error saving pending approval to '{pending_path}': {e}")
+        logger.error(f"Error saving pending approval to '{registry_path}': {e}")
 
-def resolve_names(raw_names, stats_df, names_path, pending_path):
-    name_map = load_name_mapping(names_path)
+def resolve_names(raw_names, stats_df, registry_path, threshold=80, top_k=5, name_index=None):
+    unique_names = list(dict.fromkeys(raw_names))
+    name_map = load_name_mapping(registry_path, unique_names)
     resolved = {}
+    new_mappings = {}
+    pending = {}
+
+    # Score unmapped names against the name index, or against the deduplicated player set at once
+    unmapped = [raw_name for raw_name in unique_names if raw_name not in name_map]
+    if name_index is not None:
+        matches = match_names_indexed(unmapped, name_index, threshold=threshold, top_k=top_k)
+    else:
+        matches = match_names_batch(unmapped, build_candidate_index(stats_df["Player"]), threshold=threshold, top_k=top_k)
 
-    for raw_name in raw_names:
+    for raw_name in unique_names:
         if raw_name in name_map:
             resolved[raw_name] = name_map[raw_name]
             continue
 
-        candidates = fuzzy_match_names(raw_name, stats_df["Player"].tolist())
+        candidates = matches[raw_name]
         if candidates:
             top_match, score = candidates[0]
-            if score >= 80:
-                append_name_mapping(names_path, raw_name, top_match)
+            if score >= threshold:
+                new_mappings[raw_name] = top_match
                 resolved[raw_name] = top_match
             else:
-                save_pending_approval(pending_path, raw_name, candidates)
+                pending[raw_name] = candidates
         else:
-            save_pending_approval(pending_path, raw_name, [])
+            pending[raw_name] = []
+
+    # Write all new mappings and pending names in one transaction each
+    try:
+        upsert_mappings(registry_path, new_mappings)
+        upsert_pending(registry_path, pending)
+    except Exception as e:
+        logger.error(f"Error updating name registry '{registry_path}': {e}")
 
-    logger.info(f"Resolved {len(resolved)} names.")
+    logger.info(f"Resolved {len(resolved)} names; {len(pending)} pending approval.")
     return resolved
 
-def run_name_resolution(match_context, stats_df, names_path, pending_path):
+def run_name_resolution(match_context, stats_df, registry_path, name_index_path=None, name_sources=None):
     """
     Wrapper for name resolution to integrate resolved names into match context.
 
     Parameters:
     - match_context (pd.DataFrame): Match context DataFrame.
     - stats_df (pd.DataFrame): Stats DataFrame.
-    - names_path (Path): Path to the names mapping file.
-    - pending_path (Path): Path to the pending approvals file.
+    - registry_path (Path): Path to the SQLite name registry (see `name_registry`).
+    - name_index_path (Path, optional): Path to the on-disk name index (see `name_index`).
+      When omitted, names are matched against the players in `stats_df`.
+    - name_sources (dict, optional): CSV path -> name column indexed into the name index.
 
     Returns:
     - pd.DataFrame: Updated match context DataFrame with resolved names.
     """
     logger.info("Running name resolution...")
     raw_names = match_context["Name"].tolist()
-    resolved_dict = resolve_names(raw_names, stats_df, names_path, pending_path)
+    if name_index_path is None:
+        resolved_dict = resolve_names(raw_names, stats_df, registry_path)
+    else:
+        name_index = open_name_index(name_index_path, name_sources or {})
+        try:
+            resolved_dict = resolve_names(raw_names, stats_df, registry_path, name_index=name_index)
+        finally:
+            name_index.close()
 
     # Add resolved names to match_context
     match_context["ResolvedName"] = match_context["Name"].map(resolved_dict)
@@ -0,0 +1,107 @@
+import os
+import json
+import hashlib
+import logging
+
+# Logger setup
+def setup_logger(name):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+logger = setup_logger("stages")
+
+def file_fingerprint(path):
+    """Returns the SHA-256 of a file's contents, or "missing" when it does not exist."""
+    if not os.path.exists(path):
+        return "missing"
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stage_fingerprint(stage):
+    """
+    Fingerprints a stage from the contents of its input files, its parameters and
+    any extra fingerprints it declares (e.g. database contents).
+    """
+    payload = {
+        "inputs": {path: file_fingerprint(path) for path in stage.get("inputs", [])},
+        "params": stage.get("params", {}),
+        "extra": {name: fingerprint() for name, fingerprint in stage.get("fingerprints", {}).items()},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def load_stage_state(state_path):
+    """Reads the fingerprints recorded by the last run."""
+    if not os.path.exists(state_path):
+        return {}
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable stage state '{state_path}': {e}")
+        return {}
+
+def save_stage_state(state_path, state):
+    """Writes stage fingerprints atomically."""
+    os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+    temp_path = f"{state_path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, state_path)
+
+def run_stages(stages, state_path, force=False, from_stage=None):
+    """
+    Runs a list of stages in order, make-style.
+
+    Each stage is a dict with:
+    - "name" (str): Stage name.
+    - "run" (callable): Runs the stage; communicates with other stages only through files.
+    - "inputs" (list): Files the stage reads; upstream stages' outputs included.
+    - "outputs" (list): Files the stage writes.
+    - "params" (dict, optional): Settings that change the stage's result.
+    - "fingerprints" (dict, optional): name -> callable returning a fingerprint of
+      non-file inputs.
+
+    A stage is skipped when its fingerprint matches the one recorded after its
+    last run and all its outputs exist. Fingerprints are recorded after a stage
+    runs, so a stage that updates one of its own inputs (such as the name
+    registry) is not rerun on the next pass.
+
+    Parameters:
+    - stages (list of dict): Stages in dependency order.
+    - state_path (str): JSON file holding recorded fingerprints.
+    - force (bool): Rerun every stage.
+    - from_stage (str, optional): Rerun this stage and every stage after it.
+
+    Returns:
+    - list: Names of the stages that ran.
+    """
+    names = [stage["name"] for stage in stages]
+    if from_stage is not None and from_stage not in names:
+        raise ValueError(f"Unknown stage '{from_stage}'. Expected one of {names}.")
+    forced_from = 0 if force else names.index(from_stage) if from_stage is not None else len(stages)
+
+    state = load_stage_state(state_path)
+    ran = []
+    for position, stage in enumerate(stages):
+        name = stage["name"]
+        outputs_exist = all(os.path.exists(path) for path in stage.get("outputs", []))
+        if position < forced_from and outputs_exist and state.get(name) == stage_fingerprint(stage):
+            logger.info(f"Stage '{name}' is up to date. Skipping.")
+            continue
+
+        logger.info(f"Running stage '{name}'...")
+        stage["run"]()
+        state[name] = stage_fingerprint(stage)
+        save_stage_state(state_path, state)
+        ran.append(name)
+
+    return ran
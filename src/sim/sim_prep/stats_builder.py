@@ -0,0 +1,317 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+
+from data_preparation import STATS_COLUMNS
+
+# Logger setup
+def setup_logger(name):
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    return logger
+
+logger = setup_logger("stats_builder")
+
+# Per-player box-score columns of the match history files (Sackmann format: w_ace, l_ace, ...)
+BOX_SCORE_COLUMNS = ["ace", "df", "svpt", "1stIn", "1stWon", "2ndWon", "SvGms", "bpSaved", "bpFaced"]
+
+# Match history columns read from each file
+HISTORY_COLUMNS = (
+    ["tourney_date", "surface", "winner_name", "loser_name"]
+    + [f"{side}_{col}" for side in ("w", "l") for col in BOX_SCORE_COLUMNS]
+)
+
+# Summed per (Player, Surface): the player's own serve totals and their opponents' serve totals
+SUM_COLUMNS = BOX_SCORE_COLUMNS + [f"opp_{col}" for col in BOX_SCORE_COLUMNS]
+
+# Rows read per chunk
+CHUNK_SIZE = 500_000
+
+# Bytes read per block when hashing the already-aggregated prefix of a history file
+HASH_BLOCK_BYTES = 1 << 20
+
+def _ratio(numerator, denominator):
+    """Divides two series, leaving NaN where the denominator is zero."""
+    return numerator / denominator.where(denominator > 0)
+
+def _prefix_hash(path, length):
+    """Hashes the first `length` bytes of a file, streamed in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            block = f.read(min(length, HASH_BLOCK_BYTES))
+            if not block:
+                break
+            digest.update(block)
+            length -= len(block)
+    return digest.hexdigest()
+
+def _ends_with_newline(path, offset):
+    """Checks that the byte before `offset` is a newline, so appended rows start on a fresh line."""
+    if offset == 0:
+        return True
+    with open(path, "rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+def _complete_rows_end(path, size):
+    """
+    Returns the byte offset just past the last newline within the first `size` bytes,
+    so a row still being written is left for the next build.
+    """
+    with open(path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(end - (1 << 16), 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+class _BoundedReader:
+    """Binary file wrapper that reports EOF at byte `end`, so rows appended later are not read."""
+
+    def __init__(self, f, end):
+        self.f = f
+        self.end = end
+
+    def read(self, size=-1):
+        remaining = max(self.end - self.f.tell(), 0)
+        return self.f.read(remaining if size is None or size < 0 else min(size, remaining))
+
+    def __iter__(self):
+        while True:
+            line = self.f.readline(max(self.end - self.f.tell(), 0))
+            if not line:
+                return
+            yield line
+
+def read_history_chunks(path, offset=0, end=None, chunksize=CHUNK_SIZE):
+    """
+    Streams a match history file in chunks, from byte `offset` up to byte `end`.
+
+    Parameters:
+    - path (str): Match history CSV.
+    - offset (int): Byte offset of the first unread row; 0 reads the whole file.
+    - end (int, optional): Byte offset to stop at, on a row boundary; None reads to EOF.
+    - chunksize (int): Rows per chunk.
+
+    Returns:
+    - iterator of pd.DataFrame: Chunks with HISTORY_COLUMNS.
+    """
+    columns = pd.read_csv(path, nrows=0).columns
+    with open(path, "rb") as f:
+        f.seek(offset)
+        source = f if end is None else _BoundedReader(f, end)
+        if offset:
+            reader = pd.read_csv(source, header=None, names=columns, usecols=HISTORY_COLUMNS, chunksize=chunksize)
+        else:
+            reader = pd.read_csv(source, usecols=HISTORY_COLUMNS, chunksize=chunksize)
+        yield from reader
+
+def aggregate_chunk(chunk, reference_date=None, half_life_days=None):
+    """
+    Sums one chunk of matches into per (Player, Surface) box-score totals.
+
+    Each match contributes twice: once from the winner's side and once from the
+    loser's, with the opponent's serve totals recorded as return totals.
+
+    Parameters:
+    - chunk (pd.DataFrame): Match history rows.
+    - reference_date (pd.Timestamp, optional): Date recency weights are relative to.
+    - half_life_days (float, optional): Matches this many days before the reference
+      date count half; None weights all matches equally.
+
+    Returns:
+    - pd.DataFrame: SUM_COLUMNS plus Matches (unweighted), indexed by (Player, Surface).
+    """
+    chunk = chunk.dropna(subset=["tourney_date", "surface", "w_svpt", "l_svpt"])
+    chunk = chunk[(chunk["w_svpt"] > 0) & (chunk["l_svpt"] > 0)]
+
+    weights = np.ones(len(chunk))
+    if half_life_days is not None:
+        dates = pd.to_datetime(chunk["tourney_date"].astype("int64").astype(str), format="%Y%m%d")
+        age_days = (reference_date - dates).dt.days.to_numpy()
+        weights = np.exp2(-age_days / half_life_days)
+
+    sides = []
+    for player, opponent, name_column in (("w", "l", "winner_name"), ("l", "w", "loser_name")):
+        side = pd.DataFrame({"Player": chunk[name_column], "Surface": chunk["surface"]})
+        for col in BOX_SCORE_COLUMNS:
+            side[col] = chunk[f"{player}_{col}"].to_numpy(dtype=np.float64) * weights
+            side[f"opp_{col}"] = chunk[f"{opponent}_{col}"].to_numpy(dtype=np.float64) * weights
+        side["Matches"] = 1
+        sides.append(side)
+
+    return pd.concat(sides, ignore_index=True).groupby(["Player", "Surface"]).sum()
+
+def stats_from_totals(totals, min_matches=1):
+    """
+    Converts box-score totals into the stat columns kept by `load_stats`.
+
+    Parameters:
+    - totals (pd.DataFrame): Output of `aggregate_chunk`, summed over all chunks.
+    - min_matches (int): Minimum matches for a (Player, Surface) row to be kept.
+
+    Returns:
+    - pd.DataFrame: Player, Surface, Matches and STATS_COLUMNS, as fractions like atp.csv.
+    """
+    totals = totals[totals["Matches"] >= min_matches]
+    second_serves = totals["svpt"] - totals["1stIn"]
+    opp_second_serves = totals["opp_svpt"] - totals["opp_1stIn"]
+    breaks = totals["opp_bpFaced"] - totals["opp_bpSaved"]
+
+    stats = pd.DataFrame({
+        "Matches": totals["Matches"].astype(int),
+        "FirstServePercentage": _ratio(totals["1stIn"], totals["svpt"]),
+        "FirstServeWonPercentage": _ratio(totals["1stWon"], totals["1stIn"]),
+        "SecondServeWonPercentage": _ratio(totals["2ndWon"], second_serves),
+        "AcePercentage": _ratio(totals["ace"], totals["svpt"]),
+        "DoubleFaultsPerServiceGame": _ratio(totals["df"], totals["SvGms"]),
+        "BreakPointsFacedPerServiceGame": _ratio(totals["bpFaced"], totals["SvGms"]),
+        "BreakPointsSavedPercentage": _ratio(totals["bpSaved"], totals["bpFaced"]),
+        "FirstServeReturnPointsWonPercentage": _ratio(totals["opp_1stIn"] - totals["opp_1stWon"], totals["opp_1stIn"]),
+        "SecondServeReturnPointsWonPercentage": _ratio(opp_second_serves - totals["opp_2ndWon"], opp_second_serves),
+        "ReturnGamesWonPercentage": _ratio(breaks, totals["opp_SvGms"]),
+        "AceAgainstPercentage": _ratio(totals["opp_ace"], totals["opp_svpt"]),
+        "BreakPointsConvertedPercentage": _ratio(breaks, totals["opp_bpFaced"]),
+    })
+    return stats.reset_index()[["Player", "Surface", "Matches"] + STATS_COLUMNS[2:]]
+
+def _load_state(state_path):
+    """Reads the totals and metadata of the last build, or (None, None)."""
+    metadata_path = f"{state_path}.json"
+    if not (os.path.exists(state_path) and os.path.exists(metadata_path)):
+        return None, None
+    try:
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+        return pd.read_pickle(state_path), metadata
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable stats build state '{state_path}': {e}")
+        return None, None
+
+def _save_state(state_path, totals, metadata):
+    """Writes the totals and metadata of a build."""
+    totals.to_pickle(state_path)
+    with open(f"{state_path}.json", "w") as f:
+        json.dump(metadata, f)
+
+def _pending_reads(metadata, history_files, half_life_days):
+    """
+    Works out which bytes of each history file still need aggregating.
+
+    Returns:
+    - dict or None: path -> start offset, or None when a full rebuild is needed
+      (settings changed, or a file was removed, shrank or rewritten).
+    """
+    if metadata is None or metadata.get("half_life_days") != half_life_days:
+        return None
+    recorded = metadata.get("sources", {})
+    if not set(recorded) <= set(history_files):
+        return None
+
+    pending = {}
+    for path in history_files:
+        size = os.path.getsize(path)
+        if path not in recorded:
+            pending[path] = 0
+            continue
+        offset = recorded[path]["offset"]
+        if (size < offset or not _ends_with_newline(path, offset)
+                or _prefix_hash(path, offset) != recorded[path].get("prefix_sha256")):
+            return None
+        if size > offset:
+            pending[path] = offset
+    return pending
+
+def build_player_stats(history_files, output_csv, half_life_days=None, min_matches=1, chunksize=CHUNK_SIZE):
+    """
+    Builds a player stats file (same columns as atp.csv/wta.csv for everything
+    `load_stats` keeps) from match-by-match history files.
+
+    Files are streamed in chunks, so memory is bounded by the number of
+    (player, surface) pairs rather than the history size. Running totals are
+    kept next to `output_csv`; when rows are appended to a history file (or a
+    new file is listed) only the new rows are read. Recency weights decay
+    exponentially, so appended matches are folded in by decaying the existing
+    totals to the new latest match date. Every byte already aggregated is
+    hashed, so rewriting any of them, removing a file, or changing
+    `half_life_days` triggers a full rebuild.
+
+    Parameters:
+    - history_files (list of str): Match history CSVs (Sackmann format), e.g. one per season.
+    - output_csv (str): Stats file to write.
+    - half_life_days (float, optional): Recency half-life in days; None weights all matches equally.
+    - min_matches (int): Minimum matches for a (Player, Surface) row to be written.
+    - chunksize (int): Rows per chunk.
+
+    Returns:
+    - pd.DataFrame: The written stats.
+    """
+    history_files = [os.path.abspath(path) for path in history_files]
+    state_path = f"{os.path.splitext(output_csv)[0]}_totals.pickle"
+
+    totals, metadata = _load_state(state_path)
+    pending = _pending_reads(metadata, history_files, half_life_days)
+    if pending is None:
+        logger.info(f"Building {output_csv} from {len(history_files)} history files...")
+        totals, reference_date = None, None
+        pending = {path: 0 for path in history_files}
+    else:
+        reference_date = pd.Timestamp(metadata["reference_date"]) if metadata["reference_date"] else None
+        if pending:
+            logger.info(f"Updating {output_csv} with rows appended to {len(pending)} history files...")
+
+    if not pending and os.path.exists(output_csv):
+        logger.info(f"{output_csv} is up to date.")
+        return pd.read_csv(output_csv)
+
+    sources = dict(metadata["sources"]) if metadata and totals is not None else {}
+    for path, offset in pending.items():
+        # Rows appended while the file is streamed are left for the next build
+        end = _complete_rows_end(path, os.path.getsize(path))
+        chunks = read_history_chunks(path, offset, end, chunksize) if end > offset else []
+        for chunk in chunks:
+            if half_life_days is not None and chunk["tourney_date"].notna().any():
+                latest = pd.to_datetime(str(int(chunk["tourney_date"].max())), format="%Y%m%d")
+                if reference_date is None or latest > reference_date:
+                    # Weights are relative to the latest match; move existing totals to the new reference
+                    if totals is not None and reference_date is not None:
+                        decay = np.exp2(-(latest - reference_date).days / half_life_days)
+                        totals[SUM_COLUMNS] *= decay
+                    reference_date = latest
+            chunk_totals = aggregate_chunk(chunk, reference_date, half_life_days)
+            totals = chunk_totals if totals is None else totals.add(chunk_totals, fill_value=0)
+        sources[path] = {"offset": end, "prefix_sha256": _prefix_hash(path, end)}
+
+    if totals is None:
+        totals = pd.DataFrame(columns=SUM_COLUMNS + ["Matches"], index=pd.MultiIndex.from_arrays([[], []], names=["Player", "Surface"]))
+
+    stats = stats_from_totals(totals, min_matches)
+    os.makedirs(os.path.dirname(os.path.abspath(output_csv)), exist_ok=True)
+    stats.to_csv(output_csv, index=False)
+    _save_state(state_path, totals, {
+        "half_life_days": half_life_days,
+        "reference_date": reference_date.isoformat() if reference_date is not None else None,
+        "sources": sources,
+    })
+    logger.info(f"Saved stats for {len(stats)} player/surface rows to {output_csv}.")
+    return stats
+
+def history_signature(history_files):
+    """Returns the size and mtime of each history file, a cheap fingerprint for the stage runner."""
+    return {
+        path: [os.path.getsize(path), os.path.getmtime(path)] if os.path.exists(path) else "missing"
+        for path in history_files
+    }
@@ -1,3 +1,6 @@
+import os
+import json
+import numpy as np
 import pandas as pd
 import logging
 
@@ -14,6 +17,70 @@ def setup_logger(name):
 
 logger = setup_logger("stats_integration")
 
+# Stats carried into the simulation-ready file
+STAT_COLUMNS = [
+    "FirstServePercentage",
+    "FirstServeWonPercentage",
+    "SecondServeWonPercentage",
+    "AcePercentage",
+    "DoubleFaultsPerServiceGame",
+    "BreakPointsFacedPerServiceGame",
+    "BreakPointsSavedPercentage",
+    "FirstServeReturnPointsWonPercentage",
+    "SecondServeReturnPointsWonPercentage",
+    "ReturnGamesWonPercentage",
+    "AceAgainstPercentage",
+    "BreakPointsConvertedPercentage",
+]
+
+# Relative change of each stat per unit of IWP deviation from the baseline
+IWP_SCALING_FACTORS = {
+    "FirstServePercentage": 0.05,
+    "FirstServeWonPercentage": 0.05,
+    "SecondServeWonPercentage": 0.05,
+    "AcePercentage": 0.1,
+    "DoubleFaultsPerServiceGame": .1,
+    "BreakPointsFacedPerServiceGame": -0.05,
+    "BreakPointsSavedPercentage": 0.05,
+    "FirstServeReturnPointsWonPercentage": 0.05,
+    "SecondServeReturnPointsWonPercentage": 0.05,
+    "ReturnGamesWonPercentage": 0.05,
+    "AceAgainstPercentage": -0.05,
+    "BreakPointsConvertedPercentage": 0.05,
+}
+
+# Whether higher or lower values of each stat are better; baselines sit on the weak side
+BASELINE_DIRECTIONALITY = {
+    "FirstServePercentage": "higher",
+    "FirstServeWonPercentage": "higher",
+    "SecondServeWonPercentage": "higher",
+    "AcePercentage": "higher",
+    "DoubleFaultsPerServiceGame": "lower",
+    "BreakPointsFacedPerServiceGame": "lower",
+    "BreakPointsSavedPercentage": "higher",
+    "FirstServeReturnPointsWonPercentage": "higher",
+    "SecondServeReturnPointsWonPercentage": "higher",
+    "ReturnGamesWonPercentage": "higher",
+    "AceAgainstPercentage": "lower",
+    "BreakPointsConvertedPercentage": "higher",
+}
+
+# Group key used for "any league" / "any surface" entries in the baseline store
+ALL_GROUPS = "ALL"
+
+# In-process memo of baseline stores keyed by (stats snapshot hash, percentile)
+_BASELINE_STORES = {}
+
+def _complete_stats(stats_df, columns):
+    """Returns a numeric copy of stats_df restricted to rows with every column present."""
+    missing_columns = [col for col in columns if col not in stats_df.columns]
+    if missing_columns:
+        logger.error(f"Missing columns in stats_df for baseline calculation: {missing_columns}")
+        raise ValueError(f"Missing columns for baseline calculation: {missing_columns}")
+
+    numeric = stats_df.assign(**{col: pd.to_numeric(stats_df[col], errors="coerce") for col in columns})
+    return numeric.dropna(subset=columns)
+
 def calculate_percentile_baseline(stats_df, percentile=20):
     """
     Calculates baseline stats for unmatched players based on a given percentile,
@@ -21,39 +88,11 @@ def calculate_percentile_baseline(stats_df, percentile=20):
     """
     try:
         logger.info(f"Calculating {percentile}th percentile baseline for stats.")
-
-        # Define directionality for stats
-        directionality = {
-            "FirstServePercentage": "higher",
-            "FirstServeWonPercentage": "higher",
-            "SecondServeWonPercentage": "higher",
-            "AcePercentage": "higher",
-            "DoubleFaultsPerServiceGame": "lower",
-            "BreakPointsFacedPerServiceGame": "lower",
-            "BreakPointsSavedPercentage": "higher",
-            "FirstServeReturnPointsWonPercentage": "higher",
-            "SecondServeReturnPointsWonPercentage": "higher",
-            "ReturnGamesWonPercentage": "higher",
-            "AceAgainstPercentage": "lower",
-            "BreakPointsConvertedPercentage": "higher",
-        }
-
-        # Validate required columns
-        missing_columns = [col for col in directionality if col not in stats_df.columns]
-        if missing_columns:
-            logger.error(f"Missing columns in stats_df for baseline calculation: {missing_columns}")
-            raise ValueError(f"Missing columns for baseline calculation: {missing_columns}")
-
-        # Convert required columns to numeric
-        for col in directionality:
-            stats_df[col] = pd.to_numeric(stats_df[col], errors="coerce")
-
-        # Drop rows with NaN in required columns
-        stats_df.dropna(subset=directionality.keys(), inplace=True)
+        stats_df = _complete_stats(stats_df, list(BASELINE_DIRECTIONALITY))
 
         # Calculate the percentile baseline
         baseline = {}
-        for stat, direction in directionality.items():
+        for stat, direction in BASELINE_DIRECTIONALITY.items():
             if direction == "higher":
                 baseline[stat] = stats_df[stat].quantile(percentile / 100)
             elif direction == "lower":
@@ -74,8 +113,8 @@ def calculate_stat_bounds(stats_df, columns):
         numerical_columns = stats_df[columns].select_dtypes(include=["number"]).columns
         logger.info(f"Calculating stat bounds for numerical columns: {numerical_columns}")
 
-        # Drop rows with NaN in required columns
-        stats_df.dropna(subset=numerical_columns, inplace=True)
+        # Ignore rows with NaN in required columns
+        stats_df = stats_df.dropna(subset=numerical_columns)
 
         # Calculate bounds
         bounds = {col: (stats_df[col].min(), stats_df[col].max()) for col in numerical_columns}
@@ -85,6 +124,117 @@ def calculate_stat_bounds(stats_df, columns):
         logger.error(f"Error calculating stat bounds: {e}")
         raise
 
+def stats_snapshot_hash(stats_df):
+    """Returns the stats snapshot hash set by `load_stats`, or a content hash of the frame."""
+    snapshot_hash = stats_df.attrs.get("snapshot_hash")
+    if snapshot_hash is None:
+        snapshot_hash = format(int(pd.util.hash_pandas_object(stats_df, index=False).sum()) & (2 ** 64 - 1), "x")
+    return snapshot_hash
+
+def build_baseline_store(stats_df, percentile=20):
+    """
+    Calculates baselines and bounds for every (league, surface) group in one grouped pass.
+
+    Every row also counts toward its league's ALL-surface group and the overall
+    ALL/ALL group, so lookups can fall back to wider groups.
+
+    Parameters:
+    - stats_df (pd.DataFrame): Stats with Surface and, optionally, League columns.
+    - percentile (int): Baseline percentile on the weak side of each stat.
+
+    Returns:
+    - dict: (league, surface) -> {"baseline": {stat: value}, "bounds": {stat: (min, max)}}.
+    """
+    stats = _complete_stats(stats_df, STAT_COLUMNS)
+    league = stats["League"].astype(str) if "League" in stats.columns else ALL_GROUPS
+    surface = stats["Surface"].astype(str).str.strip()
+
+    keyed = pd.concat([
+        stats[STAT_COLUMNS].assign(_league=league, _surface=surface),
+        stats[STAT_COLUMNS].assign(_league=league, _surface=ALL_GROUPS),
+        stats[STAT_COLUMNS].assign(_league=ALL_GROUPS, _surface=ALL_GROUPS),
+    ], ignore_index=True)
+    grouped = keyed.groupby(["_league", "_surface"])[STAT_COLUMNS]
+
+    low, high = percentile / 100, (100 - percentile) / 100
+    quantiles = grouped.quantile([low, high])
+    minimums = grouped.min()
+    maximums = grouped.max()
+
+    store = {}
+    for group in minimums.index:
+        store[group] = {
+            "baseline": {
+                stat: float(quantiles.loc[(*group, low if BASELINE_DIRECTIONALITY[stat] == "higher" else high), stat])
+                for stat in STAT_COLUMNS
+            },
+            "bounds": {
+                stat: (float(minimums.at[group, stat]), float(maximums.at[group, stat])) for stat in STAT_COLUMNS
+            },
+        }
+    return store
+
+def load_baseline_store(stats_df, percentile=20, store_path=None):
+    """
+    Returns the baseline store for a stats snapshot, building it only once.
+
+    Stores are memoized in-process and, with `store_path`, in a JSON file keyed
+    by snapshot hash and percentile so they are reused across runs and slates.
+
+    Parameters:
+    - stats_df (pd.DataFrame): Stats, ideally from `load_stats` (which sets the snapshot hash).
+    - percentile (int): Baseline percentile.
+    - store_path (str, optional): JSON file persisting stores between runs.
+
+    Returns:
+    - dict: Store as returned by `build_baseline_store`.
+    """
+    key = (stats_snapshot_hash(stats_df), percentile)
+    if key in _BASELINE_STORES:
+        return _BASELINE_STORES[key]
+
+    disk_key = f"{key[0]}|{key[1]}"
+    saved = {}
+    if store_path and os.path.exists(store_path):
+        try:
+            with open(store_path) as f:
+                saved = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable baseline store '{store_path}': {e}")
+
+    if disk_key in saved:
+        store = {
+            tuple(group.split("|")): {
+                "baseline": entry["baseline"],
+                "bounds": {stat: tuple(bound) for stat, bound in entry["bounds"].items()},
+            }
+            for group, entry in saved[disk_key].items()
+        }
+        logger.info(f"Loaded baseline store for {len(store)} groups from {store_path}.")
+    else:
+        store = build_baseline_store(stats_df, percentile)
+        logger.info(f"Built baseline store for {len(store)} league/surface groups.")
+        if store_path:
+            # Keep only entries for the current snapshot
+            saved = {k: v for k, v in saved.items() if k.startswith(f"{key[0]}|")}
+            saved[disk_key] = {"|".join(group): entry for group, entry in store.items()}
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+                with open(store_path, "w") as f:
+                    json.dump(saved, f)
+            except Exception as e:
+                logger.warning(f"Could not save baseline store to '{store_path}': {e}")
+
+    _BASELINE_STORES[key] = store
+    return store
+
+def lookup_baseline_entry(store, league, surface):
+    """Returns the store entry for (league, surface), falling back to the league, then to all stats."""
+    for group in ((league, surface), (league, ALL_GROUPS), (ALL_GROUPS, ALL_GROUPS)):
+        if group in store:
+            return store[group]
+    raise KeyError(f"No baseline available for league '{league}' and surface '{surface}'.")
+
 def adjust_stats_with_iwp(stats, iwp, bounds, baseline_iwp=50.0, adjustment_strength=1.0):
     """
     Adjust stats based on the player's implied win percentage (IWP) and clamp them.
@@ -100,22 +250,6 @@ def adjust_stats_with_iwp(stats, iwp, bounds, baseline_iwp=50.0, adjustment_stre
     - dict: Adjusted and clamped stats.
     - str: Direction of IWP adjustment ("Positive", "Negative", "Neutral").
     """
-    # Scaling constants
-    SCALING_FACTORS = {
-        "FirstServePercentage": 0.05,
-        "FirstServeWonPercentage": 0.05,
-        "SecondServeWonPercentage": 0.05,
-        "AcePercentage": 0.1,
-        "DoubleFaultsPerServiceGame": .1,
-        "BreakPointsFacedPerServiceGame": -0.05,
-        "BreakPointsSavedPercentage": 0.05,
-        "FirstServeReturnPointsWonPercentage": 0.05,
-        "SecondServeReturnPointsWonPercentage": 0.05,
-        "ReturnGamesWonPercentage": 0.05,
-        "AceAgainstPercentage": -0.05,
-        "BreakPointsConvertedPercentage": 0.05,
-    }
-
     # Normalize deviation to [-0.5, 0.5]
     deviation = (iwp - baseline_iwp) / 100
     adjustment_direction = "Neutral"
@@ -126,8 +260,8 @@ def adjust_stats_with_iwp(stats, iwp, bounds, baseline_iwp=50.0, adjustment_stre
 
     # Adjust stats with scaling and adjustment strength
     adjusted_stats = {
-        col: stats[col] * (1 + deviation * SCALING_FACTORS[col] * adjustment_strength)
-        for col in stats.keys() if col in SCALING_FACTORS
+        col: stats[col] * (1 + deviation * IWP_SCALING_FACTORS[col] * adjustment_strength)
+        for col in stats.keys() if col in IWP_SCALING_FACTORS
     }
 
     # Clamp stats to bounds
@@ -138,96 +272,155 @@ def adjust_stats_with_iwp(stats, iwp, bounds, baseline_iwp=50.0, adjustment_stre
 
     return clamped_stats, adjustment_direction
 
-def integrate_stats(match_context, stats_df, sim_ready_csv, sourced_strength=0.1, estimated_strength=0.1):
+def adjust_stats_frame_with_iwp(stats, iwp, bounds, baseline_iwp=50.0, adjustment_strength=1.0):
+    """
+    Column-wise version of `adjust_stats_with_iwp` for many players at once.
+
+    Parameters:
+    - stats (pd.DataFrame): One row of stats per player.
+    - iwp (pd.Series or np.ndarray): Implied win percentage per player (0-100).
+    - bounds (dict): Bounds for clamping stats; each (min, max) may be scalars or per-player arrays.
+    - baseline_iwp (float): Neutral baseline for IWP (default: 50).
+    - adjustment_strength (float or np.ndarray): IWP adjustment multiplier, scalar or per player.
+
+    Returns:
+    - pd.DataFrame: Adjusted and clamped stats.
+    - np.ndarray: Direction of IWP adjustment per player ("Positive", "Negative", "Neutral").
+    """
+    columns = [col for col in stats.columns if col in IWP_SCALING_FACTORS]
+    scaling = np.array([IWP_SCALING_FACTORS[col] for col in columns])
+
+    # Normalize deviation to [-0.5, 0.5]
+    deviation = (np.asarray(iwp, dtype=float) - baseline_iwp) / 100
+    adjustment_direction = np.select([deviation > 0, deviation < 0], ["Positive", "Negative"], "Neutral")
+
+    # Adjust stats with scaling and adjustment strength
+    adjusted = stats[columns] * (1 + np.outer(deviation * adjustment_strength, scaling))
+
+    # Clamp stats to bounds
+    lower = pd.DataFrame({col: np.broadcast_to(bounds[col][0], len(stats)) for col in columns}, index=stats.index)
+    upper = pd.DataFrame({col: np.broadcast_to(bounds[col][1], len(stats)) for col in columns}, index=stats.index)
+    clamped = adjusted.clip(lower=lower, upper=upper)
+
+    return clamped, adjustment_direction
+
+def pair_opponents(match_context):
+    """
+    Pairs every player with their opponent's row by (Name, Opponent) key.
+
+    Parameters:
+    - match_context (pd.DataFrame): Match context with Name and Opponent columns.
+
+    Returns:
+    - pd.Series: MatchID per row, numbered in order of first appearance; NaN for
+      rows whose opponent has no row of their own.
+    """
+    names = match_context["Name"].astype(str).str.strip()
+    opponents = match_context["Opponent"].astype(str).str.strip()
+
+    # A row is paired when the reversed (Opponent, Name) key exists
+    keys = pd.MultiIndex.from_arrays([names, opponents])
+    reversed_keys = pd.MultiIndex.from_arrays([opponents, names])
+    paired = reversed_keys.isin(keys)
+
+    # Both rows of a match share the same order-independent key
+    match_key = pd.Series(
+        np.where(names < opponents, names + "|" + opponents, opponents + "|" + names),
+        index=match_context.index,
+    )
+    match_ids = pd.Series(np.nan, index=match_context.index)
+    match_ids[paired] = pd.factorize(match_key[paired])[0] + 1
+    return match_ids
+
+def integrate_stats(match_context, stats_df, sim_ready_csv, sourced_strength=0.1, estimated_strength=0.1,
+                    baseline_store_path=None):
     """
     Integrates stats into the match context and saves the simulation-ready files.
+
+    Stats are looked up through a (Player, Surface) index in one join, opponents
+    are paired by key and the IWP adjustment runs column-wise over all players.
+    Players without stats get their league and surface baseline, and stats are
+    clamped to their league's bounds (see `load_baseline_store`). Every row gets
+    a dense integer PlayerID that the simulator and optimizer index by.
+
+    Returns:
+    - pd.DataFrame: The simulation-ready rows.
     """
     try:
         # Validate and normalize match_context columns
         match_context["ResolvedName"] = match_context["ResolvedName"].astype(str).str.strip()
         match_context["Surface"] = match_context["Surface"].astype(str).str.strip()
 
-        # Calculate baseline stats and bounds
-        baseline_stats = calculate_percentile_baseline(stats_df, percentile=20)
-        numerical_columns = [
-            "FirstServePercentage",
-            "FirstServeWonPercentage",
-            "SecondServeWonPercentage",
-            "AcePercentage",
-            "DoubleFaultsPerServiceGame",
-            "BreakPointsFacedPerServiceGame",
-            "BreakPointsSavedPercentage",
-            "FirstServeReturnPointsWonPercentage",
-            "SecondServeReturnPointsWonPercentage",
-            "ReturnGamesWonPercentage",
-            "AceAgainstPercentage",
-            "BreakPointsConvertedPercentage",
+        # Baselines and bounds per league and surface, built once per stats snapshot
+        baseline_store = load_baseline_store(stats_df, percentile=20, store_path=baseline_store_path)
+
+        # Pair opponents by key; unpaired rows cannot be simulated
+        match_ids = pair_opponents(match_context)
+        unpaired = match_ids.isna()
+        if unpaired.any():
+            logger.warning(
+                f"No opponent row found for: {match_context.loc[unpaired, 'Name'].tolist()}. Skipping."
+            )
+        context = match_context[~unpaired].assign(MatchID=match_ids[~unpaired].astype(int))
+        context = context.sort_values("MatchID", kind="stable").reset_index(drop=True)
+
+        # Join every player's stats through the (Player, Surface) index
+        stats_index = (
+            _complete_stats(stats_df, STAT_COLUMNS).drop_duplicates(subset=["Player", "Surface"])
+            .set_index(["Player", "Surface"])[STAT_COLUMNS]
+        )
+        lookup_keys = pd.MultiIndex.from_arrays([context["ResolvedName"], context["Surface"]])
+        sourced = lookup_keys.isin(stats_index.index) & (context["ResolvedName"] != "").to_numpy()
+        player_stats = stats_index.reindex(lookup_keys).reset_index(drop=True).astype("float64")
+
+        # Look up each player's league/surface baseline and league bounds
+        leagues = context["League"].astype(str).str.strip()
+        baseline_entries = [
+            lookup_baseline_entry(baseline_store, league, surface)
+            for league, surface in zip(leagues, context["Surface"])
         ]
-        bounds = calculate_stat_bounds(stats_df, numerical_columns)
-
-        final_rows = []
-        match_id = 1
-
-        for i in range(0, len(match_context), 2):  # Process pairs of rows for each match
-            player_row = match_context.iloc[i]
-            opponent_row = match_context.iloc[i + 1]
-
-            for row, opponent in [(player_row, opponent_row), (opponent_row, player_row)]:
-                resolved_name = str(row.get("ResolvedName", "")).strip()
-                surface = str(row.get("Surface", "")).strip()
-                iwp = row.get("ImpliedWinPercentage", 50)
-
-                if not resolved_name:
-                    logger.warning(f"No resolved name for row: {row}")
-                    stats = baseline_stats
-                    stats_source = "Estimated"
-                    adjustment_strength = estimated_strength
-                else:
-                    # Attempt to filter stats for the specific surface
-                    player_stats = stats_df[
-                        (stats_df["Player"] == resolved_name) & (stats_df["Surface"] == surface)
-                    ]
-
-                    if player_stats.empty:
-                        logger.warning(f"No stats found for {resolved_name} on {surface}. Using baseline stats.")
-                        stats = baseline_stats
-                        stats_source = "Estimated"
-                        adjustment_strength = estimated_strength
-                    else:
-                        stats = player_stats.iloc[0].to_dict()
-                        stats_source = "Sourced"
-                        adjustment_strength = sourced_strength
-
-                # Adjust and clamp stats based on IWP
-                adjusted_stats, iwp_adjustment = adjust_stats_with_iwp(
-                    stats, iwp, bounds, baseline_iwp=50.0, adjustment_strength=adjustment_strength
-                )
-
-                # Prepare full simulation-ready row
-                full_row = {
-                    "Name": row["Name"],
-                    "Opponent": opponent["Name"],
-                    "Surface": surface,
-                    "League": row["League"],
-                    **adjusted_stats,
-                    "StatsSource": stats_source,
-                    "IWPAdjustment": iwp_adjustment,
-                    "MatchID": match_id,
-                }
-                final_rows.append(full_row)
-
-            match_id += 1  # Increment MatchID after processing both players
+        bound_entries = [lookup_baseline_entry(baseline_store, league, ALL_GROUPS) for league in leagues]
+        bounds = {
+            col: (
+                np.array([entry["bounds"][col][0] for entry in bound_entries]),
+                np.array([entry["bounds"][col][1] for entry in bound_entries]),
+            )
+            for col in STAT_COLUMNS
+        }
+
+        # Players without stats fall back to the baseline
+        if not sourced.all():
+            missing = context.loc[~sourced, ["ResolvedName", "Surface"]].itertuples(index=False)
+            logger.warning(f"No stats found for {[tuple(key) for key in missing]}. Using baseline stats.")
+            baseline_stats = pd.DataFrame([entry["baseline"] for entry in baseline_entries])[STAT_COLUMNS]
+            player_stats.loc[~sourced, STAT_COLUMNS] = baseline_stats[~sourced].to_numpy()
+
+        # Adjust and clamp stats based on IWP
+        iwp = pd.to_numeric(context.get("ImpliedWinPercentage", 50), errors="coerce")
+        adjustment_strength = np.where(sourced, sourced_strength, estimated_strength)
+        adjusted_stats, iwp_adjustment = adjust_stats_frame_with_iwp(
+            player_stats, iwp, bounds, baseline_iwp=50.0, adjustment_strength=adjustment_strength
+        )
+
+        # Prepare full simulation-ready rows
+        final_df = pd.concat([context[["Name", "Opponent", "Surface", "League"]], adjusted_stats], axis=1)
+        final_df["StatsSource"] = np.where(sourced, "Sourced", "Estimated")
+        final_df["IWPAdjustment"] = iwp_adjustment
+        final_df["MatchID"] = context["MatchID"]
+        # Dense slate-level player IDs; rows are sorted by match, so a match's players are adjacent
+        final_df["PlayerID"] = np.arange(len(final_df))
 
         # Save the full simulation-ready file
-        final_df = pd.DataFrame(final_rows)
         final_df.to_csv(sim_ready_csv, index=False)
         logger.info(f"Simulation-ready file saved with {len(final_df)} rows.")
+        return final_df
 
     except Exception as e:
         logger.error(f"Error integrating stats: {e}")
         raise
 
-def run_stats_integration(match_context, stats_df, sim_ready_csv, sourced_strength=0.1, estimated_strength=0.1):
+def run_stats_integration(match_context, stats_df, sim_ready_csv, sourced_strength=0.1, estimated_strength=0.1,
+                          baseline_store_path=None):
     """
     Runs the stats integration process.
 
@@ -237,12 +430,17 @@ def run_stats_integration(match_context, stats_df, sim_ready_csv, sourced_streng
     - sim_ready_csv (str): Path to save the simulation-ready CSV.
     - sourced_strength (float): Adjustment strength for sourced stats.
     - estimated_strength (float): Adjustment strength for estimated stats.
+    - baseline_store_path (str, optional): JSON file caching baselines and bounds between runs.
+
+    Returns:
+    - pd.DataFrame: The simulation-ready rows.
     """
     logger.info("Running stats integration...")
-    integrate_stats(
+    return integrate_stats(
         match_context,
         stats_df,
         sim_ready_csv,
         sourced_strength=sourced_strength,
-        estimated_strength=estimated_strength
+        estimated_strength=estimated_strength,
+        baseline_store_path=baseline_store_path
     )
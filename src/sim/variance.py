@@ -1,4 +1,5 @@
 import numpy as np
+import pandas as pd
 import logging
 
 # Configure logging
@@ -80,3 +81,108 @@ def apply_in_match_variance(player, variance_factor):
         dict: Adjusted player stats.
     """
     return apply_variance(player, variance_factor)
+
+def apply_variance_batch(player, variance_factor, num_simulations, shocks=None):
+    """
+    Vectorized counterpart of `apply_variance` that perturbs a player's stats for many sims at once.
+
+    Args:
+        player (dict): Player stats; stat values may be scalars or per-sim arrays.
+        variance_factor (float): Variance multiplier (standard deviation factor).
+        num_simulations (int): Number of simulations to draw.
+        shocks (dict, optional): Standard-normal shocks per stat (e.g. from
+            `draw_correlated_shocks`). Stats without a shock are drawn independently.
+
+    Returns:
+        dict: Adjusted player stats, with each stat as an array of shape (num_simulations,).
+    """
+    adjusted_player = player.copy()
+    for stat in STAT_DIRECTIONALITY:
+        value = player.get(stat)
+        if value is None or not np.issubdtype(np.asarray(value).dtype, np.number):
+            continue
+
+        value = np.asarray(value, dtype=np.float64)
+        std_dev = variance_factor * np.abs(value)
+        if shocks is not None and stat in shocks:
+            shock = shocks[stat]
+        else:
+            shock = np.random.standard_normal(num_simulations)
+        adjusted = value + std_dev * shock
+
+        # Clamp percentage stats between 0 and 1
+        if "Percentage" in stat:
+            adjusted = np.clip(adjusted, 0.0, 1.0)
+
+        # No negative values for aces or faults
+        if "Ace" in stat or "DoubleFaultsPerServiceGame" in stat:
+            adjusted = np.maximum(adjusted, 0.0)
+
+        adjusted_player[stat] = adjusted
+
+    return adjusted_player
+
+def estimate_stat_covariance(stats_df):
+    """
+    Estimates the covariance matrix of the variance-adjusted stats.
+
+    Args:
+        stats_df (pd.DataFrame): Combined ATP/WTA stats, as returned by `load_stats`.
+
+    Returns:
+        pd.DataFrame: Covariance matrix over the stats in STAT_DIRECTIONALITY found in `stats_df`.
+    """
+    columns = [stat for stat in STAT_DIRECTIONALITY if stat in stats_df.columns]
+    numeric_stats = stats_df[columns].apply(pd.to_numeric, errors="coerce")
+    return numeric_stats.cov()
+
+def build_variance_model(stats_df):
+    """
+    Builds the correlated variance model: the Cholesky factor of the stat correlation matrix.
+
+    Shocks are drawn on the correlation scale so each stat keeps the same
+    marginal spread as `apply_variance` (variance_factor * |value|); only the
+    dependence between stats changes.
+
+    Args:
+        stats_df (pd.DataFrame): Combined ATP/WTA stats, as returned by `load_stats`.
+
+    Returns:
+        dict: {"stats": list of stat names, "cholesky": lower-triangular np.ndarray}
+    """
+    covariance = estimate_stat_covariance(stats_df)
+    std_dev = np.sqrt(np.diag(covariance.values))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance.values / np.outer(std_dev, std_dev)
+    correlation = np.nan_to_num(correlation)
+    np.fill_diagonal(correlation, 1.0)
+
+    # Project onto the nearest positive definite matrix so the factorization cannot fail
+    eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+    correlation = (eigenvectors * np.maximum(eigenvalues, 1e-6)) @ eigenvectors.T
+    scale = np.sqrt(np.diag(correlation))
+    correlation = correlation / np.outer(scale, scale)
+
+    logging.info(f"Built correlated variance model over {len(covariance.columns)} stats.")
+    return {"stats": list(covariance.columns), "cholesky": np.linalg.cholesky(correlation)}
+
+def draw_correlated_shocks(variance_model, num_players, num_simulations, independent=None):
+    """
+    Draws correlated standard-normal stat shocks for several players and sims in one call.
+
+    Args:
+        variance_model (dict): Model returned by `build_variance_model`.
+        num_players (int): Number of players to draw for.
+        num_simulations (int): Number of simulations per player.
+        independent (np.ndarray, optional): Pre-drawn independent normals of shape
+            (num_players, num_simulations, n_stats) to correlate instead of fresh draws.
+
+    Returns:
+        list of dict: One dict per player mapping stat name to a (num_simulations,) shock array.
+    """
+    stats = variance_model["stats"]
+    if independent is None:
+        independent = np.random.standard_normal((num_players, num_simulations, len(stats)))
+    correlated = independent @ variance_model["cholesky"].T
+    return [dict(zip(stats, player_shocks.T)) for player_shocks in correlated]
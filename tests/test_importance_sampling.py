@@ -0,0 +1,31 @@
+import numpy as np
+
+from src.sim.importance_sampling import mixture_weights
+
+
+def test_mixture_weights_match_direct_formula():
+    log_ratios = np.random.default_rng(0).normal(size=(2, 1000))
+    expected = 3 / (1 + np.exp(log_ratios).sum(axis=0))
+    expected *= len(expected) / expected.sum()
+    np.testing.assert_allclose(mixture_weights(log_ratios), expected)
+
+
+def test_mixture_weights_stay_finite_for_large_log_ratios():
+    log_ratios = np.array([
+        [800.0, -800.0, 1000.0, 0.0],
+        [750.0, 900.0, -1000.0, 0.0],
+    ])
+    weights = mixture_weights(log_ratios)
+    assert np.isfinite(weights).all()
+    assert np.isclose(weights.mean(), 1.0)
+    # Sims far more likely under a proposal than under the plain model get next to no weight
+    assert weights[3] == weights.max()
+
+
+def test_mixture_weights_stay_finite_when_every_log_ratio_is_large():
+    log_ratios = np.full((2, 5), 1000.0)
+    log_ratios[0, 0] = 1001.0
+    weights = mixture_weights(log_ratios)
+    assert np.isfinite(weights).all()
+    assert np.isclose(weights.mean(), 1.0)
+    assert weights[0] < weights[1]